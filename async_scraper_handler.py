@@ -0,0 +1,341 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+import httpx
+from peewee import OperationalError
+
+import models
+from log_config import ProgressLogger
+from metrics import metrics
+from constants import ASYNC_ENDPOINT_LIMITS, PROGRESS_LOG_INTERVAL
+from scraper_handler import ScraperHandler
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncScraperHandler:
+    """
+    asyncio counterpart of ScraperHandler with the same public surface and results.
+
+    HTTP runs on one httpx.AsyncClient, with a semaphore per endpoint class ('search',
+    'posts_page', 'post', 'author', 'category', 'tag') bounding concurrent requests. Before a
+    batch of posts is stored, the authors, categories and tags it references that are not in
+    the database yet are fetched concurrently. All database access then runs on a single
+    writer thread, which stores the batch through the ScraperHandler code paths, so parsing
+    and storage are identical to the synchronous engine.
+
+    Public coroutines: search_by_keyword, fetch_all_pages, parse_post_detail. Call close()
+    when done to release the writer thread and its database connection.
+    """
+
+    def __init__(self, database_manager, baseurl, searchurl, posturl, authorsurl, categoryurl, tagurl, allpostsurl,
+                 limits=None):
+        self.database_manager = database_manager
+        self.scraper_handler = ScraperHandler(
+            database_manager, baseurl, searchurl, posturl, authorsurl, categoryurl, tagurl, allpostsurl
+        )
+        self.retry_policy = self.scraper_handler.retry_policy
+        self.negative_cache = self.scraper_handler.negative_cache
+        self.limits = dict(ASYNC_ENDPOINT_LIMITS, **(limits or {}))
+        self.semaphores = {}
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
+        self._client = None
+
+    @asynccontextmanager
+    async def session(self):
+        # Open the HTTP client for the outermost public call and share it with nested calls
+        if self._client is not None:
+            yield self._client
+            return
+        # Semaphores belong to the running event loop, so they are created per session
+        self.semaphores = {endpoint: asyncio.Semaphore(limit) for endpoint, limit in self.limits.items()}
+        connect_timeout, read_timeout = self.retry_policy.timeout
+        async with httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=sum(self.limits.values())),
+        ) as client:
+            self._client = client
+            try:
+                yield client
+            finally:
+                self._client = None
+
+    async def write(self, func, *args):
+        # Run a database function on the writer thread
+        return await asyncio.get_running_loop().run_in_executor(self._writer, func, *args)
+
+    def close(self):
+        # Close the writer thread's database connection, then the thread
+        self._writer.submit(self.database_manager.db.close).result()
+        self._writer.shutdown()
+
+    async def request_to_target_url(self, url, endpoint='other'):
+        """
+        GET `url` under the endpoint's semaphore, with the sync engine's retry policy and circuit breakers.
+
+        Raises:
+            httpx.HTTPStatusError: For a non-retryable status, or the last retryable one.
+            httpx.TransportError: For the last connection error or timeout.
+        """
+        policy = self.retry_policy
+        breaker = policy.breaker_for(url)
+        async with self.semaphores.get(endpoint, self.semaphores['other']):
+            for attempt in range(policy.retries):
+                # Wait out an open circuit, then let only one request probe the host like the sync engine
+                allowed, probe, wait = breaker.before_request()
+                while not allowed:
+                    await asyncio.sleep(wait)
+                    allowed, probe, wait = breaker.before_request()
+                response = None
+                start = time.perf_counter()
+                try:
+                    response = await self._client.get(url)
+                    metrics.observe('http_request_seconds', time.perf_counter() - start, endpoint=endpoint)
+                    metrics.increment('http_requests_total', endpoint=endpoint, status=response.status_code)
+                    metrics.increment('http_response_bytes_total', len(response.content), endpoint=endpoint)
+                except httpx.TransportError:
+                    breaker.record_failure()
+                    if attempt == policy.retries - 1:
+                        raise
+                else:
+                    if not policy.is_retryable_status(response.status_code):
+                        breaker.record_success()
+                        response.raise_for_status()
+                        return response
+                    breaker.record_failure()
+                    if attempt == policy.retries - 1:
+                        response.raise_for_status()
+                finally:
+                    if probe:
+                        breaker.release_probe()
+
+                metrics.increment('http_retries_total', endpoint=endpoint)
+                await asyncio.sleep(policy.backoff(attempt, response))
+
+    async def search_by_keyword(self, search_by_keyword_instance):
+        # Coroutine to perform search by keyword, returning (search_items, parsed_items)
+        async with self.session():
+            keyword, page_count = await self.write(
+                lambda: (search_by_keyword_instance.keyword.title, search_by_keyword_instance.page_count)
+            )
+            search_hits = await self.fetch_search_hits(keyword, page_count)
+            posts_data = await asyncio.gather(*(self.fetch_post_data(search_hit.slug) for search_hit in search_hits))
+            await self.prefetch_references([post_data for post_data in posts_data if post_data is not None])
+            return await self.write(self.store_search_results, search_by_keyword_instance, search_hits, posts_data)
+
+    async def fetch_search_hits(self, keyword, page_count):
+        # Request all result pages at once; stop at the first empty or repeated page like the sync engine
+        tasks = [asyncio.ensure_future(self.fetch_search_page(keyword, page)) for page in range(page_count)]
+        search_hits = list()
+        seen_slugs = set()
+        try:
+            for task in tasks:
+                page_hits = await task
+                page_slugs = {search_hit.slug for search_hit in page_hits}
+                repeated = page_slugs <= seen_slugs
+                for search_hit in page_hits:
+                    if search_hit.slug not in seen_slugs:
+                        seen_slugs.add(search_hit.slug)
+                        search_hits.append(search_hit)
+                if not page_slugs or repeated:
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+        return search_hits
+
+    async def fetch_search_page(self, keyword, page):
+        url = self.scraper_handler.searchurl.format(query=keyword, page=page)
+        response = await self.request_to_target_url(url, endpoint='search')
+        if response.status_code != 200:
+            return []
+        return self.scraper_handler.parse_search_page(response.text)
+
+    async def fetch_all_pages(self):
+        # Coroutine to fetch all pages of posts, keeping the next pages in flight while one is stored
+        all_posts = []
+        pending = {}
+        page = 1
+        progress = ProgressLogger(logger, "Fetched %d pages (%.2f pages/s)", interval=PROGRESS_LOG_INTERVAL)
+        try:
+            async with self.session():
+                while True:
+                    for ahead in range(page, page + self.limits['posts_page']):
+                        if ahead not in pending:
+                            pending[ahead] = asyncio.ensure_future(self.fetch_posts_page(ahead))
+                    with metrics.timer('pipeline_stage_seconds', stage='posts_page'):
+                        json_response = await pending.pop(page)
+                        if json_response is None:
+                            break
+                        await self.prefetch_references(json_response)
+                        all_posts_in_page = await self.write(self.store_posts_page, json_response)
+
+                    all_posts.extend(all_posts_in_page)
+                    page += 1
+                    progress.update(page - 1, posts=len(all_posts))
+            return all_posts
+        except OperationalError:
+            logger.error("Error occurred while fetching all pages.")
+            return []
+        finally:
+            for task in pending.values():
+                task.cancel()
+
+    async def fetch_posts_page(self, page):
+        try:
+            response = await self.request_to_target_url(
+                self.scraper_handler.allpostsurl.format(page=page), endpoint='posts_page'
+            )
+        except httpx.HTTPStatusError as http_err:
+            # WordPress answers past the last page with 400 rest_post_invalid_page_number
+            if http_err.response.status_code == 400:
+                return None
+            raise
+        json_response = response.json()
+
+        if 'code' in json_response and json_response['code'] == 'rest_post_invalid_page_number':
+            return None
+        return json_response
+
+    async def parse_post_detail(self, slug):
+        # Coroutine returning (post, author, categories, tags) for a slug, or four Nones
+        async with self.session():
+            post_data = await self.fetch_post_data(slug)
+            if post_data is None:
+                return None, None, None, None
+            await self.prefetch_references([post_data])
+            return await self.write(self.store_post_data, post_data)
+
+    async def fetch_post_data(self, slug):
+        # Coroutine returning the post's API data, or None when it is missing or the request failed
+        if await self.write(self.negative_cache.is_missing, 'post', slug):
+            return None
+        try:
+            response = await self.request_to_target_url(self.scraper_handler.posturl.format(slug=slug), endpoint='post')
+            json_response = response.json()
+        except httpx.HTTPStatusError as http_err:
+            if http_err.response.status_code in (401, 404):
+                await self.write(self.negative_cache.remember, 'post', slug, http_err.response.status_code)
+            logger.error("HTTPError occurred while fetching post detail for slug %s: %s", slug, http_err)
+            return None
+        except Exception as e:
+            logger.error("Error occurred while parsing post detail for slug %s: %s", slug, e)
+            return None
+
+        if not json_response:
+            logger.warning("JSON response is empty for slug: %s", slug)
+            await self.write(self.negative_cache.remember, 'post', slug, 404)
+            return None
+        return json_response[0]
+
+    async def prefetch_references(self, posts_data):
+        # Fetch every author, category and tag the posts reference that is not stored yet, concurrently
+        author_ids = sorted({int(post_data['author']) for post_data in posts_data})
+        category_ids = sorted({int(item_id) for post_data in posts_data for item_id in post_data['categories']})
+        tag_ids = sorted({int(item_id) for post_data in posts_data for item_id in post_data['tags']})
+        missing = await self.write(self.find_unstored_references, author_ids, category_ids, tag_ids)
+
+        url_formats = {
+            'author': self.scraper_handler.authorsurl,
+            'category': self.scraper_handler.categoryurl,
+            'tag': self.scraper_handler.tagurl,
+        }
+        responses = await asyncio.gather(*(
+            self.fetch_reference(kind, url_formats[kind], obj_id)
+            for kind, obj_ids in missing.items() for obj_id in obj_ids
+        ))
+        await self.write(self.store_references, [response for response in responses if response is not None])
+
+    async def fetch_reference(self, kind, url_format, obj_id):
+        # Coroutine returning (kind, id, status, json), or None to leave the id to the sync code path
+        try:
+            response = await self.request_to_target_url(url_format.format(id=obj_id), endpoint=kind)
+            return kind, obj_id, response.status_code, response.json()
+        except httpx.HTTPStatusError as http_err:
+            if http_err.response.status_code in (401, 404):
+                return kind, obj_id, http_err.response.status_code, None
+            return None
+        except Exception as e:
+            logger.warning("Prefetch of %s %s failed: %s", kind, obj_id, e)
+            return None
+
+    # The methods below run on the writer thread
+
+    def find_unstored_references(self, author_ids, category_ids, tag_ids):
+        authors = {
+            author.author_id: author
+            for author in models.Author.select().where(models.Author.author_id.in_(author_ids))
+        }
+        missing = {'author': [
+            author_id for author_id in author_ids
+            if self.scraper_handler.author_needs_request(authors.get(author_id), count_hit=False)
+        ]}
+        for kind, model, id_attr, obj_ids in (
+            ('category', models.Category, models.Category.category_id, category_ids),
+            ('tag', models.Tag, models.Tag.tag_id, tag_ids),
+        ):
+            stored = set(obj_id for obj_id, in model.select(id_attr).where(id_attr.in_(obj_ids)).tuples())
+            missing[kind] = [
+                obj_id for obj_id in obj_ids
+                if obj_id not in stored and not self.negative_cache.is_missing(kind, obj_id, count_hit=False)
+            ]
+        return missing
+
+    def store_references(self, responses):
+        models_by_kind = {
+            'category': (models.Category, models.Category.category_id),
+            'tag': (models.Tag, models.Tag.tag_id),
+        }
+        with self.database_manager.db.atomic():
+            for kind, obj_id, status_code, json_response in responses:
+                try:
+                    if kind == 'author':
+                        if json_response is None:
+                            self.scraper_handler.store_missing_author(obj_id, status_code)
+                        else:
+                            self.scraper_handler.store_author_response(obj_id, status_code, json_response)
+                    elif json_response is None:
+                        self.scraper_handler.store_missing_item(kind, obj_id, status_code)
+                    else:
+                        model, id_attr = models_by_kind[kind]
+                        fields = self.scraper_handler.extract_item_fields(json_response)
+                        self.scraper_handler.store_item(model, id_attr, obj_id, fields)
+                except (KeyError, TypeError) as e:
+                    # Left for the sync code path, which reports it like the sync engine does
+                    logger.warning("Unexpected %s %s data: %s", kind, obj_id, e)
+
+    def store_posts_page(self, json_response):
+        with self.database_manager.db.atomic():
+            return self.scraper_handler.parse_all_posts(json_response)
+
+    def store_post_data(self, post_data):
+        try:
+            return self.scraper_handler.parse_post_detail_from_data(post_data)
+        except Exception as e:
+            logger.error("Error occurred while parsing post detail for slug %s: %s", post_data.get('slug'), e)
+            return None, None, None, None
+
+    def store_search_results(self, search_by_keyword_instance, search_hits, posts_data):
+        search_items = list()
+        parsed_items = list()
+        with self.database_manager.db.atomic():
+            try:
+                for search_hit, post_data in zip(search_hits, posts_data):
+                    post_detail = (None, None, None, None) if post_data is None else self.store_post_data(post_data)
+                    search_item, data = self.scraper_handler.save_search_result(
+                        search_by_keyword=search_by_keyword_instance,
+                        search_hit=search_hit,
+                        post_detail=post_detail,
+                    )
+                    if search_item:
+                        search_items.append(search_item)
+                        parsed_items.append(data)
+            except Exception as e:
+                self.database_manager.db.rollback()
+                logger.error("Error occurred while saving search results: %s", e)
+            else:
+                self.scraper_handler.mark_search_completed(search_by_keyword_instance)
+        return search_items, parsed_items
@@ -0,0 +1,126 @@
+"""
+Compare the asyncio engine (AsyncScraperHandler) with the thread-based ScraperHandler.
+
+Each engine runs the full posts crawl and a keyword search against the mock TechCrunch
+server on freshly created tables. The stored rows and returned items of both runs are
+compared, and the run fails if they differ.
+
+Usage:
+    python benchmarks/bench_async.py --posts 500 --latency 0.02
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+
+from run_benchmarks import configure_environment  # noqa: E402
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Sync vs async scraping engine benchmark')
+    parser.add_argument('--posts', type=int, default=300)
+    parser.add_argument('--authors', type=int, default=40)
+    parser.add_argument('--tags', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds added to every mock response')
+    parser.add_argument('--jitter', type=float, default=0.01)
+    parser.add_argument('--keyword', type=str, default='startup')
+    parser.add_argument('--search-pages', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--db', choices=['sqlite', 'postgresql'], default='sqlite')
+    parser.add_argument('--db-name', type=str)
+    parser.add_argument('--db-user', type=str, default='')
+    parser.add_argument('--db-password', type=str, default='')
+    parser.add_argument('--db-host', type=str, default='localhost')
+    parser.add_argument('--db-port', type=int, default=5432)
+    return parser.parse_args()
+
+
+def snapshot(models, parsed_items):
+    # Everything the engines store or return, in a comparable form
+    return {
+        'posts': list(models.Post.select().order_by(models.Post.post_id).tuples()),
+        'authors': list(models.Author.select().order_by(models.Author.author_id).tuples()),
+        'categories': list(models.Category.select().order_by(models.Category.category_id).tuples()),
+        'tags': list(models.Tag.select().order_by(models.Tag.tag_id).tuples()),
+        'post_categories': sorted(models.PostCategory.select(
+            models.PostCategory.post, models.PostCategory.category).tuples()),
+        'post_tags': sorted(models.PostTag.select(models.PostTag.post, models.PostTag.tag).tuples()),
+        'search_items': [(item.post_id, item.slug, list(item.tag_ids))
+                         for item in parsed_items],
+    }
+
+
+def main():
+    args = parse_arguments()
+    work_dir = tempfile.mkdtemp(prefix='scraper_async_')
+    configure_environment(args, work_dir)
+
+    import models  # noqa: E402
+    import main as scraper_main
+    from async_scraper_handler import AsyncScraperHandler
+    from log_config import setup_logging
+    from mock_server import MockCorpus, MockTechCrunchServer
+    from scraper_handler import ScraperHandler
+
+    log_listener = setup_logging(level='WARNING')
+    database_manager = scraper_main.database_manager
+    corpus = MockCorpus(posts=args.posts, authors=args.authors, tags=args.tags, seed=args.seed)
+
+    def reset_tables():
+        database_manager.db.drop_tables(models.ALL_MODELS)
+        database_manager.create_tables(models.ALL_MODELS)
+        keyword, _ = models.Keyword.get_or_create(title=args.keyword)
+        return models.SearchByKeyword.create(keyword=keyword, page_count=args.search_pages)
+
+    def run_sync(url_formats):
+        scraper_handler = ScraperHandler(database_manager=database_manager, **url_formats)
+        scraper_handler.page_delay = 0
+        search_by_keyword = reset_tables()
+        start = time.perf_counter()
+        scraper_handler.fetch_all_pages()
+        crawl_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        _, parsed_items = scraper_handler.search_by_keyword(search_by_keyword)
+        return crawl_seconds, time.perf_counter() - start, snapshot(models, parsed_items)
+
+    def run_async(url_formats):
+        async_handler = AsyncScraperHandler(database_manager=database_manager, **url_formats)
+        search_by_keyword = reset_tables()
+        start = time.perf_counter()
+        asyncio.run(async_handler.fetch_all_pages())
+        crawl_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        _, parsed_items = asyncio.run(async_handler.search_by_keyword(search_by_keyword))
+        search_seconds = time.perf_counter() - start
+        # The writer thread holds its own connection; release it before reading the results
+        async_handler.close()
+        return crawl_seconds, search_seconds, snapshot(models, parsed_items)
+
+    with MockTechCrunchServer(corpus, latency=args.latency, jitter=args.jitter, seed=args.seed) as server:
+        url_formats = server.url_formats()
+        sync_crawl, sync_search, sync_result = run_sync(url_formats)
+        async_crawl, async_search, async_result = run_async(url_formats)
+
+    database_manager.close_connection()
+    log_listener.stop()
+
+    print(f"{'scenario':<20}{'sync s':>9}{'async s':>9}{'speedup':>9}")
+    for name, sync_seconds, async_seconds in (('fetch_all_pages', sync_crawl, async_crawl),
+                                              ('search_by_keyword', sync_search, async_search)):
+        print(f"{name:<20}{sync_seconds:>9.2f}{async_seconds:>9.2f}{sync_seconds / async_seconds:>8.1f}x")
+
+    mismatches = [key for key in sync_result if sync_result[key] != async_result[key]]
+    if mismatches:
+        print(f"Results differ: {', '.join(mismatches)}")
+        sys.exit(1)
+    print(f"Results identical: {len(sync_result['posts'])} posts, {len(sync_result['search_items'])} search items")
+
+
+if __name__ == '__main__':
+    main()
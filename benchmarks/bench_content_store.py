@@ -0,0 +1,148 @@
+"""
+Compare inline post bodies with the compressed, deduplicated content store.
+
+Loads the mock corpus bodies into Post (with a share of reposted duplicates), then
+measures database size and Post.content read latency for three layouts: inline text,
+zstd blobs, and zstd blobs compressed with a dictionary trained on the corpus.
+
+The mock corpus draws words from a small vocabulary, so its compression ratios are
+higher than real articles will reach; compare the layouts relative to each other.
+
+Usage:
+    python benchmarks/bench_content_store.py --posts 5000 --duplicate-rate 0.05
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+
+from run_benchmarks import configure_environment  # noqa: E402
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Inline vs content store benchmark')
+    parser.add_argument('--posts', type=int, default=3000)
+    parser.add_argument('--words-per-post', type=int, default=800)
+    parser.add_argument('--duplicate-rate', type=float, default=0.05,
+                        help='Share of posts whose body repeats an earlier post')
+    parser.add_argument('--reads', type=int, default=1000, help='Random single-post reads per layout')
+    parser.add_argument('--dictionary-size', type=int, default=112640)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--db', choices=['sqlite', 'postgresql'], default='sqlite')
+    parser.add_argument('--db-name', type=str)
+    parser.add_argument('--db-user', type=str, default='')
+    parser.add_argument('--db-password', type=str, default='')
+    parser.add_argument('--db-host', type=str, default='localhost')
+    parser.add_argument('--db-port', type=int, default=5432)
+    return parser.parse_args()
+
+
+def storage_bytes(database_manager, models):
+    # On-disk size of the post and content blob tables
+    db = database_manager.db
+    if database_manager.engine == 'postgresql':
+        tables = [models.Post, models.ContentBlob, models.ContentDictionary]
+        return sum(db.execute_sql('SELECT pg_total_relation_size(%s)', (model._meta.table_name,)).fetchone()[0]
+                   for model in tables)
+    db.execute_sql('VACUUM')
+    page_size = db.execute_sql('PRAGMA page_size').fetchone()[0]
+    return db.execute_sql('PRAGMA page_count').fetchone()[0] * page_size
+
+
+def main():
+    args = parse_arguments()
+    work_dir = tempfile.mkdtemp(prefix='scraper_content_store_')
+    configure_environment(args, work_dir)
+
+    import models  # noqa: E402
+    import main as scraper_main
+    from content_store import content_store, zstandard
+    from log_config import setup_logging
+    from mock_server import MockCorpus
+
+    log_listener = setup_logging(level='WARNING')
+    database_manager = scraper_main.database_manager
+    corpus = MockCorpus(posts=args.posts, authors=1, words_per_post=args.words_per_post, seed=args.seed)
+    rng = random.Random(args.seed)
+    bodies = {}
+    for post_id, post in corpus.posts.items():
+        if bodies and rng.random() < args.duplicate_rate:
+            bodies[post_id] = bodies[rng.choice(list(bodies))]
+        else:
+            bodies[post_id] = ' '.join(post['words'])
+    read_ids = [rng.choice(list(bodies)) for _ in range(args.reads)]
+
+    def load_inline():
+        database_manager.db.drop_tables(models.ALL_MODELS)
+        database_manager.create_tables(models.ALL_MODELS)
+        author = models.Author.create(name='author', description='', link='', position='')
+        now = datetime.datetime.now()
+        rows = [{
+            'post_id': post_id, 'created_date': now, 'modified_date': now, 'slug': post['slug'],
+            'status': 'publish', 'post_type': 'post', 'link': '', 'title': post['title'],
+            'raw_content': bodies[post_id], 'excerpt': '', 'author': author, 'featured_media_link': '',
+            'post_format': 'standard',
+        } for post_id, post in corpus.posts.items()]
+        with database_manager.db.atomic():
+            for index in range(0, len(rows), 500):
+                models.Post.insert_many(rows[index:index + 500]).execute()
+
+    def measure(name, prepare):
+        load_inline()
+        start = time.perf_counter()
+        prepare()
+        prepare_seconds = time.perf_counter() - start
+
+        latencies = []
+        for post_id in read_ids:
+            start = time.perf_counter()
+            content = models.Post.get_by_id(post_id).content
+            latencies.append(time.perf_counter() - start)
+            if content != bodies[post_id]:
+                print(f"{name}: post {post_id} read back different content")
+                sys.exit(1)
+
+        start = time.perf_counter()
+        for post in models.Post.select():
+            post.content
+        scan_seconds = time.perf_counter() - start
+        stats = content_store.stats()
+        return {
+            'layout': name,
+            'size': storage_bytes(database_manager, models),
+            'blobs': stats['blobs'],
+            'prepare': prepare_seconds,
+            'p50': statistics.median(latencies) * 1000,
+            'p95': statistics.quantiles(latencies, n=20)[-1] * 1000,
+            'scan': scan_seconds,
+        }
+
+    def train_and_migrate():
+        content_store.train_dictionary(sample_count=args.posts, size=args.dictionary_size)
+        content_store.migrate()
+
+    results = [measure('inline', lambda: None), measure('zstd', content_store.migrate)]
+    if zstandard is not None:
+        results.append(measure('zstd+dictionary', train_and_migrate))
+
+    database_manager.close_connection()
+    log_listener.stop()
+
+    raw_bytes = sum(len(body.encode('utf-8')) for body in bodies.values())
+    print(f"{args.posts} posts, {raw_bytes / 1e6:.1f} MB of body text, {len(set(bodies.values()))} distinct bodies")
+    print(f"{'layout':<18}{'size MB':>9}{'blobs':>7}{'migrate s':>11}{'read p50 ms':>13}{'read p95 ms':>13}{'scan s':>8}")
+    for result in results:
+        print(f"{result['layout']:<18}{result['size'] / 1e6:>9.2f}{result['blobs']:>7}{result['prepare']:>11.2f}"
+              f"{result['p50']:>13.3f}{result['p95']:>13.3f}{result['scan']:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Measure the memory held by the current run's parsed items with tracemalloc.
+
+Posts crawled from the mock TechCrunch server are loaded back the way a keyword run
+loads them and turned into parsed items twice: as the previous dicts holding the full
+post, author, categories and tags, and as ParsedPost records with a shared Taxonomy.
+The memory still allocated after each build is divided by the number of items. The run
+fails if a ParsedPost takes more than --max-bytes-per-item.
+
+Usage:
+    python benchmarks/bench_parsed_items.py --posts 2000
+    python benchmarks/bench_parsed_items.py --words-per-post 2000 --max-bytes-per-item 1536
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+
+from run_benchmarks import configure_environment  # noqa: E402
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Parsed item memory footprint benchmark')
+    parser.add_argument('--posts', type=int, default=1000)
+    parser.add_argument('--authors', type=int, default=40)
+    parser.add_argument('--tags', type=int, default=200)
+    parser.add_argument('--words-per-post', type=int, default=400)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--max-bytes-per-item', type=int, default=1536,
+                        help='Largest accepted footprint of one ParsedPost, taxonomy share included')
+    parser.add_argument('--db', choices=['sqlite', 'postgresql'], default='sqlite')
+    parser.add_argument('--db-name', type=str)
+    parser.add_argument('--db-user', type=str, default='')
+    parser.add_argument('--db-password', type=str, default='')
+    parser.add_argument('--db-host', type=str, default='localhost')
+    parser.add_argument('--db-port', type=int, default=5432)
+    return parser.parse_args()
+
+
+def legacy_parsed_item(post, author, categories, tags):
+    # The dict ScraperHandler.build_parsed_item returned before ParsedPost
+    return {
+        'post_id': post.post_id,
+        'title': post.title,
+        'created_date': post.created_date,
+        'modified_date': post.modified_date,
+        'slug': post.slug,
+        'status': post.status,
+        'post_type': post.post_type,
+        'link': post.link,
+        'content': post.content,
+        'excerpt': post.excerpt,
+        'author_id': post.author_id,
+        'featured_media_link': post.featured_media_link,
+        'post_format': post.post_format,
+        'post': post,
+        'author': author,
+        'categories': categories,
+        'tags': tags,
+    }
+
+
+def retained_bytes(build, load_post_detail, post_ids):
+    # Bytes still allocated once the items are built and the loaded rows they do not keep are freed
+    gc.collect()
+    tracemalloc.start()
+    items = [build(*load_post_detail(post_id)) for post_id in post_ids]
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, items
+
+
+def main():
+    args = parse_arguments()
+    work_dir = tempfile.mkdtemp(prefix='scraper_parsed_items_')
+    configure_environment(args, work_dir)
+
+    import models  # noqa: E402
+    import main as scraper_main
+    from log_config import setup_logging
+    from mock_server import MockCorpus, MockTechCrunchServer
+    from parsed_post import ParsedPost, Taxonomy
+    from scraper_handler import ScraperHandler
+
+    log_listener = setup_logging(level='WARNING')
+    database_manager = scraper_main.database_manager
+    database_manager.db.drop_tables(models.ALL_MODELS)
+    database_manager.create_tables(models.ALL_MODELS)
+    corpus = MockCorpus(posts=args.posts, authors=args.authors, tags=args.tags,
+                        words_per_post=args.words_per_post, seed=args.seed)
+
+    with MockTechCrunchServer(corpus, latency=0, seed=args.seed) as server:
+        scraper_handler = ScraperHandler(database_manager=database_manager, **server.url_formats())
+        scraper_handler.page_delay = 0
+        scraper_handler.fetch_all_pages()
+
+    post_ids = [post_id for post_id, in models.Post.select(models.Post.post_id).tuples()]
+    # Warm up peewee's query and model caches so they are not counted against either build
+    retained_bytes(legacy_parsed_item, scraper_handler.load_post_detail, post_ids[:10])
+
+    legacy_bytes, legacy_items = retained_bytes(legacy_parsed_item, scraper_handler.load_post_detail, post_ids)
+    del legacy_items
+    taxonomy = Taxonomy()
+    compact_bytes, compact_items = retained_bytes(
+        lambda post, author, categories, tags: ParsedPost.from_post(post, author, categories, tags, taxonomy),
+        scraper_handler.load_post_detail, post_ids,
+    )
+
+    database_manager.close_connection()
+    log_listener.stop()
+
+    items = len(post_ids)
+    print(f"{items} parsed items, {len(taxonomy)} interned authors/categories/tags")
+    print(f"{'representation':<16}{'total KiB':>11}{'bytes/item':>12}")
+    print(f"{'dict':<16}{legacy_bytes / 1024:>11.0f}{legacy_bytes / items:>12.0f}")
+    print(f"{'ParsedPost':<16}{compact_bytes / 1024:>11.0f}{compact_bytes / items:>12.0f}")
+    print(f"reduction: {legacy_bytes / compact_bytes:.1f}x")
+
+    if len(compact_items) != items or compact_bytes / items > args.max_bytes_per_item:
+        print(f"ParsedPost footprint above {args.max_bytes_per_item} bytes per item")
+        sys.exit(1)
+    print(f"ParsedPost footprint within {args.max_bytes_per_item} bytes per item")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Benchmark CooccurrenceIndex.related_posts on a corpus with very common tags.
+
+Every post carries a 'hot' tag (like 'startups' on a tech site) and a few tags drawn
+from a skewed (zipf-like) distribution. Related posts are looked up for random posts
+twice: with the shipped limits, where tags above RELATED_POSTS_MAX_TAG_POSTS never
+gather candidates, and with the limits lifted, which reads the hot tag's full posting
+list on every query.
+
+The run fails unless every returned score equals the post's exact shared-tag score,
+and a post tagged with nothing but the hot tag still gets related posts.
+
+Usage:
+    python benchmarks/bench_related_posts.py --posts 50000 --queries 200
+"""
+import argparse
+import datetime
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+
+from run_benchmarks import configure_environment  # noqa: E402
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='related_posts with high-frequency tags')
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--tags', type=int, default=2000)
+    parser.add_argument('--tags-per-post', type=int, default=5, help='Skewed tags per post, besides the hot tag')
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=3)
+    parser.add_argument('--db', choices=['sqlite', 'postgresql'], default='sqlite')
+    parser.add_argument('--db-name', type=str)
+    parser.add_argument('--db-user', type=str, default='')
+    parser.add_argument('--db-password', type=str, default='')
+    parser.add_argument('--db-host', type=str, default='localhost')
+    parser.add_argument('--db-port', type=int, default=5432)
+    return parser.parse_args()
+
+
+def build_corpus(models, args, rng):
+    # Tag 1 is on every post; the others follow a zipf-like popularity
+    models.Author.create(author_id=1, name='author', description='', link='', position='')
+    models.Tag.insert_many([
+        {'tag_id': tag_id, 'count': 0, 'name': f'tag-{tag_id}', 'description': '', 'link': '', 'slug': f'tag-{tag_id}'}
+        for tag_id in range(1, args.tags + 1)
+    ]).execute()
+
+    popularity = [1 / rank ** 1.1 for rank in range(1, args.tags)]
+    post_tags = {}
+    created = datetime.datetime(2024, 1, 1)
+    for start in range(1, args.posts + 1, 500):
+        post_ids = range(start, min(start + 500, args.posts + 1))
+        models.Post.insert_many([
+            {'post_id': post_id, 'created_date': created, 'modified_date': created, 'slug': f'post-{post_id}',
+             'status': 'publish', 'post_type': 'post', 'link': f'https://example.com/post-{post_id}',
+             'title': f'Post {post_id}', 'raw_content': '', 'excerpt': '', 'author': 1,
+             'featured_media_link': '', 'post_format': 'standard'}
+            for post_id in post_ids
+        ]).execute()
+        links = []
+        for post_id in post_ids:
+            tags = {1} | {tag_id + 2 for tag_id in rng.choices(range(args.tags - 1), popularity, k=args.tags_per_post)}
+            post_tags[post_id] = tags
+            links.extend({'post': post_id, 'tag': tag_id} for tag_id in tags)
+        models.PostTag.insert_many(links).execute()
+
+    # A post tagged with nothing but the hot tag
+    lonely_id = args.posts + 1
+    models.Post.create(post_id=lonely_id, created_date=created, modified_date=created, slug='lonely', status='publish',
+                       post_type='post', link='https://example.com/lonely', title='Lonely', content='', excerpt='',
+                       author=1, featured_media_link='', post_format='standard')
+    models.PostTag.create(post=lonely_id, tag=1)
+    post_tags[lonely_id] = {1}
+    return post_tags, lonely_id
+
+
+def exact_score(post_tags, frequencies, post_id, candidate_id):
+    return sum(1 / math.log(2 + frequencies[tag_id]) for tag_id in post_tags[post_id] & post_tags[candidate_id])
+
+
+def timed_queries(index, query_ids, **limits):
+    results = {}
+    start = time.perf_counter()
+    for post_id in query_ids:
+        results[post_id] = index.related_posts(post_id, **limits)
+    return results, (time.perf_counter() - start) / len(query_ids) * 1000
+
+
+def main():
+    args = parse_arguments()
+    work_dir = tempfile.mkdtemp(prefix='scraper_related_')
+    configure_environment(args, work_dir)
+
+    import models  # noqa: E402
+    import main as scraper_main
+    from constants import RELATED_POSTS_MAX_TAG_POSTS
+    from cooccurrence_index import CooccurrenceIndex
+    from log_config import setup_logging
+
+    log_listener = setup_logging(level='WARNING')
+    database_manager = scraper_main.database_manager
+    database_manager.db.drop_tables(models.ALL_MODELS)
+    database_manager.create_tables(models.ALL_MODELS)
+    rng = random.Random(args.seed)
+
+    with database_manager.db.atomic():
+        post_tags, lonely_id = build_corpus(models, args, rng)
+    index = CooccurrenceIndex(database_manager)
+    index.rebuild()
+
+    frequencies = {}
+    for tags in post_tags.values():
+        for tag_id in tags:
+            frequencies[tag_id] = frequencies.get(tag_id, 0) + 1
+    query_ids = rng.sample(range(1, args.posts + 1), min(args.queries, args.posts))
+
+    capped, capped_ms = timed_queries(index, query_ids)
+    full, full_ms = timed_queries(index, query_ids, max_query_tags=len(frequencies), max_tag_posts=args.posts + 1)
+    lonely = index.related_posts(lonely_id)
+
+    failures = []
+    wrong = [(post_id, post.post_id) for post_id, related in capped.items() for post, score in related
+             if not math.isclose(score, exact_score(post_tags, frequencies, post_id, post.post_id))]
+    if wrong:
+        failures.append(f"{len(wrong)} related posts scored differently from their shared tags, e.g. {wrong[0]}")
+    if not lonely:
+        failures.append("a post with only the hot tag got no related posts")
+    overlap = sum(len({post.post_id for post, _ in capped[post_id]} & {post.post_id for post, _ in full[post_id]})
+                  for post_id in query_ids) / max(1, sum(len(full[post_id]) for post_id in query_ids))
+
+    database_manager.close_connection()
+    log_listener.stop()
+
+    print(f"{args.posts} posts, {args.tags} tags, hot tag on {frequencies[1]} posts "
+          f"(threshold {RELATED_POSTS_MAX_TAG_POSTS}), {len(query_ids)} queries")
+    print(f"{'related_posts':<30}{'ms/query':>10}")
+    print(f"{'rare tags gather candidates':<30}{capped_ms:>10.2f}")
+    print(f"{'every tag gathers candidates':<30}{full_ms:>10.2f}")
+    print(f"speedup: {full_ms / capped_ms:.1f}x, top results shared with the full scan: {overlap:.0%}")
+
+    if failures:
+        print(f"Related posts check failed: {'; '.join(failures)}")
+        sys.exit(1)
+    print("Related posts scored exactly, without reading the hot tag's posting list")
+
+
+if __name__ == '__main__':
+    main()
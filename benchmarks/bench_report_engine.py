@@ -0,0 +1,79 @@
+"""
+Benchmark the vectorized ReportEngine against the per-row Python counting it replaced.
+
+Usage:
+    python benchmarks/bench_report_engine.py --rows 1000000
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from report_engine import ReportEngine  # noqa: E402
+
+
+def build_links(rows, posts, labels, seed):
+    # Synthetic link table with a skewed (zipf-like) label distribution, like real tags
+    rng = np.random.default_rng(seed)
+    post_ids = rng.integers(1, posts + 1, size=rows)
+    label_ids = np.minimum(rng.zipf(1.3, size=rows), labels)
+    label_names = {label_id: f'label-{label_id}' for label_id in range(1, labels + 1)}
+    start = datetime.datetime(2010, 1, 1)
+    post_dates = {
+        post_id: start + datetime.timedelta(minutes=int(offset))
+        for post_id, offset in zip(range(1, posts + 1), rng.integers(0, 14 * 365 * 24 * 60, size=posts))
+    }
+    return post_ids, label_ids, label_names, post_dates
+
+
+def naive_counts(post_ids, label_ids, label_names):
+    counts = defaultdict(int)
+    for label_id in label_ids.tolist():
+        counts[label_names[label_id]] += 1
+    return counts
+
+
+def timed(label, func, results):
+    start = time.perf_counter()
+    value = func()
+    results.append((label, time.perf_counter() - start))
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ReportEngine benchmark')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Number of post/label link rows')
+    parser.add_argument('--posts', type=int, default=250_000, help='Number of distinct posts')
+    parser.add_argument('--labels', type=int, default=5_000, help='Number of distinct labels')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    post_ids, label_ids, label_names, post_dates = build_links(args.rows, args.posts, args.labels, args.seed)
+    results = []
+
+    naive = timed('naive dict counts', lambda: naive_counts(post_ids, label_ids, label_names), results)
+    engine = timed(
+        'frame build', lambda: ReportEngine(post_ids, label_ids, label_names, post_dates=post_dates), results
+    )
+    counts = timed('counts', engine.counts, results)
+    timed('top_n(20)', lambda: engine.top_n(20), results)
+    for period in ('day', 'week', 'month'):
+        timed(f'histogram({period})', lambda: engine.histogram(period), results)
+    timed('cooccurrence', engine.cooccurrence, results)
+
+    assert {name: count for name, count in counts.items() if count} == dict(naive)
+
+    print(f"{args.rows:,} link rows, {args.posts:,} posts, {args.labels:,} labels")
+    print(f"{'operation':<22}{'seconds':>10}")
+    for label, seconds in results:
+        print(f"{label:<22}{seconds:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
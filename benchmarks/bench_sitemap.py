@@ -0,0 +1,183 @@
+"""
+Compare sitemap discovery with paging the posts API to find new and changed posts.
+
+A database is filled from the mock TechCrunch server, then the corpus changes: some
+posts are edited and new ones are published. Both ways of catching up are measured
+in requests and bytes:
+- paging: every page of /wp/v2/posts, the only way the API tells which posts changed,
+- sitemap: the sitemap index and post sitemaps streamed by SitemapDiscovery, plus the
+  detail requests of the queued slugs processed by a CrawlWorker.
+
+The run fails unless discovery queues exactly the new and edited slugs, the database
+(posts, their category and tag links, and the co-occurrence index) matches the corpus
+afterwards, and a second discovery queues nothing. The site's time
+zone defaults to Pacific time, so a lastmod compared with the site-local modified date
+instead of the GMT one would mark every stored post changed.
+
+Usage:
+    python benchmarks/bench_sitemap.py --posts 2000 --edited 20 --added 30
+    python benchmarks/bench_sitemap.py --gzip-sitemaps --since-last-run
+    python benchmarks/bench_sitemap.py --utc-offset 0
+"""
+import argparse
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+
+from run_benchmarks import configure_environment  # noqa: E402
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Sitemap discovery vs posts API paging')
+    parser.add_argument('--posts', type=int, default=1000)
+    parser.add_argument('--edited', type=int, default=20, help='Stored posts edited after the first crawl')
+    parser.add_argument('--added', type=int, default=30, help='Posts published after the first crawl')
+    parser.add_argument('--words-per-post', type=int, default=400)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--utc-offset', type=float, default=-8, help="Hours between the site's time zone and UTC")
+    parser.add_argument('--gzip-sitemaps', action='store_true', help='Serve the post sitemaps as .xml.gz')
+    parser.add_argument('--since-last-run', action='store_true',
+                        help='Skip the sitemaps whose index lastmod predates the first crawl')
+    parser.add_argument('--db', choices=['sqlite', 'postgresql'], default='sqlite')
+    parser.add_argument('--db-name', type=str)
+    parser.add_argument('--db-user', type=str, default='')
+    parser.add_argument('--db-password', type=str, default='')
+    parser.add_argument('--db-host', type=str, default='localhost')
+    parser.add_argument('--db-port', type=int, default=5432)
+    return parser.parse_args()
+
+
+class TrafficMeter:
+    # Requests and bytes the mock server answered since the last reset
+    def __init__(self, server):
+        self.server = server
+        self.reset()
+
+    def reset(self):
+        self.requests = self.server.requests_served
+        self.bytes = self.server.bytes_served
+
+    def read(self):
+        return self.server.requests_served - self.requests, self.server.bytes_served - self.bytes
+
+
+def mismatched_posts(models, corpus):
+    # Slugs whose stored title or modification times differ from the corpus, or that are not stored
+    query = models.Post.select(models.Post.slug, models.Post.title, models.Post.modified_date, models.Post.modified_gmt)
+    stored = {slug: fields for slug, *fields in query.tuples()}
+    return sorted(post['slug'] for post in corpus.posts.values()
+                  if stored.get(post['slug']) != [post['title'], datetime.fromisoformat(post['modified']),
+                                                  datetime.fromisoformat(post['modified_gmt'])])
+
+
+def mismatched_links(models, corpus):
+    # Slugs whose stored categories or tags differ from the corpus
+    stored = {}
+    for link_model, target, key in ((models.PostCategory, models.PostCategory.category, 'categories'),
+                                    (models.PostTag, models.PostTag.tag, 'tags')):
+        for slug, obj_id in link_model.select(models.Post.slug, target).join(models.Post).tuples():
+            stored.setdefault((slug, key), set()).add(obj_id)
+    return sorted(post['slug'] for post in corpus.posts.values()
+                  if any(stored.get((post['slug'], key), set()) != set(post[key]) for key in ('categories', 'tags')))
+
+
+def cooccurrence_counts(models):
+    return (sorted(models.TagCooccurrence.select(models.TagCooccurrence.tag, models.TagCooccurrence.other_tag,
+                                                 models.TagCooccurrence.count).tuples()),
+            sorted(models.CategoryTagCooccurrence.select(models.CategoryTagCooccurrence.category,
+                                                         models.CategoryTagCooccurrence.tag,
+                                                         models.CategoryTagCooccurrence.count).tuples()))
+
+
+def main():
+    args = parse_arguments()
+    work_dir = tempfile.mkdtemp(prefix='scraper_sitemap_')
+    configure_environment(args, work_dir)
+
+    import models  # noqa: E402
+    import main as scraper_main
+    from log_config import setup_logging
+    from mock_server import MockCorpus, MockTechCrunchServer
+    from scraper_handler import ScraperHandler
+    from sitemap_discovery import SitemapDiscovery
+    from work_queue import CrawlWorker, WorkQueue
+
+    log_listener = setup_logging(level='WARNING')
+    database_manager = scraper_main.database_manager
+    database_manager.db.drop_tables(models.ALL_MODELS)
+    database_manager.create_tables(models.ALL_MODELS)
+    corpus = MockCorpus(posts=args.posts, words_per_post=args.words_per_post, seed=args.seed,
+                        utc_offset_hours=args.utc_offset)
+    failures = []
+
+    with MockTechCrunchServer(corpus, latency=0, seed=args.seed, gzip_sitemaps=args.gzip_sitemaps) as server:
+        scraper_handler = ScraperHandler(database_manager=database_manager, **server.url_formats())
+        scraper_handler.page_delay = 0
+        work_queue = WorkQueue(database_manager)
+        discovery = SitemapDiscovery(scraper_handler, work_queue, server.base_url + '/sitemap.xml')
+        meter = TrafficMeter(server)
+        scraper_handler.fetch_all_pages()
+
+        # Editors touch the oldest posts; new posts are published after every stored one
+        first_crawl = max(datetime.fromisoformat(post['modified_gmt']) for post in corpus.posts.values())
+        edited = list(corpus.posts)[:args.edited]
+        corpus.edit_posts(edited, modified=datetime(2030, 1, 1))
+        added = corpus.add_posts(args.added, created_after=datetime(2030, 1, 2))
+        expected = {corpus.posts[post_id]['slug'] for post_id in edited} | {post['slug'] for post in added}
+
+        meter.reset()
+        page = 1
+        while scraper_handler.fetch_posts_page(page) is not None:
+            page += 1
+        paging_requests, paging_bytes = meter.read()
+
+        meter.reset()
+        stats = discovery.discover(since=first_crawl if args.since_last_run else None)
+        discovery_requests, discovery_bytes = meter.read()
+        queued = {task.key for task in models.CrawlTask.select().where(models.CrawlTask.status == 'pending')}
+        meter.reset()
+        CrawlWorker(scraper_handler, work_queue).run()
+        detail_requests, detail_bytes = meter.read()
+
+        repeat = discovery.discover()
+
+    if queued != expected:
+        failures.append(f"queued {len(queued)} slugs, expected {len(expected)} "
+                        f"({len(queued - expected)} unexpected, {len(expected - queued)} missing)")
+    mismatched = mismatched_posts(models, corpus)
+    if mismatched:
+        failures.append(f"{len(mismatched)} posts differ from the corpus, e.g. {mismatched[0]}")
+    mismatched = mismatched_links(models, corpus)
+    if mismatched:
+        failures.append(f"{len(mismatched)} posts have other categories or tags than the corpus, e.g. {mismatched[0]}")
+    incremental = cooccurrence_counts(models)
+    scraper_handler.cooccurrence_index.rebuild()
+    if incremental != cooccurrence_counts(models):
+        failures.append("the co-occurrence index differs from a rebuild")
+    if repeat['queued']:
+        failures.append(f"a second discovery queued {repeat['queued']} slugs")
+
+    database_manager.close_connection()
+    log_listener.stop()
+
+    print(f"{len(corpus.posts)} posts, {len(edited)} edited, {len(added)} added; "
+          f"{stats['sitemaps']} sitemaps read, {stats['sitemaps_skipped']} skipped")
+    print(f"{'catch-up':<26}{'requests':>10}{'KiB':>10}")
+    print(f"{'paging /wp/v2/posts':<26}{paging_requests:>10}{paging_bytes / 1024:>10.0f}")
+    print(f"{'sitemap discovery':<26}{discovery_requests:>10}{discovery_bytes / 1024:>10.0f}")
+    print(f"{'  + queued post details':<26}{detail_requests:>10}{detail_bytes / 1024:>10.0f}")
+    print(f"bytes saved: {paging_bytes / (discovery_bytes + detail_bytes):.1f}x")
+
+    if failures:
+        print(f"Sitemap discovery check failed: {'; '.join(failures)}")
+        sys.exit(1)
+    print("Sitemap discovery queued exactly the new and changed posts")
+
+
+if __name__ == '__main__':
+    main()
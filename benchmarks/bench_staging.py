@@ -0,0 +1,124 @@
+"""
+Compare row-by-row ingestion with two-phase staging (CSV files, then bulk load).
+
+The row-by-row run is ScraperHandler.fetch_all_pages against the mock TechCrunch server.
+The staged run writes the same crawl to CSV segments (StagingWriter) and loads them
+(StagingLoader, COPY FROM STDIN on Postgres). Both runs start from empty tables; the
+stored rows are compared and the run fails if they differ. With --content-store both
+runs store post bodies in the content store, so the bulk load must leave the same blobs
+behind as row-by-row storing. Loading the staged files a second time checks that already
+loaded segments are skipped.
+
+Usage:
+    python benchmarks/bench_staging.py --posts 2000 --latency 0.005
+    python benchmarks/bench_staging.py --content-store
+    python benchmarks/bench_staging.py --db postgresql --db-name scraper_bench --db-user postgres
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+
+from run_benchmarks import configure_environment  # noqa: E402
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Row-by-row vs staged bulk ingestion benchmark')
+    parser.add_argument('--posts', type=int, default=1000)
+    parser.add_argument('--authors', type=int, default=60)
+    parser.add_argument('--tags', type=int, default=300)
+    parser.add_argument('--latency', type=float, default=0.005, help='Seconds added to every mock response')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--content-store', action='store_true', help='Store post bodies in the content store')
+    parser.add_argument('--db', choices=['sqlite', 'postgresql'], default='sqlite')
+    parser.add_argument('--db-name', type=str)
+    parser.add_argument('--db-user', type=str, default='')
+    parser.add_argument('--db-password', type=str, default='')
+    parser.add_argument('--db-host', type=str, default='localhost')
+    parser.add_argument('--db-port', type=int, default=5432)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    work_dir = tempfile.mkdtemp(prefix='scraper_staging_')
+    configure_environment(args, work_dir)
+
+    import models  # noqa: E402
+    import main as scraper_main
+    from content_store import content_store
+    from log_config import setup_logging
+    from mock_server import MockCorpus, MockTechCrunchServer
+    from scraper_handler import ScraperHandler
+    from staging import STAGED_TABLES, StagingLoader, StagingWriter
+
+    log_listener = setup_logging(level='WARNING')
+    database_manager = scraper_main.database_manager
+    content_store.enabled = args.content_store
+    corpus = MockCorpus(posts=args.posts, authors=args.authors, tags=args.tags, seed=args.seed)
+
+    def reset_tables():
+        database_manager.db.drop_tables(models.ALL_MODELS)
+        database_manager.create_tables(models.ALL_MODELS)
+
+    def snapshot():
+        # Stored rows of every staged table, without surrogate ids of the link tables
+        result = {}
+        for file_name, model_name, columns in STAGED_TABLES:
+            model = getattr(models, model_name)
+            result[file_name] = sorted(model.select(*[model._meta.columns[column] for column in columns]).tuples())
+        # Where each body is stored: inline, or the content store blob it references
+        result['post_bodies'] = sorted(models.Post.select(models.Post.post_id, models.Post.content_blob).tuples())
+        result['blobs'] = sorted(models.ContentBlob.select(models.ContentBlob.content_hash).tuples())
+        return result
+
+    with MockTechCrunchServer(corpus, latency=args.latency, jitter=args.jitter, seed=args.seed) as server:
+        scraper_handler = ScraperHandler(database_manager=database_manager, **server.url_formats())
+        scraper_handler.page_delay = 0
+
+        reset_tables()
+        start = time.perf_counter()
+        scraper_handler.fetch_all_pages()
+        row_seconds = time.perf_counter() - start
+        row_result = snapshot()
+
+        reset_tables()
+        staging_dir = os.path.join(work_dir, 'staging')
+        start = time.perf_counter()
+        StagingWriter(scraper_handler, staging_dir).run()
+        stage_seconds = time.perf_counter() - start
+
+    loader = StagingLoader(database_manager, staging_dir)
+    start = time.perf_counter()
+    stats = loader.load()
+    load_seconds = time.perf_counter() - start
+    staged_result = snapshot()
+    reload_stats = loader.load()
+
+    database_manager.close_connection()
+    log_listener.stop()
+
+    rows = sum(len(row_result[file_name]) for file_name, _, _ in STAGED_TABLES)
+    print(f"{args.posts} posts, {rows} rows, {args.db}, bodies {'in the content store' if args.content_store else 'inline'}")
+    print(f"{'phase':<24}{'seconds':>9}{'rows/s':>11}")
+    print(f"{'row-by-row crawl':<24}{row_seconds:>9.2f}{rows / row_seconds:>11.0f}")
+    print(f"{'staging crawl':<24}{stage_seconds:>9.2f}{stats['rows_staged'] / stage_seconds:>11.0f}")
+    print(f"{'bulk load':<24}{load_seconds:>9.2f}{stats['rows_inserted'] / load_seconds:>11.0f}")
+    print(f"{'staged total':<24}{stage_seconds + load_seconds:>9.2f}{rows / (stage_seconds + load_seconds):>11.0f}")
+    print(f"segments loaded: {stats['segments']}, on re-run: {reload_stats['segments']}")
+
+    mismatches = [name for name in row_result if row_result[name] != staged_result[name]]
+    if mismatches or reload_stats['segments']:
+        print(f"Results differ: {', '.join(mismatches) or 'segments loaded twice'}")
+        sys.exit(1)
+    print("Results identical")
+
+
+if __name__ == '__main__':
+    main()
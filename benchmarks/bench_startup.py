@@ -0,0 +1,132 @@
+"""
+Enforce the CLI startup budget.
+
+Imports main the way `python main.py` does, under `python -X importtime`, and fails when:
+- the import takes longer than --max-import-ms (best of --repeat runs),
+- a heavy backend (plotting, Excel, HTML parsing, NumPy, httpx) is loaded at startup, or
+- a simple command (--queue-status) runs more than --max-statements SQL statements,
+  i.e. the schema is initialized again although its recorded version is current.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --max-import-ms 150 --repeat 10
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, PROJECT_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+from run_benchmarks import configure_environment  # noqa: E402
+
+# Modules only some commands need; importing them at startup is a regression
+LAZY_MODULES = ('matplotlib', 'openpyxl', 'bs4', 'numpy', 'httpx', 'asyncio')
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+# Counts the statements of one CLI run; printed last so the parent process can read it
+STATEMENT_COUNTER = """
+import runpy, sys
+import models
+statements = []
+models.main.database_manager.db.query_listeners.append(lambda sql, seconds: statements.append(sql))
+sys.argv = ['main.py'] + sys.argv[1:]
+try:
+    runpy.run_path({main_path!r}, run_name='__main__')
+finally:
+    print(f'statements={{len(statements)}}')
+"""
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='CLI startup budget')
+    parser.add_argument('--max-import-ms', type=float, default=250.0,
+                        help='Budget for importing main and everything it imports')
+    parser.add_argument('--max-statements', type=int, default=5,
+                        help='Budget for the SQL statements of --queue-status once the schema is initialized')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='Slowest project modules listed')
+    parser.add_argument('--db', choices=['sqlite', 'postgresql'], default='sqlite')
+    parser.add_argument('--db-name', type=str)
+    parser.add_argument('--db-user', type=str, default='')
+    parser.add_argument('--db-password', type=str, default='')
+    parser.add_argument('--db-host', type=str, default='localhost')
+    parser.add_argument('--db-port', type=int, default=5432)
+    return parser.parse_args()
+
+
+def import_profile(env):
+    # (module, cumulative microseconds, depth) of every import made while importing main
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import models'],
+                            env=env, cwd=PROJECT_DIR, capture_output=True, text=True, check=True)
+    profile = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            profile.append((match.group(4), int(match.group(2)), len(match.group(3)) // 2))
+    return profile
+
+
+def run_command(env, *arguments):
+    # Run main.py with `arguments`; returns (seconds, SQL statements executed)
+    script = STATEMENT_COUNTER.format(main_path=os.path.join(PROJECT_DIR, 'main.py'))
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', script, *arguments],
+                            env=env, cwd=PROJECT_DIR, capture_output=True, text=True)
+    seconds = time.perf_counter() - start
+    match = re.search(r'statements=(\d+)', result.stdout)
+    if result.returncode != 0 or match is None:
+        print(result.stdout, result.stderr, sep='\n')
+        sys.exit(1)
+    return seconds, int(match.group(1))
+
+
+def main():
+    args = parse_arguments()
+    work_dir = tempfile.mkdtemp(prefix='scraper_startup_')
+    configure_environment(args, work_dir)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([PROJECT_DIR, BENCHMARK_DIR]))
+
+    profiles = [import_profile(env) for _ in range(args.repeat)]
+    # Interpreter startup (site, encodings) is not counted: only the import of models and main
+    totals = [next(microseconds for module, microseconds, depth in profile if module == 'models' and depth == 0)
+              for profile in profiles]
+    best = profiles[totals.index(min(totals))]
+    import_ms = min(totals) / 1000
+    loaded = {module.split('.')[0] for module, _, _ in best}
+    eager = sorted(module for module in LAZY_MODULES if module in loaded)
+
+    init_seconds, init_statements = run_command(env, '--init-db')
+    command_seconds, command_statements = run_command(env, '--queue-status')
+
+    print(f"import main: {import_ms:.0f} ms (best of {args.repeat}, budget {args.max_import_ms:.0f} ms)")
+    # Project modules, slowest first (cumulative, so a module includes what it imports)
+    project_modules = {name[:-3] for name in os.listdir(PROJECT_DIR) if name.endswith('.py')} - {'models', 'main'}
+    slowest = sorted((entry for entry in best if entry[0] in project_modules), key=lambda entry: -entry[1])
+    for module, microseconds, _ in slowest[:args.top]:
+        print(f"  {module:<28}{microseconds / 1000:>8.1f} ms")
+    print(f"--init-db: {init_seconds:.2f} s, {init_statements} statements")
+    print(f"--queue-status: {command_seconds:.2f} s, {command_statements} statements "
+          f"(budget {args.max_statements})")
+
+    failures = []
+    if import_ms > args.max_import_ms:
+        failures.append(f"import took {import_ms:.0f} ms")
+    if eager:
+        failures.append(f"loaded at startup: {', '.join(eager)}")
+    if command_statements > args.max_statements:
+        failures.append(f"--queue-status ran {command_statements} statements")
+    if failures:
+        print(f"Startup budget exceeded: {'; '.join(failures)}")
+        sys.exit(1)
+    print("Startup within budget")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Run several crawl worker processes against one database and the mock TechCrunch server.
+
+Queues every posts listing page, starts N worker processes that share the queue through
+the CrawlTask table, and checks that every page was processed exactly once and every
+post stored. A task left leased by a worker that died on its last attempt must end up
+failed instead of being leased again. Use Postgres to exercise FOR UPDATE SKIP LOCKED; SQLite serializes writers.
+
+Usage:
+    python benchmarks/bench_work_queue.py --workers 4 --posts 400
+    python benchmarks/bench_work_queue.py --db postgresql --db-name scraper_bench --db-user postgres
+"""
+import argparse
+import datetime
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+sys.path.insert(0, BENCHMARK_DIR)
+
+from run_benchmarks import configure_environment  # noqa: E402
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Distributed crawl queue benchmark')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--posts', type=int, default=300)
+    parser.add_argument('--authors', type=int, default=40)
+    parser.add_argument('--tags', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.01)
+    parser.add_argument('--jitter', type=float, default=0.005)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--db', choices=['sqlite', 'postgresql'], default='sqlite')
+    parser.add_argument('--db-name', type=str)
+    parser.add_argument('--db-user', type=str, default='')
+    parser.add_argument('--db-password', type=str, default='')
+    parser.add_argument('--db-host', type=str, default='localhost')
+    parser.add_argument('--db-port', type=int, default=5432)
+    return parser.parse_args()
+
+
+def run_worker(url_formats, worker_id, results):
+    # Runs in a child process; the environment set by configure_environment is inherited
+    import models  # noqa: F401  (imports main, which connects using benchmark_settings)
+    import main as scraper_main
+    from scraper_handler import ScraperHandler
+    from work_queue import CrawlWorker, WorkQueue
+
+    scraper_handler = ScraperHandler(database_manager=scraper_main.database_manager, **url_formats)
+    scraper_handler.page_delay = 0
+    work_queue = WorkQueue(scraper_main.database_manager, worker_id=worker_id)
+    results[worker_id] = CrawlWorker(scraper_handler, work_queue).run()
+
+
+def main():
+    args = parse_arguments()
+    work_dir = tempfile.mkdtemp(prefix='scraper_work_queue_')
+    configure_environment(args, work_dir)
+
+    import models  # noqa: E402
+    import main as scraper_main
+    from log_config import setup_logging
+    from constants import WORK_MAX_ATTEMPTS
+    from mock_server import MockCorpus, MockTechCrunchServer, POSTS_PER_PAGE
+    from work_queue import FAILED, LEASED, WorkQueue
+
+    log_listener = setup_logging(level='WARNING')
+    database_manager = scraper_main.database_manager
+    database_manager.db.drop_tables(models.ALL_MODELS)
+    database_manager.create_tables(models.ALL_MODELS)
+
+    corpus = MockCorpus(posts=args.posts, authors=args.authors, tags=args.tags, seed=args.seed)
+    page_count = -(-args.posts // POSTS_PER_PAGE)
+    WorkQueue(database_manager).enqueue_pages(1, page_count)
+    # A task whose worker was killed on its last attempt, its lease long expired
+    abandoned = models.CrawlTask.create(
+        kind='post', key='abandoned-post', status=LEASED, attempts=WORK_MAX_ATTEMPTS, lease_owner='dead-worker',
+        lease_expires_at=datetime.datetime.now() - datetime.timedelta(hours=1),
+    )
+    # Children open their own connections
+    database_manager.close_connection()
+
+    context = multiprocessing.get_context('spawn')
+    with MockTechCrunchServer(corpus, latency=args.latency, jitter=args.jitter,
+                              error_rate=args.error_rate, seed=args.seed) as server, context.Manager() as manager:
+        results = manager.dict()
+        processes = [
+            context.Process(target=run_worker, args=(server.url_formats(), f'worker-{index}', results))
+            for index in range(args.workers)
+        ]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        seconds = time.perf_counter() - start
+        processed = dict(results)
+
+    counts = WorkQueue(database_manager).status_counts()
+    claimed_twice = models.CrawlTask.select().where(
+        (models.CrawlTask.attempts > 1) & (models.CrawlTask.id != abandoned.id)
+    ).count()
+    stored_posts = models.Post.select().count()
+    abandoned = models.CrawlTask.get_by_id(abandoned.id)
+    database_manager.close_connection()
+    log_listener.stop()
+
+    print(f"{args.workers} workers, {page_count} pages, {seconds:.2f}s ({page_count / seconds:.1f} pages/s)")
+    for worker_id, count in sorted(processed.items()):
+        print(f"  {worker_id}: {count} tasks")
+    print(f"task status: {counts}")
+    print(f"tasks claimed more than once: {claimed_twice}")
+    print(f"posts stored: {stored_posts} of {args.posts}")
+    print(f"abandoned task: {abandoned.status} after {abandoned.attempts} attempts")
+    if (sum(processed.values()) != page_count or stored_posts != args.posts
+            or abandoned.status != FAILED or abandoned.attempts != WORK_MAX_ATTEMPTS):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
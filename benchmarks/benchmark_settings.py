@@ -0,0 +1,11 @@
+# Settings module used by run_benchmarks.py (selected through SCRAPER_SETTINGS)
+import os
+
+DATABASE = {
+    'engine': os.environ.get('BENCHMARK_DB_ENGINE', 'sqlite'),
+    'name': os.environ.get('BENCHMARK_DB_NAME', 'benchmark.sqlite3'),
+    'user': os.environ.get('BENCHMARK_DB_USER', ''),
+    'password': os.environ.get('BENCHMARK_DB_PASSWORD', ''),
+    'host': os.environ.get('BENCHMARK_DB_HOST', 'localhost'),
+    'port': int(os.environ.get('BENCHMARK_DB_PORT', 5432)),
+}
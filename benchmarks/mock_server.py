@@ -0,0 +1,331 @@
+"""
+In-process mock of the TechCrunch WordPress REST API, sitemaps and search pages.
+
+The corpus is generated deterministically from a seed, so two runs with the same
+options serve identical data and their benchmark numbers are comparable.
+"""
+import gzip
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlparse
+
+POSTS_PER_PAGE = 10
+SEARCH_RESULTS_PER_PAGE = 10
+SITEMAP_NAMESPACE = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+WORDS = (
+    'startup funding round series investors platform cloud security data model launch '
+    'product market growth revenue customers enterprise developer open source mobile app '
+    'hardware robotics climate fintech crypto health biotech policy regulation acquisition'
+).split()
+
+
+class MockCorpus:
+    # Dates are in the site's time zone, `utc_offset_hours` from UTC (e.g. -8 for Pacific time);
+    # the *_gmt fields are the same instants in UTC, as WordPress reports them
+    def __init__(self, posts=500, authors=50, categories=20, tags=300, missing_author_rate=0.05,
+                 words_per_post=400, seed=1, utc_offset_hours=0):
+        self.rng = rng = random.Random(seed)
+        self.posts = {}
+        self.slugs = {}
+        self.missing_authors = {author_id for author_id in range(1, authors + 1)
+                                if rng.random() < missing_author_rate}
+        self.authors = authors
+        self.categories = categories
+        self.tags = tags
+        self.words_per_post = words_per_post
+        self.utc_offset = timedelta(hours=utc_offset_hours)
+        self.add_posts(posts)
+
+    def add_posts(self, count, created_after=datetime(2015, 1, 1)):
+        """
+        Publish `count` new posts created in the nine years after `created_after`.
+
+        Returns:
+            list: The new posts.
+        """
+        rng = self.rng
+        new_posts = []
+        for post_id in range(len(self.posts) + 1, len(self.posts) + count + 1):
+            created = created_after + timedelta(minutes=rng.randrange(9 * 365 * 24 * 60))
+            modified = created + timedelta(hours=rng.randrange(48))
+            words = [rng.choice(WORDS) for _ in range(self.words_per_post)]
+            post = {
+                'id': post_id,
+                'slug': f'post-{post_id}-{words[0]}-{words[1]}',
+                'date': created.strftime('%Y-%m-%dT%H:%M:%S'),
+                'date_gmt': (created - self.utc_offset).strftime('%Y-%m-%dT%H:%M:%S'),
+                'modified': modified.strftime('%Y-%m-%dT%H:%M:%S'),
+                'modified_gmt': (modified - self.utc_offset).strftime('%Y-%m-%dT%H:%M:%S'),
+                'author': rng.randint(1, self.authors),
+                'categories': rng.sample(range(1, self.categories + 1), rng.randint(1, 3)),
+                'tags': rng.sample(range(1, self.tags + 1), rng.randint(2, 6)),
+                'title': ' '.join(words[:8]).capitalize(),
+                'words': words,
+            }
+            self.posts[post_id] = post
+            self.slugs[post['slug']] = post_id
+            new_posts.append(post)
+        return new_posts
+
+    def edit_posts(self, post_ids, modified):
+        # Retitle and retag posts and move their modified date to `modified` (site time), as an editor's update would
+        for post_id in post_ids:
+            post = self.posts[post_id]
+            post['title'] = f'Updated: {post["title"]}'
+            post['categories'] = self.rng.sample(range(1, self.categories + 1), self.rng.randint(1, 3))
+            post['tags'] = post['tags'][1:] + [self.rng.choice([tag_id for tag_id in range(1, self.tags + 1)
+                                                                if tag_id not in post['tags']])]
+            post['modified'] = modified.strftime('%Y-%m-%dT%H:%M:%S')
+            post['modified_gmt'] = (modified - self.utc_offset).strftime('%Y-%m-%dT%H:%M:%S')
+
+    def search(self, keyword):
+        # Posts whose title contains the keyword, newest id first
+        keyword = keyword.lower()
+        return [post for post in sorted(self.posts.values(), key=lambda post: -post['id'])
+                if keyword in post['title'].lower()]
+
+
+class MockTechCrunchServer:
+    """
+    Serve the WordPress endpoints used by ScraperHandler from a background thread.
+
+    Args:
+        corpus (MockCorpus): The posts, authors and taxonomies to serve.
+        latency (float): Seconds added to every response.
+        jitter (float): Extra random latency, uniformly distributed in [0, jitter].
+        error_rate (float): Fraction of requests answered with 503.
+        seed (int): Seed for latency jitter and injected errors.
+        gzip_sitemaps (bool): Serve the post sitemaps as .xml.gz files.
+
+    The sitemap index at /sitemap.xml lists a page sitemap and one post sitemap per
+    month of publication, each with the lastmod of its newest change. Like WordPress,
+    lastmod is written from the GMT modification time with a +00:00 offset.
+    """
+
+    def __init__(self, corpus, latency=0.0, jitter=0.0, error_rate=0.0, seed=1, gzip_sitemaps=False):
+        self.corpus = corpus
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.gzip_sitemaps = gzip_sitemaps
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.requests_served = 0
+        self.bytes_served = 0
+        self.server = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def url_formats(self):
+        """
+        Returns:
+            dict: ScraperHandler constructor URL arguments pointing at this server.
+        """
+        base_url = self.base_url
+        return {
+            'baseurl': base_url,
+            'searchurl': base_url + '/search?p={query}&fr=tech&b={page}1',
+            'posturl': base_url + '/wp-json/wp/v2/posts?slug={slug}',
+            'authorsurl': base_url + '/wp-json/tc/v1/users/{id}',
+            'categoryurl': base_url + '/wp-json/wp/v2/categories/{id}',
+            'tagurl': base_url + '/wp-json/wp/v2/tags/{id}',
+            'allpostsurl': base_url + '/wp-json/wp/v2/posts?page={page}',
+        }
+
+    def start(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                with mock.rng_lock:
+                    mock.requests_served += 1
+                    delay = mock.latency + mock.rng.random() * mock.jitter
+                    fail = mock.rng.random() < mock.error_rate
+                if delay:
+                    time.sleep(delay)
+                if fail:
+                    return self.send_json({'code': 'service_unavailable'}, status=503)
+
+                parsed = urlparse(self.path)
+                query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+                parts = [part for part in parsed.path.split('/') if part]
+                try:
+                    mock.route(self, parts, query)
+                except (KeyError, ValueError):
+                    self.send_json({'code': 'rest_no_route'}, status=404)
+
+            def send_body(self, body, content_type, status=200):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with mock.rng_lock:
+                    mock.bytes_served += len(body)
+
+            def send_json(self, data, status=200):
+                self.send_body(json.dumps(data).encode('utf-8'), 'application/json', status)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def route(self, handler, parts, query):
+        corpus = self.corpus
+        if parts[:3] == ['wp-json', 'wp', 'v2'] and parts[3] == 'posts':
+            if 'slug' in query:
+                post_id = corpus.slugs.get(query['slug'])
+                return handler.send_json([] if post_id is None else [self.post_json(corpus.posts[post_id])])
+            page = int(query.get('page', 1))
+            ordered = sorted(corpus.posts.values(), key=lambda post: -post['id'])
+            page_posts = ordered[(page - 1) * POSTS_PER_PAGE:page * POSTS_PER_PAGE]
+            if not page_posts:
+                return handler.send_json({'code': 'rest_post_invalid_page_number'}, status=400)
+            return handler.send_json([self.post_json(post) for post in page_posts])
+
+        if parts[:3] == ['wp-json', 'tc', 'v1'] and parts[3] == 'users':
+            author_id = int(parts[4])
+            if author_id in corpus.missing_authors or not 1 <= author_id <= corpus.authors:
+                return handler.send_json({'code': 'rest_user_invalid_id'}, status=404)
+            return handler.send_json({
+                'name': f'Author {author_id}',
+                'cbDescription': f'<p>Writes about {WORDS[author_id % len(WORDS)]}.</p>',
+                'link': f'{self.base_url}/author/author-{author_id}/',
+                'position': 'Reporter',
+            })
+
+        if parts[:3] == ['wp-json', 'wp', 'v2'] and parts[3] in ('categories', 'tags'):
+            item_id = int(parts[4])
+            limit = corpus.categories if parts[3] == 'categories' else corpus.tags
+            if not 1 <= item_id <= limit:
+                raise KeyError(item_id)
+            kind = 'category' if parts[3] == 'categories' else 'tag'
+            return handler.send_json({
+                'count': item_id * 7,
+                'name': f'{kind.capitalize()} {item_id}',
+                'description': f'<p>{kind} {item_id}</p>',
+                'link': f'{self.base_url}/{kind}/{kind}-{item_id}/',
+                'slug': f'{kind}-{item_id}',
+            })
+
+        if parts[:3] == ['wp-json', 'wp', 'v2'] and parts[3] == 'media':
+            media_id = int(parts[4])
+            return handler.send_json({'id': media_id, 'source_url': f'{self.base_url}/media/{media_id}.jpg'})
+
+        if parts and parts[0] == 'media':
+            # Deterministic incompressible-looking bytes standing in for a JPEG
+            media_rng = random.Random(parts[1])
+            return handler.send_body(bytes(media_rng.getrandbits(8) for _ in range(20_000)), 'image/jpeg')
+
+        if len(parts) == 1 and parts[0].startswith('sitemap'):
+            return self.send_sitemap(handler, parts[0])
+
+        if parts and parts[0] == 'search':
+            start = int(query.get('b', '1'))
+            results = corpus.search(query.get('p', ''))[start - 1:start - 1 + SEARCH_RESULTS_PER_PAGE]
+            return handler.send_body(self.search_html(results).encode('utf-8'), 'text/html; charset=utf-8')
+
+        if len(parts) == 4 and parts[3] in corpus.slugs:
+            post = corpus.posts[corpus.slugs[parts[3]]]
+            body = f'<html><head><title>{post["title"]}</title></head><body>{self.content_html(post)}</body></html>'
+            return handler.send_body(body.encode('utf-8'), 'text/html; charset=utf-8')
+
+        raise KeyError(parts)
+
+    def send_sitemap(self, handler, name):
+        corpus = self.corpus
+        months = {}
+        for post in corpus.posts.values():
+            months.setdefault(post['date'][:7], []).append(post)
+        extension = '.xml.gz' if self.gzip_sitemaps else '.xml'
+
+        if name == 'sitemap.xml':
+            entries = [(f'{self.base_url}/sitemap-pages.xml', '2015-01-01T00:00:00')] + [
+                (f'{self.base_url}/sitemap-posts-{month}{extension}', max(post['modified_gmt'] for post in posts))
+                for month, posts in sorted(months.items())
+            ]
+            body = self.sitemap_xml('sitemapindex', 'sitemap', entries)
+        elif name == 'sitemap-pages.xml':
+            body = self.sitemap_xml('urlset', 'url', [(f'{self.base_url}/{page}/', '2015-01-01T00:00:00')
+                                                      for page in ('about', 'contact', 'events')])
+        elif name.startswith('sitemap-posts-') and name.endswith(extension):
+            posts = months[name[len('sitemap-posts-'):-len(extension)]]
+            body = self.sitemap_xml('urlset', 'url', [(self.post_link(post), post['modified_gmt']) for post in posts])
+        else:
+            raise KeyError(name)
+
+        if name.endswith('.gz'):
+            return handler.send_body(gzip.compress(body), 'application/x-gzip')
+        return handler.send_body(body, 'application/xml; charset=utf-8')
+
+    def sitemap_xml(self, root_tag, entry_tag, entries):
+        # lastmod values are GMT, as WordPress core and Yoast write them
+        items = ''.join(f'<{entry_tag}><loc>{loc}</loc><lastmod>{lastmod}+00:00</lastmod></{entry_tag}>'
+                        for loc, lastmod in entries)
+        return (f'<?xml version="1.0" encoding="UTF-8"?>'
+                f'<{root_tag} xmlns="{SITEMAP_NAMESPACE}">{items}</{root_tag}>').encode('utf-8')
+
+    def post_link(self, post):
+        return f'{self.base_url}/{post["date"][:10].replace("-", "/")}/{post["slug"]}/'
+
+    def content_html(self, post):
+        words = post['words']
+        paragraphs = [' '.join(words[index:index + 60]) for index in range(0, len(words), 60)]
+        return ''.join(f'<p>{paragraph}</p>' for paragraph in paragraphs)
+
+    def post_json(self, post):
+        return {
+            'id': post['id'],
+            'date': post['date'],
+            'date_gmt': post['date_gmt'],
+            'modified': post['modified'],
+            'modified_gmt': post['modified_gmt'],
+            'slug': post['slug'],
+            'status': 'publish',
+            'type': 'post',
+            'link': self.post_link(post),
+            'title': {'rendered': post['title']},
+            'content': {'rendered': self.content_html(post)},
+            'excerpt': {'rendered': f'<p>{" ".join(post["words"][:30])}</p>'},
+            'author': post['author'],
+            'categories': post['categories'],
+            'tags': post['tags'],
+            'jetpack_featured_media_url': f'{self.base_url}/media/{post["id"]}.jpg',
+            'format': 'standard',
+        }
+
+    def search_html(self, results):
+        items = ''.join(
+            '<li><div class="compTitle"><h4 class="pb-10">'
+            f'<a href="https://r.search.yahoo.com/_ylt=mock/RV=2/RE=1/RO=10/RU={quote(self.post_link(post), safe="")}'
+            f'/RK=2/RS=mock-">{post["title"]}</a></h4></div><p>{" ".join(post["words"][:25])}</p></li>'
+            for post in results
+        )
+        return f'<html><head><title>search</title></head><body><ol class="searchCenterMiddle">{items}</ol></body></html>'
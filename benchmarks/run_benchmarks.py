@@ -0,0 +1,218 @@
+"""
+Reproducible scraper benchmarks against the in-process mock TechCrunch server.
+
+Runs keyword search, cached search replay, the full posts crawl, every report
+and every export format against a fresh SQLite file (default) or a local
+Postgres database, and prints a throughput / latency table.
+
+Usage:
+    python benchmarks/run_benchmarks.py --posts 500 --latency 0.01
+    python benchmarks/run_benchmarks.py --json current.json --compare baseline.json
+    python benchmarks/run_benchmarks.py --db postgresql --db-name scraper_bench --db-user postgres
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Scraper benchmark suite')
+    parser.add_argument('--posts', type=int, default=300, help='Posts in the mock corpus')
+    parser.add_argument('--authors', type=int, default=40)
+    parser.add_argument('--tags', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.005, help='Seconds added to every mock response')
+    parser.add_argument('--jitter', type=float, default=0.005, help='Extra random latency per response')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of mock responses that are 503')
+    parser.add_argument('--keyword', type=str, default='startup')
+    parser.add_argument('--search-pages', type=int, default=3)
+    parser.add_argument('--formats', nargs='+', default=['json', 'csv', 'xls'], choices=['json', 'csv', 'xls'])
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--db', choices=['sqlite', 'postgresql'], default='sqlite')
+    parser.add_argument('--db-name', type=str, help='SQLite file or Postgres database name')
+    parser.add_argument('--db-user', type=str, default='')
+    parser.add_argument('--db-password', type=str, default='')
+    parser.add_argument('--db-host', type=str, default='localhost')
+    parser.add_argument('--db-port', type=int, default=5432)
+    parser.add_argument('--json', type=str, metavar='PATH', help='Write the results to a JSON file')
+    parser.add_argument('--compare', type=str, metavar='PATH', help='Compare against a previous --json result')
+    return parser.parse_args()
+
+
+def configure_environment(args, work_dir):
+    # Must run before main/models are imported: they connect to the database at import time
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    os.environ['SCRAPER_SETTINGS'] = 'benchmark_settings'
+    os.environ['BENCHMARK_DB_ENGINE'] = args.db
+    os.environ['BENCHMARK_DB_NAME'] = args.db_name or (
+        os.path.join(work_dir, 'benchmark.sqlite3') if args.db == 'sqlite' else 'scraper_benchmark'
+    )
+    os.environ['BENCHMARK_DB_USER'] = args.db_user
+    os.environ['BENCHMARK_DB_PASSWORD'] = args.db_password
+    os.environ['BENCHMARK_DB_HOST'] = args.db_host
+    os.environ['BENCHMARK_DB_PORT'] = str(args.db_port)
+
+
+def approximate_quantile(histogram, quantile):
+    # Upper bound of the first bucket reaching the quantile (Prometheus-style estimate)
+    target = histogram['count'] * quantile
+    for upper_bound, cumulative_count in histogram['buckets'].items():
+        if cumulative_count >= target:
+            return float('inf') if upper_bound == '+Inf' else float(upper_bound)
+    return float('inf')
+
+
+class BenchmarkRun:
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.results = []
+
+    def measure(self, name, func, items=None):
+        """
+        Time one scenario and collect its HTTP and DB metrics.
+
+        Args:
+            name (str): Scenario name shown in the table.
+            func (callable): The scenario; may return the number of items it processed.
+            items (int): Item count, when func does not return one.
+        """
+        self.metrics.reset()
+        start = time.perf_counter()
+        returned = func()
+        seconds = time.perf_counter() - start
+        items = returned if isinstance(returned, int) else (items or 0)
+
+        snapshot = self.metrics.to_dict()
+        http = [h for h in snapshot['histograms'] if h['name'] == 'http_request_seconds']
+        http_count = sum(h['count'] for h in http)
+        http_sum = sum(h['sum'] for h in http)
+        merged_buckets = {}
+        for histogram in http:
+            for upper_bound, count in histogram['buckets'].items():
+                merged_buckets[upper_bound] = merged_buckets.get(upper_bound, 0) + count
+        db_statements = sum(c['value'] for c in snapshot['counters'] if c['name'] == 'db_statements_total')
+
+        result = {
+            'scenario': name,
+            'seconds': seconds,
+            'items': items,
+            'items_per_second': items / seconds if seconds and items else 0,
+            'http_requests': http_count,
+            'http_mean_ms': 1000 * http_sum / http_count if http_count else 0,
+            'http_p95_ms': 1000 * approximate_quantile({'count': http_count, 'buckets': merged_buckets}, 0.95)
+            if http_count else 0,
+            'db_statements': db_statements,
+        }
+        self.results.append(result)
+        print(f"  {name}: {seconds:.2f}s", flush=True)
+        return returned
+
+
+def print_table(results, baseline=None):
+    baseline = {result['scenario']: result for result in (baseline or [])}
+    header = f"{'scenario':<28}{'seconds':>9}{'items':>8}{'items/s':>10}{'http':>7}" \
+             f"{'mean ms':>9}{'p95 ms':>8}{'db stmts':>10}"
+    if baseline:
+        header += f"{'vs base':>9}"
+    print(header)
+    for result in results:
+        line = (f"{result['scenario']:<28}{result['seconds']:>9.3f}{result['items']:>8}"
+                f"{result['items_per_second']:>10.1f}{result['http_requests']:>7}"
+                f"{result['http_mean_ms']:>9.1f}{result['http_p95_ms']:>8.0f}{result['db_statements']:>10}")
+        previous = baseline.get(result['scenario'])
+        if previous and result['seconds']:
+            line += f"{previous['seconds'] / result['seconds']:>8.2f}x"
+        print(line)
+
+
+def main():
+    args = parse_arguments()
+    work_dir = tempfile.mkdtemp(prefix='scraper_benchmark_')
+    configure_environment(args, work_dir)
+
+    import models  # noqa: E402  (imports main, which connects using benchmark_settings)
+    import main as scraper_main
+    from log_config import setup_logging
+    from metrics import metrics
+    from mock_server import MockCorpus, MockTechCrunchServer
+    from report_generator import ReportGenerator
+    from scraper_handler import ScraperHandler
+    from search_planner import SearchPlanner
+
+    log_listener = setup_logging(level='WARNING')
+    database_manager = scraper_main.database_manager
+    database_manager.db.drop_tables(models.ALL_MODELS)
+    database_manager.create_tables(models.ALL_MODELS)
+
+    corpus = MockCorpus(posts=args.posts, authors=args.authors, tags=args.tags, seed=args.seed)
+    run = BenchmarkRun(metrics)
+
+    with MockTechCrunchServer(corpus, latency=args.latency, jitter=args.jitter,
+                              error_rate=args.error_rate, seed=args.seed) as server:
+        scraper_handler = ScraperHandler(database_manager=database_manager, **server.url_formats())
+        scraper_handler.page_delay = 0
+        report_generator = ReportGenerator(database_manager)
+        keyword, _ = models.Keyword.get_or_create(title=args.keyword)
+        print(f"Mock server at {server.base_url}, {args.posts} posts, database {args.db}")
+
+        def search():
+            search_by_keyword = models.SearchByKeyword.create(keyword=keyword, page_count=args.search_pages)
+            search.parsed_items = scraper_handler.search_by_keyword(search_by_keyword)[1]
+            return len(search.parsed_items)
+
+        def cached_search():
+            search_by_keyword = models.SearchByKeyword.create(keyword=keyword, page_count=args.search_pages)
+            return len(SearchPlanner(scraper_handler).search(search_by_keyword)[1])
+
+        run.measure('search_by_keyword', search)
+        run.measure('search_planner (cached)', cached_search)
+        run.measure('fetch_all_pages', lambda: len(scraper_handler.fetch_all_pages()) and models.Post.select().count())
+
+        parsed_items = search.parsed_items
+        for method in ('all', 'database', 'current'):
+            run.measure(f'report category/{method}', lambda: len(report_generator.count_post_per_category(
+                method=method, keyword_used=args.keyword, parsed_items=parsed_items)[1]))
+            run.measure(f'report tag/{method}', lambda: len(report_generator.count_post_per_tag(
+                method=method, keyword_used=args.keyword, parsed_items=parsed_items)[1]))
+        for method in ('database', 'current'):
+            run.measure(f'report author/{method}', lambda: len(report_generator.count_post_per_author(
+                method=method, keyword_used=args.keyword, parsed_items=parsed_items)[1]))
+        for method in ('current', 'database'):
+            run.measure(f'report trend/{method}', lambda: len(report_generator.count_posts_per_period(
+                'tag', 'month', method=method, keyword_used=args.keyword, parsed_items=parsed_items)[1]))
+        for dimension in ('keyword', 'month'):
+            run.measure(f'report {dimension}/snapshot', lambda: len(report_generator.build_report(
+                dimension, method='snapshot', keyword_used=args.keyword)[1]))
+
+        # export_report writes to ./output, so exports run in the work directory
+        os.chdir(work_dir)
+        report_content, data = report_generator.count_post_per_tag(
+            method='current', keyword_used=args.keyword, parsed_items=parsed_items)
+        for file_format in args.formats:
+            run.measure(f'export {file_format}', lambda: report_generator.export_report(
+                report_content, data, keyword, parsed_items, file_format
+            ), items=len(parsed_items))
+
+    database_manager.close_connection()
+    log_listener.stop()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)['results']
+
+    print()
+    print_table(run.results, baseline)
+
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump({'options': vars(args), 'results': run.results}, json_file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+from constants import CHART_CACHE_DIR, CHART_FORMAT, CHART_TOP_N
+
+logger = logging.getLogger(__name__)
+
+# Bump when the chart layout changes so cached figures are rendered again
+CHART_STYLE_VERSION = 1
+FIGURE_SIZE = (10, 6)
+
+
+def chart_bars(data, top_n):
+    """
+    Turn report data into bar labels and heights.
+
+    Count reports keep the top_n largest entries and sum the rest into an "other" bar.
+    Trend reports (period -> PeriodCounts) are charted as the distinct posts of each period, in order.
+
+    Returns:
+        tuple: (labels, heights).
+    """
+    values = list(data.values())
+    if values and isinstance(values[0], dict):
+        # Not the sum of the counts: a post with several labels is in several of them
+        return [str(period) for period in data], [period_counts.total for period_counts in values]
+
+    ranked = sorted(data.items(), key=lambda name_count: (-name_count[1], str(name_count[0])))
+    labels = [str(name) for name, _ in ranked[:top_n]]
+    heights = [count for _, count in ranked[:top_n]]
+    rest = ranked[top_n:]
+    if rest:
+        labels.append(f'other ({len(rest)})')
+        heights.append(sum(count for _, count in rest))
+    return labels, heights
+
+
+def render_chart(spec):
+    """
+    Render one bar chart to spec['path']. Runs in worker processes.
+
+    Uses a standalone Figure on the Agg canvas, so it never touches pyplot's global state or opens a window.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=FIGURE_SIZE)
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    axes.bar(spec['labels'], spec['heights'], color='skyblue')
+    axes.set_title(spec['title'])
+    axes.set_xlabel(spec['xlabel'])
+    axes.set_ylabel('Number of Posts')
+    axes.tick_params(axis='x', labelrotation=45)
+    for label in axes.get_xticklabels():
+        label.set_horizontalalignment('right')
+    figure.tight_layout()
+    figure.savefig(spec['path'], format=spec['format'])
+    return spec['path']
+
+
+class ChartRenderer:
+    """
+    Headless, cached bar chart rendering for reports.
+
+    Every chart is keyed by a hash of its bars, labels and format; a chart whose key was
+    rendered before is copied from the cache directory instead of being drawn again.
+    render_many draws the remaining charts of one pass in parallel processes.
+
+    Args:
+        chart_format (str): 'png' or 'svg'.
+        top_n (int): Bars shown before the rest is summed into "other".
+        cache_dir (str): Directory of rendered charts keyed by hash; None disables caching.
+        workers (int): Processes used by render_many (default: one per CPU).
+    """
+
+    def __init__(self, chart_format=CHART_FORMAT, top_n=CHART_TOP_N, cache_dir=CHART_CACHE_DIR, workers=None):
+        self.chart_format = chart_format
+        self.top_n = top_n
+        self.cache_dir = cache_dir
+        self.workers = workers
+
+    def build_spec(self, data, path, title, xlabel):
+        # Method to describe one chart; `path` gets the chart format's extension
+        labels, heights = chart_bars(data, self.top_n)
+        spec = {
+            'labels': labels,
+            'heights': heights,
+            'title': title,
+            'xlabel': xlabel,
+            'format': self.chart_format,
+            'path': f'{os.path.splitext(path)[0]}.{self.chart_format}',
+        }
+        key_data = {name: value for name, value in spec.items() if name != 'path'}
+        key_data['style'] = CHART_STYLE_VERSION
+        spec['key'] = hashlib.sha256(json.dumps(key_data, sort_keys=True).encode('utf-8')).hexdigest()
+        return spec
+
+    def render(self, data, path, title, xlabel):
+        """
+        Render one chart.
+
+        Returns:
+            str: Path of the written chart.
+        """
+        return self.render_many([(data, path, title, xlabel)])[0]
+
+    def render_many(self, charts):
+        """
+        Render several charts in one pass.
+
+        Args:
+            charts (list): (data, path, title, xlabel) tuples.
+
+        Returns:
+            list: Paths of the written charts, in the order given.
+        """
+        specs = [self.build_spec(*chart) for chart in charts]
+        for spec in specs:
+            os.makedirs(os.path.dirname(os.path.abspath(spec['path'])), exist_ok=True)
+        pending = [spec for spec in specs if not self.copy_from_cache(spec)]
+
+        if len(pending) > 1:
+            with ProcessPoolExecutor(max_workers=self.workers or min(len(pending), os.cpu_count() or 1)) as executor:
+                list(executor.map(render_chart, pending))
+        elif pending:
+            render_chart(pending[0])
+
+        for spec in pending:
+            self.store_in_cache(spec)
+        for spec in specs:
+            logger.info("Chart saved as %s", spec['path'])
+        return [spec['path'] for spec in specs]
+
+    def cache_path(self, spec):
+        return os.path.join(self.cache_dir, f"{spec['key']}.{spec['format']}")
+
+    def copy_from_cache(self, spec):
+        if self.cache_dir is None or not os.path.exists(self.cache_path(spec)):
+            return False
+        shutil.copyfile(self.cache_path(spec), spec['path'])
+        return True
+
+    def store_in_cache(self, spec):
+        if self.cache_dir is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Copy then rename, so a concurrent reader never sees a partial file
+        temporary_path = f"{self.cache_path(spec)}.{os.getpid()}.tmp"
+        shutil.copyfile(spec['path'], temporary_path)
+        os.replace(temporary_path, self.cache_path(spec))
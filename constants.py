@@ -10,7 +10,103 @@ MEDIA_URL_WITH_ID = BASE_URL + '/wp-json/wp/v2/media/{id}'
 CATEGORY_URL_WITH_ID = BASE_URL + '/wp-json/wp/v2/categories/{id}'
 TAG_URL_WITH_ID = BASE_URL + '/wp-json/wp/v2/tags/{id}'
 
+ALL_POSTS_PAGE_DELAY = 10
+
 SEARCH_PAGE_COUNT = 5
+# Hits on a full search result page; a shorter page is the last one
+SEARCH_RESULTS_PER_PAGE = 10
+LOCAL_SEARCH_PAGE_SIZE = 10
+# Posts whose search vectors are built per statement when an existing database is indexed
+SEARCH_INDEX_BATCH = 500
+SEARCH_CACHE_TTL_HOURS = 24
+SEARCH_FETCH_WORKERS = 5
+
+# Tags on more posts than this only score related-post candidates, they do not gather them
+RELATED_POSTS_MAX_TAG_POSTS = 1000
+
+PROGRESS_LOG_INTERVAL = 10
+
+# Daemon mode: concurrent jobs, seconds between watchlist reloads, and the incremental posts sync
+DAEMON_WORKERS = 2
+DAEMON_RELOAD_SECONDS = 60
+WATCHLIST_INTERVAL_MINUTES = 60
+SYNC_INTERVAL_MINUTES = 30
+SYNC_MAX_PAGES = 20
+
+# Sitemap discovery: index location, post link shape (slug in the last segment), slugs diffed per query
+SITEMAP_INDEX_URL = BASE_URL + '/sitemap.xml'
+SITEMAP_POST_LINK_PATTERN = r'^/\d{4}/\d{2}/\d{2}/([^/]+)/?$'
+SITEMAP_DIFF_BATCH = 500
+SITEMAP_CHUNK_SIZE = 64 * 1024
+
+# Async engine: concurrent requests per endpoint class, and posts pages requested ahead
+ASYNC_ENDPOINT_LIMITS = {
+    'search': 5,
+    'posts_page': 4,
+    'post': 10,
+    'author': 10,
+    'category': 10,
+    'tag': 10,
+    'other': 5,
+}
+
+# Distributed crawl: seconds a claimed task stays leased without a heartbeat, tasks per claim, attempts
+WORK_LEASE_SECONDS = 120
+WORK_CLAIM_BATCH = 5
+WORK_MAX_ATTEMPTS = 3
+
+# Post bodies are stored compressed and deduplicated in ContentBlob when enabled
+CONTENT_STORE_ENABLED = False
+CONTENT_COMPRESSION_LEVEL = 9
+CONTENT_DICTIONARY_SIZE = 112640
+
+# Raw WordPress JSON of each post is archived compressed for offline reprocessing when enabled
+PAYLOAD_ARCHIVE_ENABLED = False
+PAYLOAD_COMPRESSION_LEVEL = 9
+REPROCESS_BATCH_SIZE = 500
+
+# Two-phase ingestion: listing pages per staged segment and concurrent requests while staging
+STAGING_SEGMENT_PAGES = 10
+STAGING_FETCH_WORKERS = 8
+
+# Search history: monthly item partitions created ahead (Postgres), retention and archive location
+PARTITION_MONTHS_AHEAD = 3
+SEARCH_HISTORY_RETENTION_DAYS = 180
+SEARCH_HISTORY_ARCHIVE_DIR = 'output/archive'
+
+# Charts: bars shown before the rest is summed into "other", file format, and rendered-chart cache
+CHART_TOP_N = 30
+CHART_FORMAT = 'png'
+CHART_CACHE_DIR = 'output/chart_cache'
+
+# Reports: trend periods, bucketed on Post.created_date
+TREND_PERIODS = ('day', 'week', 'month')
+
+# Exports: archive format ('zip' or 'tar.zst') and concurrent image / article downloads
+EXPORT_ARCHIVE_FORMAT = 'zip'
+EXPORT_DOWNLOAD_WORKERS = 8
+# Posts whose content and excerpt are loaded per query while export files are written
+EXPORT_LOAD_BATCH = 200
+
+# Table layout version; bump it when models change so the next start (or --init-db) updates the schema
+SCHEMA_VERSION = 5
+
+HTTP_RETRIES = 3
+HTTP_BACKOFF_FACTOR = 0.75
+HTTP_MAX_BACKOFF = 60
+HTTP_CONNECT_TIMEOUT = 5
+HTTP_READ_TIMEOUT = 30
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_SECONDS = 30
+HTTP_POOL_SIZE = 10
+
+# Hours a 404/401/empty answer is trusted before the id is requested again
+NEGATIVE_CACHE_TTL_HOURS = {
+    'author': 24 * 7,
+    'post': 24,
+    'category': 24 * 7,
+    'tag': 24 * 7,
+}
 
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 14.4; rv:124.0) Gecko/20100101 Firefox/124.0',
@@ -0,0 +1,220 @@
+import hashlib
+import logging
+import threading
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional, blobs are zlib-compressed without it
+    zstandard = None
+
+from metrics import metrics
+from constants import CONTENT_COMPRESSION_LEVEL, CONTENT_DICTIONARY_SIZE, CONTENT_STORE_ENABLED
+
+logger = logging.getLogger(__name__)
+
+
+def compress_bytes(data, level, dictionary=None):
+    """
+    Compress with zstd, or zlib when zstandard is not installed.
+
+    Returns:
+        tuple: (codec name, compressed bytes).
+    """
+    if zstandard is None:
+        return 'zlib', zlib.compress(data, min(level, 9))
+    return 'zstd', zstandard.ZstdCompressor(level=level, dict_data=dictionary).compress(data)
+
+
+def decompress_bytes(codec, data, dictionary=None):
+    if codec == 'zlib':
+        return zlib.decompress(data)
+    if zstandard is None:
+        raise RuntimeError('zstandard is required to read zstd-compressed data')
+    return zstandard.ZstdDecompressor(dict_data=dictionary).decompress(data)
+
+
+class ContentStore:
+    """
+    Compressed, deduplicated storage for post bodies.
+
+    Each distinct body is stored once in ContentBlob, keyed by the SHA-256 of its text and
+    compressed with zstd (optionally with a dictionary trained on existing posts) or zlib
+    when zstandard is not installed. Post.content reads and writes through this store when
+    it is enabled and loads a post's blob only when its content is first accessed.
+
+    Args:
+        enabled (bool): Store new post bodies as blobs instead of inline text.
+        level (int): Compression level.
+    """
+
+    def __init__(self, enabled=CONTENT_STORE_ENABLED, level=CONTENT_COMPRESSION_LEVEL):
+        self.enabled = enabled
+        self.level = level
+        self._dictionaries = {}
+        self._active_dictionary_id = None
+        self._active_loaded = False
+        self._lock = threading.Lock()
+
+    def store(self, text):
+        """
+        Store a body unless an identical one is already stored.
+
+        Returns:
+            str: The content hash to reference from Post.content_blob.
+        """
+        import models
+
+        data = text.encode('utf-8')
+        content_hash = hashlib.sha256(data).hexdigest()
+        if models.ContentBlob.select().where(models.ContentBlob.content_hash == content_hash).exists():
+            metrics.increment('content_blobs_deduplicated_total')
+            return content_hash
+
+        codec, dictionary_id, compressed = self.compress(data)
+        models.ContentBlob.insert(
+            content_hash=content_hash, codec=codec, dictionary=dictionary_id, raw_size=len(data), data=compressed
+        ).on_conflict_ignore().execute()
+        metrics.increment('content_blob_bytes_total', len(compressed))
+        return content_hash
+
+    def load(self, content_hash):
+        # Method to read and decompress one stored body
+        import models
+
+        blob = models.ContentBlob.get_by_id(content_hash)
+        return self.decompress(blob.codec, blob.dictionary_id, bytes(blob.data)).decode('utf-8')
+
+    def load_many(self, content_hashes):
+        """
+        Returns:
+            dict: content_hash -> decompressed body, read with one query.
+        """
+        import models
+
+        blobs = models.ContentBlob.select().where(models.ContentBlob.content_hash.in_(list(content_hashes)))
+        return {blob.content_hash: self.decompress(blob.codec, blob.dictionary_id, bytes(blob.data)).decode('utf-8')
+                for blob in blobs}
+
+    def compress(self, data):
+        # Returns (codec, dictionary_id, compressed bytes)
+        dictionary_id = self.active_dictionary_id() if zstandard is not None else None
+        dictionary = self.dictionary(dictionary_id) if dictionary_id is not None else None
+        codec, compressed = compress_bytes(data, self.level, dictionary)
+        return codec, dictionary_id, compressed
+
+    def decompress(self, codec, dictionary_id, data):
+        dictionary = self.dictionary(dictionary_id) if dictionary_id is not None else None
+        return decompress_bytes(codec, data, dictionary)
+
+    def dictionary(self, dictionary_id):
+        # Method to load a trained dictionary once per process
+        import models
+
+        with self._lock:
+            dictionary = self._dictionaries.get(dictionary_id)
+            if dictionary is None:
+                data = bytes(models.ContentDictionary.get_by_id(dictionary_id).data)
+                dictionary = self._dictionaries[dictionary_id] = zstandard.ZstdCompressionDict(data)
+            return dictionary
+
+    def active_dictionary_id(self):
+        # The newest trained dictionary compresses new blobs
+        import models
+
+        with self._lock:
+            if not self._active_loaded:
+                latest = models.ContentDictionary.select().order_by(models.ContentDictionary.id.desc()).first()
+                self._active_dictionary_id = latest.id if latest else None
+                self._active_loaded = True
+            return self._active_dictionary_id
+
+    def train_dictionary(self, sample_count=2000, size=CONTENT_DICTIONARY_SIZE):
+        """
+        Train a zstd dictionary on the newest posts and make it the one new blobs are compressed with.
+
+        Returns:
+            int: The new ContentDictionary id.
+        """
+        import models
+
+        if zstandard is None:
+            raise RuntimeError('zstandard is required to train a content dictionary')
+        posts = models.Post.select().order_by(models.Post.created_date.desc()).limit(sample_count)
+        samples = [post.content.encode('utf-8') for post in posts if post.content]
+        dictionary = zstandard.train_dictionary(size, samples)
+        dictionary_id = models.ContentDictionary.create(data=dictionary.as_bytes()).id
+        with self._lock:
+            self._active_dictionary_id = dictionary_id
+            self._active_loaded = True
+        logger.info("Trained a %d byte content dictionary on %d posts", len(dictionary.as_bytes()), len(samples))
+        return dictionary_id
+
+    def migrate(self, batch_size=500, post_ids=None):
+        """
+        Move inline post bodies into the store.
+
+        Args:
+            batch_size (int): Posts moved per transaction.
+            post_ids (list): Only move the bodies of these posts; None moves every inline body.
+
+        Returns:
+            int: Number of posts moved.
+        """
+        import models
+
+        moved = 0
+        inline = models.Post.raw_content.is_null(False)
+        if post_ids is not None:
+            inline &= models.Post.post_id.in_(post_ids)
+        while True:
+            posts = list(models.Post.select(models.Post.post_id, models.Post.raw_content)
+                         .where(inline)
+                         .order_by(models.Post.post_id)
+                         .limit(batch_size))
+            if not posts:
+                return moved
+            with models.Post._meta.database.atomic():
+                for post in posts:
+                    models.Post.update(content_blob=self.store(post.raw_content), raw_content=None).where(
+                        models.Post.post_id == post.post_id
+                    ).execute()
+            moved += len(posts)
+            logger.info("Moved %d post bodies into the content store", moved)
+
+    def ensure_schema(self, database):
+        # Method to add the content_blob column to a post table created before the content store
+        from playhouse.migrate import SchemaMigrator, migrate
+        import models
+
+        table = models.Post._meta.table_name
+        columns = {column.name: column for column in database.get_columns(table)}
+        migrator = SchemaMigrator.from_database(database)
+        operations = []
+        if 'content_blob_id' not in columns:
+            operations.append(migrator.add_column(table, 'content_blob_id', models.Post.content_blob))
+        if not columns['content'].null:
+            operations.append(migrator.drop_not_null(table, 'content'))
+        if operations:
+            with database.atomic():
+                migrate(*operations)
+
+    def stats(self):
+        """
+        Returns:
+            dict: Inline and stored body bytes, blob count and the number of posts using the store.
+        """
+        import models
+        from peewee import fn
+
+        return {
+            'inline_bytes': models.Post.select(fn.COALESCE(fn.SUM(fn.LENGTH(models.Post.raw_content)), 0)).scalar(),
+            'posts_in_store': models.Post.select().where(models.Post.content_blob.is_null(False)).count(),
+            'blobs': models.ContentBlob.select().count(),
+            'raw_bytes': models.ContentBlob.select(fn.COALESCE(fn.SUM(models.ContentBlob.raw_size), 0)).scalar(),
+            'blob_bytes': models.ContentBlob.select(fn.COALESCE(fn.SUM(fn.LENGTH(models.ContentBlob.data)), 0)).scalar(),
+        }
+
+
+# Process-wide store used by Post.content
+content_store = ContentStore()
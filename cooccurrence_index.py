@@ -0,0 +1,218 @@
+import heapq
+import math
+
+from peewee import Tuple, fn
+
+import models
+from constants import RELATED_POSTS_MAX_TAG_POSTS
+
+
+class CooccurrenceIndex:
+    """
+    Sparse tag x tag and category x tag co-occurrence counts, updated incrementally at ingest.
+
+    TagCooccurrence stores every pair in both directions so lookups only touch the
+    (tag, other_tag) index, and its diagonal (tag, tag) holds the number of posts
+    carrying that tag. Only pairs that actually occur are stored.
+    """
+
+    def __init__(self, database_manager):
+        self.database_manager = database_manager
+
+    def record_post_links(self, tag_ids, category_ids, new_tag_ids=(), new_category_ids=()):
+        """
+        Update the index for the links just created for one post.
+
+        Args:
+            tag_ids (iterable): All tag ids of the post, including the new ones.
+            category_ids (iterable): All category ids of the post, including the new ones.
+            new_tag_ids (iterable): Tag ids whose PostTag link was created by this ingest.
+            new_category_ids (iterable): Category ids whose PostCategory link was created by this ingest.
+        """
+        # Only pairs involving at least one new link change; existing pairs were counted before
+        tag_pairs, category_pairs = self._changed_pairs(tag_ids, category_ids, new_tag_ids, new_category_ids)
+        self._increment(models.TagCooccurrence, models.TagCooccurrence.tag,
+                        models.TagCooccurrence.other_tag, tag_pairs)
+        self._increment(models.CategoryTagCooccurrence, models.CategoryTagCooccurrence.category,
+                        models.CategoryTagCooccurrence.tag, category_pairs)
+
+    def remove_post_links(self, tag_ids, category_ids, removed_tag_ids=(), removed_category_ids=()):
+        """
+        Update the index for links just deleted from one post.
+
+        Args:
+            tag_ids (iterable): All tag ids the post had, including the removed ones.
+            category_ids (iterable): All category ids the post had, including the removed ones.
+            removed_tag_ids (iterable): Tag ids whose PostTag link was deleted.
+            removed_category_ids (iterable): Category ids whose PostCategory link was deleted.
+        """
+        tag_pairs, category_pairs = self._changed_pairs(tag_ids, category_ids, removed_tag_ids, removed_category_ids)
+        self._decrement(models.TagCooccurrence, models.TagCooccurrence.tag,
+                        models.TagCooccurrence.other_tag, tag_pairs)
+        self._decrement(models.CategoryTagCooccurrence, models.CategoryTagCooccurrence.category,
+                        models.CategoryTagCooccurrence.tag, category_pairs)
+
+    def _changed_pairs(self, tag_ids, category_ids, changed_tag_ids, changed_category_ids):
+        # Tag x tag and category x tag pairs of one post that involve at least one changed link
+        tag_ids = set(tag_ids)
+        category_ids = set(category_ids)
+        changed_tag_ids = set(changed_tag_ids) & tag_ids
+        changed_category_ids = set(changed_category_ids) & category_ids
+
+        tag_pairs = set()
+        for changed_tag_id in changed_tag_ids:
+            tag_pairs.add((changed_tag_id, changed_tag_id))
+            for other_tag_id in tag_ids - {changed_tag_id}:
+                tag_pairs.add((changed_tag_id, other_tag_id))
+                tag_pairs.add((other_tag_id, changed_tag_id))
+
+        category_pairs = {(category_id, tag_id) for category_id in changed_category_ids for tag_id in tag_ids}
+        category_pairs.update((category_id, tag_id) for category_id in category_ids for tag_id in changed_tag_ids)
+        return tag_pairs, category_pairs
+
+    def _increment(self, model, first_field, second_field, pairs):
+        # Upsert count + 1 for every pair; sorted so concurrent writers lock rows in the same order
+        if not pairs:
+            return
+        rows = [{first_field.name: first, second_field.name: second, 'count': 1} for first, second in sorted(pairs)]
+        (model
+         .insert_many(rows)
+         .on_conflict(conflict_target=[first_field, second_field], update={model.count: model.count + 1})
+         .execute())
+
+    def _decrement(self, model, first_field, second_field, pairs):
+        # Count - 1 for every pair, dropping pairs no post has any more
+        if not pairs:
+            return
+        in_pairs = Tuple(first_field, second_field).in_(sorted(pairs))
+        model.update(count=model.count - 1).where(in_pairs).execute()
+        model.delete().where(in_pairs & (model.count <= 0)).execute()
+
+    def rebuild(self):
+        """
+        Recompute the whole index from the PostTag and PostCategory link tables.
+        """
+        first_tag = models.PostTag.alias()
+        second_tag = models.PostTag.alias()
+        tag_pairs = (first_tag
+                     .select(first_tag.tag, second_tag.tag, fn.COUNT(first_tag.id))
+                     .join(second_tag, on=(first_tag.post == second_tag.post))
+                     .group_by(first_tag.tag, second_tag.tag))
+
+        category_pairs = (models.PostCategory
+                          .select(models.PostCategory.category, models.PostTag.tag, fn.COUNT(models.PostCategory.id))
+                          .join(models.PostTag, on=(models.PostCategory.post == models.PostTag.post))
+                          .group_by(models.PostCategory.category, models.PostTag.tag))
+
+        with self.database_manager.db.atomic():
+            models.TagCooccurrence.delete().execute()
+            models.CategoryTagCooccurrence.delete().execute()
+            models.TagCooccurrence.insert_from(
+                tag_pairs,
+                [models.TagCooccurrence.tag, models.TagCooccurrence.other_tag, models.TagCooccurrence.count]
+            ).execute()
+            models.CategoryTagCooccurrence.insert_from(
+                category_pairs,
+                [models.CategoryTagCooccurrence.category, models.CategoryTagCooccurrence.tag,
+                 models.CategoryTagCooccurrence.count]
+            ).execute()
+
+    def related_tags(self, tag_id, limit=10):
+        """
+        Return the tags most often used together with a tag.
+
+        Returns:
+            list: (Tag, shared post count) tuples, most shared first.
+        """
+        query = (models.TagCooccurrence
+                 .select(models.TagCooccurrence, models.Tag)
+                 .join(models.Tag, on=(models.TagCooccurrence.other_tag == models.Tag.tag_id))
+                 .where((models.TagCooccurrence.tag == tag_id) & (models.TagCooccurrence.other_tag != tag_id))
+                 .order_by(models.TagCooccurrence.count.desc())
+                 .limit(limit))
+        return [(row.other_tag, row.count) for row in query]
+
+    def related_categories(self, tag_id, limit=10):
+        """
+        Return the categories a tag appears in most often.
+
+        Returns:
+            list: (Category, shared post count) tuples, most shared first.
+        """
+        query = (models.CategoryTagCooccurrence
+                 .select(models.CategoryTagCooccurrence, models.Category)
+                 .join(models.Category)
+                 .where(models.CategoryTagCooccurrence.tag == tag_id)
+                 .order_by(models.CategoryTagCooccurrence.count.desc())
+                 .limit(limit))
+        return [(row.category, row.count) for row in query]
+
+    def related_posts(self, post_id, limit=10, max_query_tags=8, max_tag_posts=RELATED_POSTS_MAX_TAG_POSTS):
+        """
+        Rank other posts by the tags they share with a post.
+
+        Shared tags are weighted by rarity (1 / log(2 + posts with the tag)), read from
+        the index diagonal. Candidates are gathered from the posting lists of the post's
+        rarest tags only, and only of tags on at most `max_tag_posts` posts. Common tags
+        still add their weight to the candidates found, looked up per candidate, so their
+        full posting lists are never read. A post with only common tags samples the
+        newest `max_tag_posts` posts of its rarest tag.
+
+        Args:
+            post_id (int): The post to find related posts for.
+            limit (int): Number of posts to return.
+            max_query_tags (int): Number of the post's rarest tags used to gather candidates.
+            max_tag_posts (int): Tags on more posts than this do not gather candidates.
+
+        Returns:
+            list: (Post, score) tuples, best match first.
+        """
+        tag_ids = [tag_id for tag_id, in
+                   models.PostTag.select(models.PostTag.tag).where(models.PostTag.post == post_id).tuples()]
+        if not tag_ids:
+            return []
+
+        post_frequencies = dict(
+            models.TagCooccurrence
+            .select(models.TagCooccurrence.tag, models.TagCooccurrence.count)
+            .where(models.TagCooccurrence.tag.in_(tag_ids)
+                   & (models.TagCooccurrence.other_tag == models.TagCooccurrence.tag))
+            .tuples()
+        )
+        weights = {tag_id: 1 / math.log(2 + post_frequencies.get(tag_id, 0)) for tag_id in tag_ids}
+        tag_ids.sort(key=lambda tag_id: post_frequencies.get(tag_id, 0))
+        query_tags = [tag_id for tag_id in tag_ids[:max_query_tags]
+                      if post_frequencies.get(tag_id, 0) <= max_tag_posts]
+
+        candidates = (models.PostTag
+                      .select(models.PostTag.post, models.PostTag.tag)
+                      .where(models.PostTag.post != post_id)
+                      .tuples())
+        if query_tags:
+            candidates = candidates.where(models.PostTag.tag.in_(query_tags))
+        else:
+            query_tags = tag_ids[:1]
+            candidates = (candidates
+                          .where(models.PostTag.tag == query_tags[0])
+                          .order_by(models.PostTag.id.desc())
+                          .limit(max_tag_posts))
+
+        scores = {}
+        for candidate_id, tag_id in candidates:
+            scores[candidate_id] = scores.get(candidate_id, 0) + weights[tag_id]
+
+        other_tags = [tag_id for tag_id in tag_ids if tag_id not in query_tags]
+        if scores and other_tags:
+            shared = (models.PostTag
+                      .select(models.PostTag.post, models.PostTag.tag)
+                      .where(models.PostTag.post.in_(list(scores)) & models.PostTag.tag.in_(other_tags))
+                      .tuples())
+            for candidate_id, tag_id in shared:
+                scores[candidate_id] += weights[tag_id]
+
+        best = heapq.nlargest(limit, scores.items(), key=lambda candidate_score: candidate_score[1])
+        posts = {post.post_id: post for post in
+                 models.Post
+                 .select(models.Post.post_id, models.Post.title, models.Post.slug, models.Post.link)
+                 .where(models.Post.post_id.in_([candidate_id for candidate_id, _ in best]))}
+        return [(posts[candidate_id], score) for candidate_id, score in best if candidate_id in posts]
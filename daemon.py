@@ -0,0 +1,215 @@
+import datetime
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import models
+from metrics import metrics
+from constants import DAEMON_RELOAD_SECONDS, DAEMON_WORKERS, SYNC_INTERVAL_MINUTES, SYNC_MAX_PAGES
+from search_planner import SearchPlanner
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduledJob:
+    """
+    One recurring daemon job: a watchlist keyword search or the incremental posts sync.
+
+    Attributes:
+        name (str): Unique job name, e.g. 'search:ai' or 'sync'.
+        interval (datetime.timedelta): Time between the end of one run and the start of the next.
+        priority (int): Higher runs first when several jobs are due at once.
+        stats (dict): runs, failures, last_seconds, total_seconds and max_seconds of this job.
+    """
+
+    def __init__(self, name, kind, interval, priority, entry_id=None):
+        self.name = name
+        self.kind = kind
+        self.interval = interval
+        self.priority = priority
+        self.entry_id = entry_id
+        self.cancelled = False
+        self.stats = {'runs': 0, 'failures': 0, 'last_seconds': 0.0, 'total_seconds': 0.0, 'max_seconds': 0.0}
+
+    def record(self, seconds, failed):
+        self.stats['runs'] += 1
+        self.stats['failures'] += int(failed)
+        self.stats['last_seconds'] = seconds
+        self.stats['total_seconds'] += seconds
+        self.stats['max_seconds'] = max(self.stats['max_seconds'], seconds)
+
+
+class Daemon:
+    """
+    Long-running scheduler for watchlist searches and incremental posts syncs.
+
+    One process keeps the HTTP connection pool, the per-thread database connections, the
+    negative cache and the circuit breakers warm across runs. Jobs wait in a priority queue
+    ordered by due time, then priority; at most `workers` run at once and a job is never
+    queued again before its current run has finished. The watchlist table is re-read every
+    `reload_seconds`, so entries can be added, changed or disabled while the daemon runs.
+
+    Args:
+        scraper_handler (ScraperHandler): Shared handler used by every job.
+        workers (int): Maximum number of jobs running concurrently.
+        reload_seconds (float): Seconds between watchlist reloads.
+        sync_interval_minutes (float): Minutes between incremental posts syncs; 0 disables them.
+        sync_max_pages (int): Newest pages of posts checked per sync.
+    """
+
+    def __init__(self, scraper_handler, workers=DAEMON_WORKERS, reload_seconds=DAEMON_RELOAD_SECONDS,
+                 sync_interval_minutes=SYNC_INTERVAL_MINUTES, sync_max_pages=SYNC_MAX_PAGES):
+        self.scraper_handler = scraper_handler
+        self.workers = workers
+        self.reload_seconds = reload_seconds
+        self.sync_max_pages = sync_max_pages
+        # Scheduled refreshes must reach the origin, so no previous search is replayed
+        self.search_planner = SearchPlanner(scraper_handler, ttl_hours=0)
+        self.jobs = {}
+        self._queue = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._slots = threading.Semaphore(workers)
+        self._stopped = threading.Event()
+
+        if sync_interval_minutes:
+            sync_job = ScheduledJob('sync', 'sync', datetime.timedelta(minutes=sync_interval_minutes), priority=-1)
+            self.jobs[sync_job.name] = sync_job
+            self.schedule(sync_job, datetime.datetime.now())
+
+    def schedule(self, job, run_at):
+        with self._condition:
+            heapq.heappush(self._queue, (run_at, -job.priority, next(self._sequence), job))
+            self._condition.notify()
+
+    def load_watchlist(self):
+        # Method to add new watchlist entries as jobs, update changed ones and cancel disabled ones
+        now = datetime.datetime.now()
+        seen = set()
+        for entry in models.WatchlistEntry.select(models.WatchlistEntry, models.Keyword).join(models.Keyword):
+            name = f'search:{entry.keyword.title}'
+            if not entry.enabled:
+                continue
+            seen.add(name)
+            job = self.jobs.get(name)
+            interval = datetime.timedelta(minutes=entry.interval_minutes)
+            if job is None:
+                job = self.jobs[name] = ScheduledJob(name, 'search', interval, entry.priority, entry_id=entry.id)
+                self.schedule(job, entry.next_run_at or now)
+                logger.info("Watching '%s' every %d minutes", entry.keyword.title, entry.interval_minutes)
+            else:
+                job.interval = interval
+                job.priority = entry.priority
+
+        for name, job in list(self.jobs.items()):
+            if job.kind == 'search' and name not in seen:
+                job.cancelled = True
+                del self.jobs[name]
+                logger.info("Stopped watching '%s'", name[len('search:'):])
+
+    def run(self):
+        # Method to run jobs as they become due until stop() is called or the process is interrupted
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='daemon')
+        next_reload = 0.0
+        try:
+            while not self._stopped.is_set():
+                if time.monotonic() >= next_reload:
+                    self.load_watchlist()
+                    next_reload = time.monotonic() + self.reload_seconds
+
+                job = self.next_due_job(timeout=max(0.0, next_reload - time.monotonic()))
+                if job is None:
+                    continue
+                # Wait for a free worker, so due jobs stay in priority order in the queue meanwhile
+                self._slots.acquire()
+                if self._stopped.is_set():
+                    self._slots.release()
+                    break
+                executor.submit(self.run_job, job)
+        finally:
+            self._stopped.set()
+            executor.shutdown(wait=True)
+            self.log_stats()
+
+    def stop(self):
+        self._stopped.set()
+        with self._condition:
+            self._condition.notify_all()
+
+    def next_due_job(self, timeout):
+        # Method to pop the next due job, or return None after `timeout` seconds without one
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while not self._stopped.is_set():
+                if self._queue and self._queue[0][-1].cancelled:
+                    heapq.heappop(self._queue)
+                    continue
+                wait = deadline - time.monotonic()
+                if self._queue:
+                    due_in = (self._queue[0][0] - datetime.datetime.now()).total_seconds()
+                    if due_in <= 0:
+                        return heapq.heappop(self._queue)[-1]
+                    wait = min(wait, due_in)
+                if wait <= 0:
+                    return None
+                self._condition.wait(wait)
+        return None
+
+    def run_job(self, job):
+        started_at = datetime.datetime.now()
+        start = time.perf_counter()
+        error = None
+        try:
+            if job.kind == 'sync':
+                new_posts = self.scraper_handler.sync_recent_posts(max_pages=self.sync_max_pages)
+                logger.info("Sync stored %d new posts", new_posts, extra={'job': job.name, 'new_posts': new_posts})
+            else:
+                self.run_search(job)
+        except Exception as e:
+            error = e
+            logger.exception("Job %s failed", job.name, extra={'job': job.name})
+        finally:
+            seconds = time.perf_counter() - start
+            job.record(seconds, failed=error is not None)
+            metrics.observe('daemon_job_seconds', seconds, kind=job.kind)
+            metrics.increment('daemon_jobs_total', kind=job.kind, status='failed' if error else 'ok')
+            next_run_at = datetime.datetime.now() + job.interval
+            if job.entry_id is not None:
+                try:
+                    self.save_run(job, started_at, seconds, next_run_at, error)
+                except Exception:
+                    logger.exception("Could not store the run of %s", job.name)
+            logger.info("Job %s finished in %.2fs", job.name, seconds,
+                        extra={'job': job.name, 'seconds': round(seconds, 3), **job.stats})
+            self._slots.release()
+            if not job.cancelled and not self._stopped.is_set():
+                self.schedule(job, next_run_at)
+
+    def run_search(self, job):
+        entry = models.WatchlistEntry.get_by_id(job.entry_id)
+        search_by_keyword = models.SearchByKeyword.create(keyword=entry.keyword, page_count=entry.page_count)
+        search_items, _ = self.search_planner.search(search_by_keyword_instance=search_by_keyword)
+        logger.info("Search '%s' found %d results", entry.keyword.title, len(search_items),
+                    extra={'job': job.name, 'results': len(search_items)})
+
+    def save_run(self, job, started_at, seconds, next_run_at, error):
+        # Method to store the outcome of a watchlist run on its entry
+        models.WatchlistEntry.update(
+            last_run_at=started_at,
+            last_duration=seconds,
+            next_run_at=next_run_at,
+            run_count=models.WatchlistEntry.run_count + 1,
+            failure_count=models.WatchlistEntry.failure_count + int(error is not None),
+            last_error=None if error is None else str(error),
+        ).where(models.WatchlistEntry.id == job.entry_id).execute()
+
+    def log_stats(self):
+        for name, job in sorted(self.jobs.items()):
+            stats = job.stats
+            mean = stats['total_seconds'] / stats['runs'] if stats['runs'] else 0.0
+            logger.info("%s: %d runs, %d failed, mean %.2fs, max %.2fs",
+                        name, stats['runs'], stats['failures'], mean, stats['max_seconds'],
+                        extra={'job': name, **stats})
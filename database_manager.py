@@ -1,9 +1,52 @@
-from peewee import PostgresqlDatabase
+import threading
+import time
+
+from peewee import PostgresqlDatabase, SqliteDatabase
+
+from metrics import metrics
+
+
+class InstrumentedDatabaseMixin:
+    # Records the latency and number of every statement the database executes.
+    # Query listeners are called with (sql, seconds) after each statement, e.g. by the profiler.
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._statement_counts = threading.local()
+        self.query_listeners = []
+
+    def execute_sql(self, sql, params=None, commit=None):
+        statement = sql.split(None, 1)[0].upper() if sql else ''
+        start = time.perf_counter()
+        try:
+            return super().execute_sql(sql, params, commit)
+        finally:
+            seconds = time.perf_counter() - start
+            metrics.observe('db_query_seconds', seconds, statement=statement)
+            metrics.increment('db_statements_total', statement=statement)
+            self._statement_counts.value = self.statement_count() + 1
+            for listener in self.query_listeners:
+                listener(sql, seconds)
+
+    def statement_count(self):
+        # Number of statements executed so far by the current thread
+        return getattr(self._statement_counts, 'value', 0)
+
+
+class InstrumentedPostgresqlDatabase(InstrumentedDatabaseMixin, PostgresqlDatabase):
+    pass
+
+
+class InstrumentedSqliteDatabase(InstrumentedDatabaseMixin, SqliteDatabase):
+    def atomic(self, lock_type=None):
+        # Take the write lock when the transaction starts. A deferred transaction that reads
+        # first fails immediately with "database is locked" when another process holds it.
+        return super().atomic(lock_type=lock_type or 'IMMEDIATE')
 
 
 class DatabaseManager:
-    def __init__(self, database_name, user, password, host, port):
+    def __init__(self, database_name, user, password, host, port, engine='postgresql'):
         self.database_name = database_name
+        self.engine = engine
         self.user = user
         self.password = password
         self.host = host
@@ -12,18 +55,26 @@ class DatabaseManager:
         self.db = self.connect_to_database()
 
     def connect_to_database(self):
-        database_connection = PostgresqlDatabase(
-            self.database_name,
-            user=self.user,
-            password=self.password,
-            host=self.host,
-            port=self.port,
-        )
-        database_connection.connect()
+        if self.engine == 'sqlite':
+            # Local file database, used by the benchmark harness and for quick experiments
+            database_connection = InstrumentedSqliteDatabase(
+                self.database_name, timeout=30, pragmas={'foreign_keys': 1, 'journal_mode': 'wal'}
+            )
+        else:
+            database_connection = InstrumentedPostgresqlDatabase(
+                self.database_name,
+                user=self.user,
+                password=self.password,
+                host=self.host,
+                port=self.port,
+            )
+        # No connection is opened here: peewee connects on the first statement, so commands
+        # that never touch the database (e.g. --help) start without one
         return database_connection
 
     def close_connection(self):
-        self.db.close()
+        if not self.db.is_closed():
+            self.db.close()
 
     def create_tables(self, models):
         self.db.create_tables(models)
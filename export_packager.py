@@ -0,0 +1,129 @@
+import io
+import logging
+import os
+import queue
+import tarfile
+import threading
+import time
+import zipfile
+
+from content_store import zstandard
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Formats that are already compressed; deflating them again only costs CPU
+STORED_EXTENSIONS = {
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif', '.mp4', '.webm', '.mp3',
+    '.zip', '.gz', '.zst', '.xlsx', '.xls', '.svgz',
+}
+ARCHIVE_FORMATS = ('zip', 'tar.zst')
+
+
+class ExportPackager:
+    """
+    Streams export files into an archive while the export is still being written.
+
+    Files are queued with add() / add_bytes() as they are produced and written to the
+    archive by one background thread, so packaging overlaps with downloading instead of
+    re-reading the whole folder afterwards. In zip archives, already-compressed media is
+    stored without deflate. tar.zst archives need zstandard.
+
+    Args:
+        folder_path (str): Export folder; archive member names are relative to it.
+        archive_format (str): 'zip' or 'tar.zst'. The archive is written next to the folder.
+    """
+
+    def __init__(self, folder_path, archive_format='zip'):
+        if archive_format not in ARCHIVE_FORMATS:
+            raise ValueError(f"Unknown archive format: {archive_format}")
+        if archive_format == 'tar.zst' and zstandard is None:
+            raise RuntimeError('zstandard is required for tar.zst exports')
+        self.folder_path = folder_path
+        self.archive_format = archive_format
+        self.archive_path = f'{folder_path}.{archive_format}'
+        self.added = set()
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._error = None
+        # Set once the writer took close()'s None off the queue, so it is never waited for twice
+        self._closed = False
+        self._thread = threading.Thread(target=self._write_archive, name='export-packager', daemon=True)
+        self._thread.start()
+
+    def add(self, path):
+        # Method to queue a file that was written inside the export folder
+        self._put(os.path.relpath(path, self.folder_path), path=path)
+
+    def add_bytes(self, path, data):
+        # Method to queue content that was also written to `path`, so the file is not read back
+        self._put(os.path.relpath(path, self.folder_path), data=data)
+
+    def _put(self, arcname, path=None, data=None):
+        with self._lock:
+            # A file written twice (e.g. two posts sharing an image) is packaged once
+            if arcname in self.added:
+                return
+            self.added.add(arcname)
+        self._queue.put((arcname, path, data))
+
+    def close(self):
+        """
+        Wait for the queued files and finish the archive.
+
+        Returns:
+            str: Path of the archive.
+        """
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        logger.info("Packaged %d files into %s", len(self.added), self.archive_path)
+        return self.archive_path
+
+    def _write_archive(self):
+        try:
+            if self.archive_format == 'zip':
+                with zipfile.ZipFile(self.archive_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+                    self._drain(self._write_zip_member, archive)
+            else:
+                with open(self.archive_path, 'wb') as f, \
+                        zstandard.ZstdCompressor(level=3, threads=-1).stream_writer(f) as compressed, \
+                        tarfile.open(fileobj=compressed, mode='w|') as archive:
+                    self._drain(self._write_tar_member, archive)
+        except Exception as e:
+            # Keep consuming so producers never block; the error is raised from close(). Finishing the
+            # archive can fail after the end of the queue was reached, then there is nothing left to consume
+            self._error = e
+            while not self._closed:
+                self._closed = self._queue.get() is None
+
+    def _drain(self, write_member, archive):
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                self._closed = True
+                return
+            with metrics.timer('pipeline_stage_seconds', stage='package'):
+                write_member(archive, *entry)
+
+    def _write_zip_member(self, archive, arcname, path, data):
+        stored = os.path.splitext(arcname)[1].lower() in STORED_EXTENSIONS
+        compress_type = zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED
+        if data is None:
+            archive.write(path, arcname, compress_type=compress_type)
+        else:
+            info = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+            info.compress_type = compress_type
+            info.external_attr = 0o644 << 16
+            archive.writestr(info, data)
+
+    def _write_tar_member(self, archive, arcname, path, data):
+        if data is None:
+            archive.add(path, arcname)
+        else:
+            info = tarfile.TarInfo(arcname)
+            info.size = len(data)
+            info.mtime = time.time()
+            info.mode = 0o644
+            archive.addfile(info, io.BytesIO(data))
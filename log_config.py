@@ -0,0 +1,145 @@
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+
+# Attributes every LogRecord has; anything else was passed through `extra=` and is emitted as a field
+STANDARD_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    # One JSON object per line with the message, level, logger and any `extra` fields
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in STANDARD_RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        # Records from the queue carry the traceback already formatted, see RecordQueueHandler.prepare
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RecordQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that keeps the message and the traceback of a record apart.
+
+    The stock prepare() merges the formatted traceback into the message and drops
+    exc_info, since a traceback cannot cross the queue. Here the message is merged with
+    its arguments only and the traceback is kept as exc_text, which the listener's
+    formatter emits: appended to the line, or as the JSON `exception` field.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Let through at most `burst` records per message template every `period` seconds.
+
+    Repeated messages (the same logger, level and unformatted message) beyond the burst
+    are dropped, and the next record let through reports how many were suppressed.
+    """
+
+    def __init__(self, burst=5, period=60.0):
+        super().__init__()
+        self.burst = burst
+        self.period = period
+        self._lock = threading.Lock()
+        self._windows = {}
+
+    def filter(self, record):
+        key = (record.name, record.levelno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            window_start, count, suppressed = self._windows.get(key, (now, 0, 0))
+            if now - window_start >= self.period:
+                window_start, count = now, 0
+            if count >= self.burst:
+                self._windows[key] = (window_start, count, suppressed + 1)
+                return False
+            self._windows[key] = (window_start, count + 1, 0)
+
+        if suppressed:
+            record.suppressed = suppressed
+            record.msg = f'{record.msg} ({suppressed} similar messages suppressed)'
+        return True
+
+
+class ProgressLogger:
+    """
+    Log progress of a long loop at most once every `interval` seconds.
+    """
+
+    def __init__(self, logger, message, interval=10.0):
+        self.logger = logger
+        self.message = message
+        self.interval = interval
+        self.started = time.monotonic()
+        self.last_logged = 0.0
+
+    def update(self, done, **fields):
+        now = time.monotonic()
+        if now - self.last_logged < self.interval:
+            return
+        self.last_logged = now
+        elapsed = now - self.started
+        rate = done / elapsed if elapsed else 0
+        self.logger.info(self.message, done, rate, extra=dict(fields, done=done, rate=round(rate, 2)))
+
+
+def setup_logging(level='INFO', json_output=False, log_file=None, burst=5, period=60.0):
+    """
+    Route all logging through a queue so callers never block on stdout or file I/O.
+
+    Records are rate limited and put on an in-memory queue by the calling thread; a
+    QueueListener thread formats and writes them. Call stop() on the returned listener
+    before exiting to flush the queue.
+
+    Args:
+        level (str): Root log level.
+        json_output (bool): Emit one JSON object per line instead of plain text.
+        log_file (str): Write to this file instead of stderr.
+        burst (int): Repeated messages allowed per period before they are suppressed.
+        period (float): Rate limit window in seconds.
+
+    Returns:
+        logging.handlers.QueueListener: The running listener.
+    """
+    if log_file:
+        output_handler = logging.FileHandler(log_file, encoding='utf-8')
+    else:
+        output_handler = logging.StreamHandler()
+    if json_output:
+        output_handler.setFormatter(JsonFormatter())
+    else:
+        output_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = RecordQueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter(burst=burst, period=period))
+
+    root_logger = logging.getLogger()
+    root_logger.handlers[:] = [queue_handler]
+    root_logger.setLevel(level)
+
+    listener = logging.handlers.QueueListener(log_queue, output_handler, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -1,12 +1,28 @@
 import argparse
-import local_settings
+import datetime
+import importlib
+import os
 from database_manager import DatabaseManager
+from log_config import setup_logging
+from metrics import metrics, PeriodicJsonDump
+from profiler import RunProfiler
 import models
+from content_store import content_store
 from scraper_handler import ScraperHandler
-from report_generator import ReportGenerator
+from report_generator import REPORT_DIMENSIONS, REPORT_METHODS, ReportGenerator
+from chart_renderer import ChartRenderer
+from search_planner import SearchPlanner
+from daemon import Daemon
+from work_queue import CrawlWorker, WorkQueue
+from staging import StagingLoader, StagingWriter
+from partitioning import PartitionManager, SearchHistoryArchiver
+from schema import SchemaManager
+from sitemap_discovery import SitemapDiscovery
 from constants import (
     BASE_URL, SEARCH_URL, AUTHOR_URL_WITH_ID, SEARCH_PAGE_COUNT, POST_URL_WITH_SLUG,
-    CATEGORY_URL_WITH_ID, TAG_URL_WITH_ID, ALL_POSTS_URL
+    CATEGORY_URL_WITH_ID, TAG_URL_WITH_ID, ALL_POSTS_URL, SEARCH_CACHE_TTL_HOURS,
+    DAEMON_WORKERS, SYNC_INTERVAL_MINUTES, WATCHLIST_INTERVAL_MINUTES, SEARCH_HISTORY_RETENTION_DAYS,
+    SEARCH_HISTORY_ARCHIVE_DIR, CHART_FORMAT, CHART_TOP_N, EXPORT_ARCHIVE_FORMAT, SITEMAP_INDEX_URL
 )
 
 
@@ -22,17 +38,148 @@ def parse_arguments():
     parser.add_argument('-k', '--keyword', type=str, help='Perform keyword search')
     parser.add_argument('-p', '--page-count', type=int, default=SEARCH_PAGE_COUNT,
                         help='Number of pages to search for keyword')
+    parser.add_argument('--cache-ttl', type=float, default=SEARCH_CACHE_TTL_HOURS,
+                        help='Hours a previous search for the same keyword is reused instead of searching again')
+    parser.add_argument('-l', '--local-search', action='store_true',
+                        help='Search posts already in the database instead of search.techcrunch.com (Postgres)')
+    parser.add_argument('--async-engine', action='store_true',
+                        help='Run --fetch-all or the keyword search on the asyncio engine (requires httpx); '
+                             'keyword searches then skip the search cache')
     parser.add_argument('-g', '--generate-report', action='store_true', help='Generate report')
-    parser.add_argument('-r', '--report-type', choices=['all', 'category', 'tag', 'author'],
+    parser.add_argument('-r', '--report-type', choices=['all', *REPORT_DIMENSIONS],
                         help='Type of report to generate')
-    parser.add_argument('-m', '--report-method', choices=['all', 'database', 'current'],
+    parser.add_argument('-m', '--report-method', choices=list(REPORT_METHODS),
                         help='Method for generating report')
+    parser.add_argument('--search-id', type=int,
+                        help='Stored search reported on by --report-method snapshot (default: the latest)')
     parser.add_argument('-f', '--file-format', choices=['xls', 'json', 'csv'],
                         help='File format for saving the data')
+    parser.add_argument('--related-posts', type=str, metavar='SLUG',
+                        help='List posts related to the given post slug by shared tags')
+    parser.add_argument('--rebuild-cooccurrence', action='store_true',
+                        help='Rebuild the tag/category co-occurrence index from the link tables')
+    parser.add_argument('--daemon', action='store_true',
+                        help='Run watchlist searches and incremental posts syncs on schedule until interrupted')
+    parser.add_argument('--daemon-workers', type=int, default=DAEMON_WORKERS,
+                        help='Maximum number of daemon jobs running at once')
+    parser.add_argument('--sync-interval', type=float, default=SYNC_INTERVAL_MINUTES,
+                        help='Minutes between incremental posts syncs in daemon mode (0 disables them)')
+    parser.add_argument('--watch', type=str, metavar='KEYWORD',
+                        help='Add or update a keyword in the daemon watchlist (uses --page-count)')
+    parser.add_argument('--watch-interval', type=int, default=WATCHLIST_INTERVAL_MINUTES,
+                        help='Minutes between searches of the watched keyword')
+    parser.add_argument('--watch-priority', type=int, default=0,
+                        help='Priority of the watched keyword when several searches are due')
+    parser.add_argument('--unwatch', type=str, metavar='KEYWORD', help='Disable a keyword in the daemon watchlist')
+    parser.add_argument('--enqueue-pages', type=int, nargs=2, metavar=('FIRST', 'LAST'),
+                        help='Queue a range of posts listing pages for --worker processes')
+    parser.add_argument('--enqueue-slugs', type=str, metavar='PATH',
+                        help='Queue the post slugs listed in a file, one per line, for --worker processes')
+    parser.add_argument('--discover-sitemap', action='store_true',
+                        help='Queue the posts of the sitemaps that are new or changed since they were stored, '
+                             'for --worker processes (cheaper than paging the posts API)')
+    parser.add_argument('--sitemap-url', type=str, default=SITEMAP_INDEX_URL, help='Sitemap index to discover from')
+    parser.add_argument('--sitemap-since', type=datetime.datetime.fromisoformat, metavar='DATETIME',
+                        help='Skip sitemaps whose lastmod in the index is older, e.g. the previous discovery '
+                             '(UTC unless an offset is given)')
+    parser.add_argument('--worker', action='store_true',
+                        help='Process queued crawl tasks; run several on one or more hosts to share the work')
+    parser.add_argument('--worker-id', type=str, help='Lease owner name of this worker (default host:pid)')
+    parser.add_argument('--wait-for-work', action='store_true',
+                        help='Keep the worker polling for new tasks instead of exiting when the queue is empty')
+    parser.add_argument('--queue-status', action='store_true', help='Print crawl task counts by kind and status')
+    parser.add_argument('--clear-negative-cache', action='store_true',
+                        help='Forget cached missing authors, posts, categories and tags so they are requested again')
+    parser.add_argument('--train-content-dictionary', action='store_true',
+                        help='Train a zstd dictionary on stored posts for compressing new post bodies')
+    parser.add_argument('--migrate-content', action='store_true',
+                        help='Move inline post bodies into the compressed, deduplicated content store')
+    parser.add_argument('--reprocess', action='store_true',
+                        help='Re-derive post text and category/tag links from archived payloads, offline')
+    parser.add_argument('--reprocess-workers', type=int,
+                        help='Worker processes used by --reprocess (default: one per CPU)')
+    parser.add_argument('--init-db', action='store_true',
+                        help='Create or upgrade the tables, indexes and partitions, then record the schema version')
+    parser.add_argument('--partition-tables', action='store_true',
+                        help='Partition search history items by month and add a BRIN index on post dates (Postgres)')
+    parser.add_argument('--archive-search-history', type=int, nargs='?', const=SEARCH_HISTORY_RETENTION_DAYS,
+                        metavar='DAYS', help='Move searches older than DAYS to compressed files and delete them '
+                                             f'(default {SEARCH_HISTORY_RETENTION_DAYS} days)')
+    parser.add_argument('--archive-dir', type=str, default=SEARCH_HISTORY_ARCHIVE_DIR,
+                        help='Directory for --archive-search-history files')
+    parser.add_argument('--stage', type=str, metavar='DIR',
+                        help='Crawl all posts into CSV staging files in DIR without writing to the database')
+    parser.add_argument('--load-staged', type=str, metavar='DIR',
+                        help='Bulk-load the staging files in DIR into the database (COPY on Postgres)')
+    parser.add_argument('--metrics-port', type=int,
+                        help='Serve Prometheus metrics on this port while the command runs')
+    parser.add_argument('--metrics-dump', type=str, metavar='PATH',
+                        help='Periodically write metrics as JSON to this file')
+    parser.add_argument('--metrics-interval', type=float, default=30,
+                        help='Seconds between metrics JSON dumps')
+    parser.add_argument('--profile', action='store_true',
+                        help='Profile the run (cProfile, SQL shapes, tracemalloc) and write artifacts to output/')
+    parser.add_argument('--profile-sample-interval', type=float, metavar='SECONDS',
+                        help='Also run the sampling profiler with this interval when profiling')
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], default='INFO',
+                        help='Log level')
+    parser.add_argument('--log-json', action='store_true', help='Write logs as JSON lines')
+    parser.add_argument('--log-file', type=str, help='Write logs to this file instead of stderr')
+    parser.add_argument('--chart-format', choices=['png', 'svg'], default=CHART_FORMAT, help='Chart file format')
+    parser.add_argument('--chart-top-n', type=int, default=CHART_TOP_N,
+                        help='Bars shown per chart; the remaining entries are summed into an "other" bar')
+    parser.add_argument('--archive-format', choices=['zip', 'tar.zst'], default=EXPORT_ARCHIVE_FORMAT,
+                        help='Archive the exported report folder is packaged into')
+    parser.add_argument('-t', '--trend', choices=['day', 'week', 'month'],
+                        help='Generate a trend report of posts per period instead of totals')
 
     return parser.parse_args()
 
 
+def generate_reports(report_generator, args, keyword=None, parsed_items=None):
+    # Method to report on every requested dimension; reports of a search are exported, others are printed
+    report_types = list(REPORT_DIMENSIONS) if args.report_type in (None, 'all') else [args.report_type]
+    export = args.generate_report and parsed_items is not None
+    search = models.SearchByKeyword.get_by_id(args.search_id) if args.search_id else None
+    reports = {}
+    for report_type in report_types:
+        report_content, reports[report_type] = report_generator.build_report(
+            report_type,
+            method=args.report_method,
+            period=args.trend,
+            keyword_used=args.keyword,
+            parsed_items=parsed_items,
+            search=search,
+        )
+        if export:
+            report_generator.export_report(report_content, reports[report_type], keyword, parsed_items,
+                                           args.file_format, dimension=report_type,
+                                           archive_format=args.archive_format)
+        else:
+            print(report_content)
+    if not export:
+        # All charts are rendered in one parallel pass
+        report_generator.draw_charts(reports)
+
+
+def create_async_handler():
+    # httpx is only needed for the async engine, so it is imported on demand
+    from async_scraper_handler import AsyncScraperHandler
+    return AsyncScraperHandler(
+        database_manager=database_manager,
+        baseurl=BASE_URL,
+        searchurl=SEARCH_URL,
+        posturl=POST_URL_WITH_SLUG,
+        authorsurl=AUTHOR_URL_WITH_ID,
+        categoryurl=CATEGORY_URL_WITH_ID,
+        tagurl=TAG_URL_WITH_ID,
+        allpostsurl=ALL_POSTS_URL,
+    )
+
+
+# Settings module, local_settings unless SCRAPER_SETTINGS names another one (e.g. for benchmarks)
+local_settings = importlib.import_module(os.environ.get('SCRAPER_SETTINGS', 'local_settings'))
+
 # Initialize the database manager
 database_manager = DatabaseManager(
     database_name=local_settings.DATABASE['name'],
@@ -40,24 +187,37 @@ database_manager = DatabaseManager(
     password=local_settings.DATABASE['password'],
     host=local_settings.DATABASE['host'],
     port=local_settings.DATABASE['port'],
+    engine=local_settings.DATABASE.get('engine', 'postgresql'),
 )
 
 if __name__ == "__main__":
+    # models imported this file again as the `main` module; share that module's database manager,
+    # so the models and everything built here run on the same connection
+    from main import database_manager
+
     args = parse_arguments()
+    log_listener = setup_logging(level=args.log_level, json_output=args.log_json, log_file=args.log_file)
+    metrics_server = None
+    metrics_dump = None
+    run_profiler = None
 
     try:
-        # Create database tables if they do not exist
-        database_manager.create_tables([
-            models.Author,
-            models.Category,
-            models.Tag,
-            models.Post,
-            models.PostCategory,
-            models.PostTag,
-            models.Keyword,
-            models.SearchByKeyword,
-            models.PostSearchByKeywordItem,
-        ])
+        if args.profile:
+            run_profiler = RunProfiler(database_manager.db, sample_interval=args.profile_sample_interval).start()
+
+        # Expose scraper metrics while the command runs
+        if args.metrics_port:
+            metrics_server = metrics.serve(args.metrics_port)
+        if args.metrics_dump:
+            metrics_dump = PeriodicJsonDump(metrics, args.metrics_dump, interval=args.metrics_interval).start()
+
+        # Create or upgrade tables, indexes and partitions on --init-db, or when the recorded schema version is stale
+        schema_manager = SchemaManager(database_manager)
+        if args.init_db:
+            schema_manager.initialize()
+        else:
+            schema_manager.ensure_current()
+        partition_manager = PartitionManager(database_manager)
 
         # Initialize the ScraperHandler
         scraper_handler = ScraperHandler(
@@ -72,18 +232,108 @@ if __name__ == "__main__":
         )
 
         # Initialize the ReportGenerator
-        report_generator = ReportGenerator(database_manager)
+        report_generator = ReportGenerator(
+            database_manager, ChartRenderer(chart_format=args.chart_format, top_n=args.chart_top_n)
+        )
+
+        if args.rebuild_cooccurrence:
+            scraper_handler.cooccurrence_index.rebuild()
+            print("Co-occurrence index rebuilt.")
+
+        if args.clear_negative_cache:
+            cleared = scraper_handler.negative_cache.clear()
+            print(f"Negative cache cleared ({cleared} entries).")
+
+        if args.train_content_dictionary:
+            dictionary_id = content_store.train_dictionary()
+            print(f"Content dictionary {dictionary_id} trained.")
+
+        if args.migrate_content:
+            moved = content_store.migrate()
+            print(f"Moved {moved} post bodies into the content store: {content_store.stats()}")
+
+        if args.partition_tables:
+            if partition_manager.partition_tables():
+                print("Search history partitioned by month.")
+
+        if args.archive_search_history is not None:
+            stats = SearchHistoryArchiver(database_manager, args.archive_dir).archive(args.archive_search_history)
+            print(f"Archived {stats['searches']} searches ({stats['items']} items, "
+                  f"{stats['partitions_dropped']} partitions dropped) to {stats['path']}.")
+
+        if args.stage:
+            segments = StagingWriter(scraper_handler, args.stage).run()
+            print(f"Staged {segments} segments in {args.stage}.")
+
+        if args.load_staged:
+            stats = StagingLoader(database_manager, args.load_staged).load()
+            print(f"Loaded {stats['segments']} staged segments: "
+                  f"{stats['rows_inserted']} of {stats['rows_staged']} rows inserted.")
+
+        if args.reprocess:
+            stats = scraper_handler.payload_archive.reprocess(workers=args.reprocess_workers)
+            print(f"Reprocessed {stats['posts']} archived posts: {stats['links_added']} links added, "
+                  f"{stats['links_removed']} removed, {stats['unknown_references']} unknown category/tag ids.")
+
+        if args.watch:
+            watched_keyword, _ = models.Keyword.get_or_create(title=args.watch)
+            models.WatchlistEntry.insert(
+                keyword=watched_keyword, page_count=args.page_count, interval_minutes=args.watch_interval,
+                priority=args.watch_priority, enabled=True,
+            ).on_conflict(
+                conflict_target=[models.WatchlistEntry.keyword],
+                preserve=[models.WatchlistEntry.page_count, models.WatchlistEntry.interval_minutes,
+                          models.WatchlistEntry.priority, models.WatchlistEntry.enabled],
+            ).execute()
+            print(f"Watching '{args.watch}' every {args.watch_interval} minutes.")
 
-        argkeyword = args.keyword
-        method = args.report_method
-        parsed_items = None
-        report_content = ""
-        report = ""
+        if args.unwatch:
+            models.WatchlistEntry.update(enabled=False).where(
+                models.WatchlistEntry.keyword.in_(models.Keyword.select().where(models.Keyword.title == args.unwatch))
+            ).execute()
+            print(f"Stopped watching '{args.unwatch}'.")
 
-        if args.fetch_all:
+        work_queue = WorkQueue(database_manager, worker_id=args.worker_id)
+        if args.enqueue_pages:
+            queued = work_queue.enqueue_pages(*args.enqueue_pages)
+            print(f"Queued {queued} pages.")
+        if args.enqueue_slugs:
+            with open(args.enqueue_slugs) as slugs_file:
+                queued = work_queue.enqueue_slugs(line.strip() for line in slugs_file if line.strip())
+            print(f"Queued {queued} slugs.")
+        if args.discover_sitemap:
+            stats = SitemapDiscovery(scraper_handler, work_queue, args.sitemap_url).discover(since=args.sitemap_since)
+            print(f"Sitemaps listed {stats['urls']} posts: queued {stats['new']} new and {stats['changed']} changed "
+                  f"({stats['sitemaps']} sitemaps read, {stats['sitemaps_skipped']} skipped).")
+
+        if args.daemon:
+            Daemon(scraper_handler, workers=args.daemon_workers, sync_interval_minutes=args.sync_interval).run()
+
+        elif args.worker:
+            scraper_handler.page_delay = 0
+            CrawlWorker(scraper_handler, work_queue).run(wait_for_work=args.wait_for_work)
+
+        elif args.related_posts:
+            post = models.Post.get(models.Post.slug == args.related_posts)
+            for related_post, score in scraper_handler.cooccurrence_index.related_posts(post.post_id):
+                print(f"{score:.3f} {related_post.title} ({related_post.link})")
+
+        elif args.fetch_all:
             print("you can intrupt the progress by pressing control+c the website has over 2 million posts")
             # Fetch all pages
-            scraper_handler.fetch_all_pages()
+            if args.async_engine:
+                # asyncio is only loaded by the async engine
+                import asyncio
+                async_handler = create_async_handler()
+                asyncio.run(async_handler.fetch_all_pages())
+                async_handler.close()
+            else:
+                scraper_handler.fetch_all_pages()
+
+        elif args.keyword and args.local_search and not scraper_handler.local_search_index.enabled:
+            # The local full-text index (tsvector, GIN) only exists on Postgres
+            raise SystemExit(f"--local-search needs Postgres full-text search; "
+                             f"the configured database engine is {database_manager.engine}.")
 
         elif args.keyword:
             # Perform keyword search
@@ -92,161 +342,60 @@ if __name__ == "__main__":
             page_count = args.page_count
 
             search_by_keyword = models.SearchByKeyword.create(keyword=keyword, page_count=page_count)
-            search_items, parsed_items = scraper_handler.search_by_keyword(
-                search_by_keyword_instance=search_by_keyword
-            )
-
-            if args.generate_report:
-                if args.report_type == 'all':
-                    report_types = ['category', 'tag', 'author']
-                else:
-                    report_types = [args.report_type]
-
-                for report_type in report_types:
-                    if report_type == 'category':
-                        report_content, data = report_generator.count_post_per_category(
-                            method=args.report_method,
-                            keyword_used=args.keyword,
-                            parsed_items=parsed_items
-                        )
-                    elif report_type == 'tag':
-                        report_content, data = report_generator.count_post_per_tag(
-                            method=args.report_method,
-                            keyword_used=args.keyword,
-                            parsed_items=parsed_items
-                        )
-                    elif report_type == 'author':
-                        report_content, data = report_generator.count_post_per_author(
-                            method=args.report_method,
-                            keyword_used=args.keyword,
-                            parsed_items=parsed_items
-                        )
-                    else:
-                        print("Error: Please specify a valid report type.")
-
-                    report_generator.export_report(report_content, data, keyword, parsed_items, args.file_format)
-
-            elif args.report_type == 'category':
-                if args.report_method == 'all' or args.report_method == 'database' or args.report_method is None:
-                    report, data = report_generator.count_post_per_category(
-                        keyword_used=argkeyword,
-                        method=method,
-                        parsed_items=parsed_items
-                    )
-                    print(report)
-                    report_generator.draw_chart(data)
-                elif args.report_method == 'current':
-                    report, data = report_generator.count_post_per_category(
-                        keyword_used=argkeyword,
-                        method=method,
-                        parsed_items=parsed_items
-                    )
-                    print(report)
-                    report_generator.draw_chart(data)
-            elif args.report_type == 'tag':
-                if args.report_method == 'all' or args.report_method == 'database' or args.report_method is None:
-                    report, data = report_generator.count_post_per_tag(
-                        keyword_used=keyword.id,  # Pass keyword ID instead of title
-                        method=method,
-                        parsed_items=parsed_items
-                    )
-                    print(report)
-                    report_generator.draw_chart(data)
-                elif args.report_method == 'current':
-                    report, data = report_generator.count_post_per_tag(
-                        keyword_used=keyword.id,
-                        method=method,
-                        parsed_items=parsed_items
-                    )
-                    print(report)
-                    report_generator.draw_chart(data)
-            elif args.report_type == 'author':
-                if args.report_method == 'database':
-                    report, data = report_generator.count_post_per_author(
-                        keyword_used=argkeyword,
-                        method=method,
-                        parsed_items=parsed_items
-                    )
-                    print(report)
-                    report_generator.draw_chart(data)
-                elif args.report_method == 'current':
-                    report, data = report_generator.count_post_per_author(
-                        keyword_used=argkeyword,
-                        method=method,
-                        parsed_items=parsed_items
-                    )
-                    print(report)
-                    report_generator.draw_chart(data)
-                elif args.report_method == 'all':
-                    print('report countof author in the techcrunch is not implemented')
+            if args.local_search:
+                search_items, parsed_items = scraper_handler.search_local(
+                    search_by_keyword_instance=search_by_keyword
+                )
+            elif args.async_engine:
+                import asyncio
+                async_handler = create_async_handler()
+                search_items, parsed_items = asyncio.run(async_handler.search_by_keyword(
+                    search_by_keyword_instance=search_by_keyword
+                ))
+                async_handler.close()
+            else:
+                search_planner = SearchPlanner(scraper_handler, ttl_hours=args.cache_ttl)
+                search_items, parsed_items = search_planner.search(
+                    search_by_keyword_instance=search_by_keyword
+                )
+
+            if args.generate_report or args.report_type:
+                generate_reports(report_generator, args, keyword, parsed_items)
 
             else:
                 for idx, parsed_item in enumerate(parsed_items):
                     print(f'post {idx}: ', parsed_item)
 
-        elif args.report_type == 'category':
-            if args.report_method == 'all' or args.report_method == 'database' or args.report_method is None:
-                report, data = report_generator.count_post_per_category(
-                    keyword_used=argkeyword,
-                    method=method,
-                    parsed_items=parsed_items
-
-                )
-                print(report)
-                report_generator.draw_chart(data)
-            elif args.report_method == 'current':
-                report, data = report_generator.count_post_per_category(
-                    keyword_used=argkeyword,
-                    method=method,
-                    parsed_items=parsed_items
-                )
-                print(report)
-                report_generator.draw_chart(data)
-        elif args.report_type == 'tag':
-            if args.report_method == 'all' or args.report_method == 'database' or args.report_method is None:
-                report, data = report_generator.count_post_per_tag(
-                    keyword_used=keyword.id,  # Pass keyword ID instead of title
-                    method=method,
-                    parsed_items=parsed_items
-                )
-                print(report)
-                report_generator.draw_chart(data)
-            elif args.report_method == 'current':
-                report, data = report_generator.count_post_per_tag(
-                    keyword_used=keyword.id,  # Pass keyword ID instead of title
-                    method=method,
-                    parsed_items=parsed_items
-                )
-                print(report)
-                report_generator.draw_chart(data)
-        elif args.report_type == 'author':
-            if args.report_method == 'database':
-                report, data = report_generator.count_post_per_author(
-                    keyword_used=argkeyword,
-                    method=method,
-                    parsed_items=parsed_items
-                )
-                print(report)
-                report_generator.draw_chart(data)
-            elif args.report_method == 'current':
-                report, data = report_generator.count_post_per_author(
-                    keyword_used=argkeyword,
-                    method=method,
-                    parsed_items=parsed_items
-                )
-                print(report)
-                report_generator.draw_chart(data)
-            elif args.report_method == 'all':
-                print('report countof author in the techcrunch is not implemented')
-        else:
+        elif args.report_type:
+            generate_reports(report_generator, args)
+        elif not (args.init_db or args.rebuild_cooccurrence or args.clear_negative_cache
+                  or args.train_content_dictionary or args.migrate_content or args.reprocess or args.stage or args.load_staged
+                  or args.partition_tables or args.archive_search_history is not None
+                  or args.watch or args.unwatch or args.enqueue_pages or args.enqueue_slugs or args.discover_sitemap
+                  or args.queue_status):
             print("Error: Please specify a valid option.")
 
+        if args.queue_status:
+            for (kind, status), count in sorted(work_queue.status_counts().items()):
+                print(f"{kind:<12}{status:<10}{count:>8}")
+
+        if scraper_handler.negative_cache.requests_avoided:
+            print(f"Negative cache avoided {scraper_handler.negative_cache.requests_avoided} requests.")
+
     except KeyboardInterrupt:
         print("KeyboardInterrupt: Program terminated.")
 
     finally:
+        if run_profiler:
+            run_profiler.stop()
+        if metrics_dump:
+            metrics_dump.stop()
+        if metrics_server:
+            metrics_server.shutdown()
+
         # Close database connection
         database_manager.close_connection()
         print('Database connection closed.')
+        log_listener.stop()
 
 # TODO: enhance and optimize main.py
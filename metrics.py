@@ -0,0 +1,194 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self):
+        # Prometheus buckets are cumulative: le="x" counts every observation <= x
+        total = 0
+        for upper_bound, bucket_count in zip(self.buckets + (float('inf'),), self.bucket_counts):
+            total += bucket_count
+            yield upper_bound, total
+
+
+class MetricsRegistry:
+    """
+    Thread-safe in-process counters and histograms, keyed by metric name and labels.
+
+    Exposed as Prometheus text (to_prometheus / serve) or as a JSON document (to_dict / dump_json).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._buckets = {}
+
+    def register_histogram(self, name, buckets):
+        # Method to set the buckets of a histogram before its first observation
+        self._buckets[name] = tuple(buckets)
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self._buckets.get(name, LATENCY_BUCKETS))
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        # Context manager observing the elapsed seconds of its block
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: {'counters': [...], 'histograms': [...]} with one entry per name and label set.
+        """
+        with self._lock:
+            counters = [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            histograms = [
+                {
+                    'name': name,
+                    'labels': dict(labels),
+                    'count': histogram.count,
+                    'sum': histogram.sum,
+                    'buckets': {
+                        ('+Inf' if upper_bound == float('inf') else str(upper_bound)): count
+                        for upper_bound, count in histogram.cumulative_counts()
+                    },
+                }
+                for (name, labels), histogram in sorted(self._histograms.items())
+            ]
+        return {'timestamp': time.time(), 'counters': counters, 'histograms': histograms}
+
+    def to_prometheus(self):
+        # Method to render all metrics in the Prometheus text exposition format
+        lines = []
+        with self._lock:
+            typed = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in typed:
+                    lines.append(f'# TYPE {name} counter')
+                    typed.add(name)
+                lines.append(f'{name}{self._format_labels(labels)} {value}')
+
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                if name not in typed:
+                    lines.append(f'# TYPE {name} histogram')
+                    typed.add(name)
+                for upper_bound, count in histogram.cumulative_counts():
+                    le = '+Inf' if upper_bound == float('inf') else str(upper_bound)
+                    lines.append(f'{name}_bucket{self._format_labels(labels + (("le", le),))} {count}')
+                lines.append(f'{name}_sum{self._format_labels(labels)} {histogram.sum}')
+                lines.append(f'{name}_count{self._format_labels(labels)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _format_labels(labels):
+        if not labels:
+            return ''
+        pairs = ','.join('{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                         for key, value in labels)
+        return '{' + pairs + '}'
+
+    def dump_json(self, path):
+        # Method to write the current metrics to a JSON file, replacing it atomically
+        temporary_path = f'{path}.tmp'
+        with open(temporary_path, 'w') as json_file:
+            json.dump(self.to_dict(), json_file, indent=4)
+        os.replace(temporary_path, path)
+
+    def serve(self, port, host='127.0.0.1'):
+        """
+        Serve /metrics in Prometheus text format from a daemon thread.
+
+        Returns:
+            ThreadingHTTPServer: The running server; call shutdown() to stop it.
+        """
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.to_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+class PeriodicJsonDump:
+    """
+    Write the registry to a JSON file every `interval` seconds from a daemon thread.
+    """
+
+    def __init__(self, registry, path, interval=30):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        # Stop the thread and write one last dump with the final numbers
+        self._stopped.set()
+        self._thread.join()
+        self.registry.dump_json(self.path)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.registry.dump_json(self.path)
+
+
+# Process-wide registry used by the scraper, database and report code
+metrics = MetricsRegistry()
+metrics.register_histogram('db_statements_per_post', COUNT_BUCKETS)
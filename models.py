@@ -1,7 +1,11 @@
+import datetime
+
 import peewee
+from playhouse.postgres_ext import TSVectorField
 
 import constants
 import main
+from content_store import content_store
 
 
 class BaseModel(peewee.Model):
@@ -42,25 +46,94 @@ class Tag(BaseCategoryTag):
         return self.name
 
 
+class ContentDictionary(BaseModel):
+    data = peewee.BlobField()
+    created_at = peewee.DateTimeField(default=datetime.datetime.now)
+
+    def __str__(self):
+        return f'content dictionary {self.id}'
+
+
+class ContentBlob(BaseModel):
+    content_hash = peewee.CharField(max_length=64, primary_key=True)
+    codec = peewee.CharField(max_length=20)
+    dictionary = peewee.ForeignKeyField(ContentDictionary, null=True, backref='blobs')
+    raw_size = peewee.IntegerField()
+    data = peewee.BlobField()
+
+    def __str__(self):
+        return f'{self.content_hash}({self.codec})'
+
+
 class Post(BaseModel):
     post_id = peewee.PrimaryKeyField()
-    created_date = peewee.DateTimeField()
+    created_date = peewee.DateTimeField(index=True)
     modified_date = peewee.DateTimeField()
-    slug = peewee.CharField(max_length=250)
+    # UTC time of the last edit, as sitemaps report it; NULL for posts stored before it was recorded
+    modified_gmt = peewee.DateTimeField(null=True)
+    slug = peewee.CharField(max_length=250, index=True)
     status = peewee.CharField(max_length=50)
     post_type = peewee.CharField(max_length=50)
     link = peewee.CharField(max_length=250)
     title = peewee.CharField(max_length=250)
-    content = peewee.TextField()
+    # Inline body; empty when the body lives in the content store (content_blob)
+    raw_content = peewee.TextField(column_name='content', null=True)
+    content_blob = peewee.ForeignKeyField(ContentBlob, null=True, backref='posts')
     excerpt = peewee.TextField()
     author = peewee.ForeignKeyField(Author, backref='posts')
     featured_media_link = peewee.CharField(max_length=250)
     post_format = peewee.CharField(max_length=50)
 
+    @property
+    def content(self):
+        # The body is read from the content store on first access and kept on the instance
+        if getattr(self, '_content_changed', False):
+            return self._content_text
+        if self.raw_content is not None:
+            return self.raw_content
+        if self.content_blob_id is None:
+            return None
+        if getattr(self, '_content_text', None) is None:
+            self._content_text = content_store.load(self.content_blob_id)
+        return self._content_text
+
+    @content.setter
+    def content(self, value):
+        # Nothing is written until the post is saved
+        self._content_text = value
+        self._content_changed = True
+
+    def save(self, *args, **kwargs):
+        # An assigned body goes to the content store (or stays inline) and into the search vector on save
+        content_changed = getattr(self, '_content_changed', False)
+        if content_changed:
+            if self._content_text is not None and content_store.enabled:
+                self.content_blob = content_store.store(self._content_text)
+                self.raw_content = None
+            else:
+                self.content_blob = None
+                self.raw_content = self._content_text
+        saved = super().save(*args, **kwargs)
+        if content_changed:
+            self._content_changed = False
+            # search_index imports this module, so it is imported here
+            from search_index import LocalSearchIndex
+            LocalSearchIndex(main.database_manager).index_posts(
+                [(self.post_id, self.title, self.excerpt, self._content_text)]
+            )
+        return saved
+
     def __str__(self):
         return self.title
 
 
+class PostSearchVector(BaseModel):
+    # Full-text vector of a post built from its full body when the post is written, so bodies
+    # moved to the content store stay searchable; only filled on Postgres (see search_index)
+    post = peewee.ForeignKeyField(Post, primary_key=True, backref='search_vectors', on_delete='CASCADE')
+    vector = TSVectorField(index=False)
+
+
 class PostCategory(BaseModel):
     post = peewee.ForeignKeyField(Post, backref='post_categories', on_delete='CASCADE')
     category = peewee.ForeignKeyField(Category, backref='post_categories', on_delete='CASCADE')
@@ -77,6 +150,34 @@ class PostTag(BaseModel):
         return f'{self.post.title}({self.tag.name})'
 
 
+class TagCooccurrence(BaseModel):
+    tag = peewee.ForeignKeyField(Tag, backref='cooccurrences', on_delete='CASCADE')
+    other_tag = peewee.ForeignKeyField(Tag, backref='+', on_delete='CASCADE')
+    count = peewee.IntegerField(default=0)
+
+    class Meta:
+        indexes = (
+            (('tag', 'other_tag'), True),
+        )
+
+    def __str__(self):
+        return f'{self.tag.name} x {self.other_tag.name}({self.count})'
+
+
+class CategoryTagCooccurrence(BaseModel):
+    category = peewee.ForeignKeyField(Category, backref='tag_cooccurrences', on_delete='CASCADE')
+    tag = peewee.ForeignKeyField(Tag, backref='category_cooccurrences', on_delete='CASCADE')
+    count = peewee.IntegerField(default=0)
+
+    class Meta:
+        indexes = (
+            (('category', 'tag'), True),
+        )
+
+    def __str__(self):
+        return f'{self.category.name} x {self.tag.name}({self.count})'
+
+
 class Keyword(BaseModel):
     title = peewee.CharField(max_length=250, unique=True)
 
@@ -87,6 +188,11 @@ class Keyword(BaseModel):
 class SearchByKeyword(BaseModel):
     keyword = peewee.ForeignKeyField(Keyword, backref='searches')
     page_count = peewee.IntegerField(default=constants.SEARCH_PAGE_COUNT)
+    created_at = peewee.DateTimeField(default=datetime.datetime.now, index=True)
+    remote_requests = peewee.IntegerField(default=0)
+    requests_avoided = peewee.IntegerField(default=0)
+    # Set once the search's items are stored; only completed searches are replayed
+    completed_at = peewee.DateTimeField(null=True)
 
     def __str__(self):
         return self.keyword.title
@@ -102,3 +208,114 @@ class PostSearchByKeywordItem(BaseModel):
 
     def __str__(self):
         return f'{self.title}({self.search_by_keyword.keyword.title})'
+
+
+class WatchlistEntry(BaseModel):
+    keyword = peewee.ForeignKeyField(Keyword, backref='watchlist_entries', unique=True, on_delete='CASCADE')
+    page_count = peewee.IntegerField(default=constants.SEARCH_PAGE_COUNT)
+    interval_minutes = peewee.IntegerField(default=constants.WATCHLIST_INTERVAL_MINUTES)
+    priority = peewee.IntegerField(default=0)
+    enabled = peewee.BooleanField(default=True)
+    next_run_at = peewee.DateTimeField(null=True)
+    last_run_at = peewee.DateTimeField(null=True)
+    last_duration = peewee.FloatField(null=True)
+    run_count = peewee.IntegerField(default=0)
+    failure_count = peewee.IntegerField(default=0)
+    last_error = peewee.TextField(null=True)
+
+    def __str__(self):
+        return f'{self.keyword.title}(every {self.interval_minutes} min)'
+
+
+class CrawlTask(BaseModel):
+    kind = peewee.CharField(max_length=50)
+    key = peewee.CharField(max_length=250)
+    status = peewee.CharField(max_length=20, default='pending')
+    attempts = peewee.IntegerField(default=0)
+    lease_owner = peewee.CharField(max_length=250, null=True)
+    lease_expires_at = peewee.DateTimeField(null=True)
+    created_at = peewee.DateTimeField(default=datetime.datetime.now)
+    finished_at = peewee.DateTimeField(null=True)
+    last_error = peewee.TextField(null=True)
+
+    class Meta:
+        indexes = (
+            (('kind', 'key'), True),
+            (('status', 'lease_expires_at'), False),
+        )
+
+    def __str__(self):
+        return f'{self.kind} {self.key}({self.status})'
+
+
+class RawPostPayload(BaseModel):
+    # Not a foreign key: the payload is archived before the post row is created
+    post_id = peewee.IntegerField(primary_key=True)
+    modified_date = peewee.DateTimeField(null=True)
+    codec = peewee.CharField(max_length=20)
+    data = peewee.BlobField()
+    fetched_at = peewee.DateTimeField(default=datetime.datetime.now)
+
+    def __str__(self):
+        return f'payload {self.post_id}({self.codec})'
+
+
+class StagingLoad(BaseModel):
+    # One row per loaded staging segment, committed with the segment's rows
+    segment = peewee.CharField(max_length=250, primary_key=True)
+    rows_staged = peewee.IntegerField()
+    rows_inserted = peewee.IntegerField()
+    loaded_at = peewee.DateTimeField(default=datetime.datetime.now)
+
+    def __str__(self):
+        return f'{self.segment}({self.rows_inserted}/{self.rows_staged})'
+
+
+class NegativeCacheEntry(BaseModel):
+    kind = peewee.CharField(max_length=50)
+    key = peewee.CharField(max_length=250)
+    status = peewee.IntegerField()
+    created_at = peewee.DateTimeField(default=datetime.datetime.now)
+    expires_at = peewee.DateTimeField()
+
+    class Meta:
+        indexes = (
+            (('kind', 'key'), True),
+        )
+
+    def __str__(self):
+        return f'{self.kind} {self.key}({self.status})'
+
+
+class SchemaVersion(BaseModel):
+    # Single row recording the schema version the tables were last initialized for
+    version = peewee.IntegerField()
+    initialized_at = peewee.DateTimeField(default=datetime.datetime.now)
+
+    def __str__(self):
+        return f'schema {self.version}'
+
+
+# Every table, in dependency order, for create_tables / drop_tables
+ALL_MODELS = [
+    Author,
+    Category,
+    Tag,
+    ContentDictionary,
+    ContentBlob,
+    Post,
+    PostSearchVector,
+    PostCategory,
+    PostTag,
+    TagCooccurrence,
+    CategoryTagCooccurrence,
+    Keyword,
+    SearchByKeyword,
+    PostSearchByKeywordItem,
+    WatchlistEntry,
+    CrawlTask,
+    NegativeCacheEntry,
+    RawPostPayload,
+    StagingLoad,
+    SchemaVersion,
+]
@@ -0,0 +1,81 @@
+import datetime
+import threading
+
+import models
+from metrics import metrics
+from constants import NEGATIVE_CACHE_TTL_HOURS
+
+
+class NegativeCache:
+    """
+    Persistent record of ids the origin answered as missing (404, 401, empty result).
+
+    Entries expire after a per-kind TTL so that ids which appear later are picked up
+    again. Lookups hit an in-process copy first, then the NegativeCacheEntry table.
+
+    Args:
+        database_manager (DatabaseManager): The database the entries are stored in.
+        ttl_hours (dict): Hours an entry stays valid, keyed by kind ('author', 'post', 'category', 'tag').
+    """
+
+    def __init__(self, database_manager, ttl_hours=None):
+        self.database_manager = database_manager
+        self.ttl_hours = ttl_hours or NEGATIVE_CACHE_TTL_HOURS
+        self.requests_avoided = 0
+        self._expires = {}
+        self._lock = threading.Lock()
+
+    def is_missing(self, kind, key, count_hit=True):
+        """
+        Check whether `key` is known to be missing; a hit counts as an avoided request unless count_hit is False.
+
+        Returns:
+            bool: True while an unexpired entry exists for (kind, key).
+        """
+        key = str(key)
+        now = datetime.datetime.now()
+        expires_at = self._expires.get((kind, key))
+        if expires_at is None:
+            entry = models.NegativeCacheEntry.get_or_none(
+                (models.NegativeCacheEntry.kind == kind) & (models.NegativeCacheEntry.key == key)
+            )
+            if entry is None:
+                return False
+            expires_at = self._expires[(kind, key)] = entry.expires_at
+        if expires_at <= now:
+            return False
+        if not count_hit:
+            return True
+
+        with self._lock:
+            self.requests_avoided += 1
+        metrics.increment('negative_cache_hits_total', kind=kind)
+        return True
+
+    def remember(self, kind, key, status):
+        # Method to store (or refresh) a missing id, answered with the given HTTP status
+        key = str(key)
+        now = datetime.datetime.now()
+        expires_at = now + datetime.timedelta(hours=self.ttl_hours[kind])
+        models.NegativeCacheEntry.insert(
+            kind=kind, key=key, status=status, created_at=now, expires_at=expires_at
+        ).on_conflict(
+            conflict_target=[models.NegativeCacheEntry.kind, models.NegativeCacheEntry.key],
+            preserve=[models.NegativeCacheEntry.status, models.NegativeCacheEntry.created_at,
+                      models.NegativeCacheEntry.expires_at],
+        ).execute()
+        self._expires[(kind, key)] = expires_at
+        metrics.increment('negative_cache_entries_total', kind=kind)
+
+    def clear(self, kind=None):
+        """
+        Delete cached entries so the ids are requested again.
+
+        Returns:
+            int: Number of entries deleted.
+        """
+        query = models.NegativeCacheEntry.delete()
+        if kind is not None:
+            query = query.where(models.NegativeCacheEntry.kind == kind)
+        self._expires.clear()
+        return query.execute()
@@ -0,0 +1,133 @@
+import datetime
+import sys
+from dataclasses import dataclass, field
+
+import models
+from content_store import content_store
+
+# Date format of exported posts
+EXPORT_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def load_posts(post_ids):
+    """
+    Load full stored posts with one query, and their bodies kept in the content store with one more.
+
+    Returns:
+        dict: post_id -> Post, content and excerpt included.
+    """
+    posts = {post.post_id: post for post in models.Post.select().where(models.Post.post_id.in_(list(post_ids)))}
+    stored = [post for post in posts.values() if post.raw_content is None and post.content_blob_id is not None]
+    if stored:
+        bodies = content_store.load_many({post.content_blob_id for post in stored})
+        for post in stored:
+            # The cache Post.content reads before querying the content store
+            post._content_text = bodies.get(post.content_blob_id)
+    return posts
+
+
+class Taxonomy:
+    """
+    Authors, categories and tags referenced by parsed posts, each held once by id.
+
+    A keyword run loads the same few authors and categories for many posts; parsed posts
+    keep only their ids and resolve them here, so each object is in memory once per run.
+    """
+
+    def __init__(self):
+        self.authors = {}
+        self.categories = {}
+        self.tags = {}
+
+    def intern(self, registry, objects):
+        # Method to register model instances by id, keeping the first instance seen for each id
+        ids = []
+        for obj in objects:
+            obj_id = obj.get_id()
+            registry.setdefault(obj_id, obj)
+            ids.append(obj_id)
+        return tuple(ids)
+
+    def __len__(self):
+        return len(self.authors) + len(self.categories) + len(self.tags)
+
+
+@dataclass(frozen=True, slots=True)
+class ParsedPost:
+    """
+    Compact, immutable record of a post found by the current command.
+
+    Holds the post's scalar fields and the ids of its author, categories and tags, which
+    resolve through the run's shared Taxonomy. The content and excerpt are not kept:
+    exporters load them with load_post() one post at a time.
+    """
+
+    post_id: int
+    title: str
+    slug: str
+    link: str
+    created_date: datetime.datetime
+    modified_date: datetime.datetime
+    status: str
+    post_type: str
+    post_format: str
+    featured_media_link: str
+    author_id: int
+    category_ids: tuple
+    tag_ids: tuple
+    taxonomy: Taxonomy = field(repr=False, compare=False)
+
+    @classmethod
+    def from_post(cls, post, author, categories, tags, taxonomy):
+        """
+        Build the record of a stored post and intern its author, categories and tags.
+
+        Args:
+            post (Post): The stored post.
+            author (Author): The post's author, or None.
+            categories (list): The post's categories.
+            tags (list): The post's tags.
+            taxonomy (Taxonomy): The registry shared by the run's parsed posts.
+        """
+        author_ids = taxonomy.intern(taxonomy.authors, [author] if author is not None else [])
+        return cls(
+            post_id=post.post_id,
+            title=post.title,
+            slug=post.slug,
+            link=post.link,
+            created_date=post.created_date,
+            modified_date=post.modified_date,
+            # A handful of distinct values shared by every post
+            status=sys.intern(post.status) if post.status else post.status,
+            post_type=sys.intern(post.post_type) if post.post_type else post.post_type,
+            post_format=sys.intern(post.post_format) if post.post_format else post.post_format,
+            featured_media_link=post.featured_media_link,
+            author_id=author_ids[0] if author_ids else None,
+            category_ids=taxonomy.intern(taxonomy.categories, categories),
+            tag_ids=taxonomy.intern(taxonomy.tags, tags),
+            taxonomy=taxonomy,
+        )
+
+    @property
+    def author(self):
+        return self.taxonomy.authors.get(self.author_id)
+
+    @property
+    def categories(self):
+        return [self.taxonomy.categories[category_id] for category_id in self.category_ids]
+
+    @property
+    def tags(self):
+        return [self.taxonomy.tags[tag_id] for tag_id in self.tag_ids]
+
+    def load_post(self):
+        # Method to load the full stored post, with its content and excerpt; load_posts() loads many at once
+        return models.Post.get_by_id(self.post_id)
+
+    def export_dates(self):
+        """
+        Returns:
+            tuple: The created and modified dates formatted for exports.
+        """
+        return tuple(value.strftime(EXPORT_DATE_FORMAT) if hasattr(value, 'strftime') else value
+                     for value in (self.created_date, self.modified_date))
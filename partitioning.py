@@ -0,0 +1,237 @@
+import datetime
+import gzip
+import json
+import logging
+import os
+
+import models
+from content_store import zstandard
+from metrics import metrics
+from constants import PARTITION_MONTHS_AHEAD
+
+logger = logging.getLogger(__name__)
+
+
+def month_start(value, months=0):
+    # First day of the month `months` after the month of `value`
+    month_index = value.year * 12 + value.month - 1 + months
+    return datetime.datetime(month_index // 12, month_index % 12 + 1, 1)
+
+
+class PartitionManager:
+    """
+    Monthly range partitioning of the search history items on Postgres.
+
+    PostSearchByKeywordItem is partitioned by created_at, so recent-window queries only scan
+    recent partitions and old history can be dropped a partition at a time. Post and
+    SearchByKeyword stay regular tables: Postgres requires the partition key in every
+    unique constraint, and their post_id / id primary keys are the targets of foreign keys.
+    Post gets a BRIN index on created_date instead, which keeps date-range scans cheap at
+    a fraction of a B-tree's size.
+
+    SQLite has no partitioning; there the methods only log and return.
+
+    Args:
+        database_manager (DatabaseManager): The database holding the tables.
+        months_ahead (int): Months of partitions created ahead of the current one.
+    """
+
+    partition_column = 'created_at'
+    brin_index_name = 'post_created_date_brin'
+
+    def __init__(self, database_manager, months_ahead=PARTITION_MONTHS_AHEAD):
+        self.database_manager = database_manager
+        self.months_ahead = months_ahead
+
+    @property
+    def supported(self):
+        return self.database_manager.engine == 'postgresql'
+
+    @property
+    def model(self):
+        return models.PostSearchByKeywordItem
+
+    @property
+    def table(self):
+        return self.model._meta.table_name
+
+    def is_partitioned(self):
+        if not self.supported:
+            return False
+        return self.database_manager.db.execute_sql(
+            'SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = %s',
+            (self.table,)
+        ).fetchone() is not None
+
+    def partition_tables(self):
+        """
+        Convert the search items table to a partitioned table and create the BRIN index on Post.
+
+        Existing rows are copied into the new partitions in one transaction.
+
+        Returns:
+            bool: False when the database does not support partitioning.
+        """
+        if not self.supported:
+            logger.warning("Table partitioning needs Postgres; %s is not partitioned", self.table)
+            return False
+
+        db = self.database_manager.db
+        db.execute_sql(f'CREATE INDEX IF NOT EXISTS {self.brin_index_name} '
+                       f'ON "{models.Post._meta.table_name}" USING BRIN (created_date)')
+        if self.is_partitioned():
+            self.ensure_partitions()
+            return True
+
+        old_table = f'{self.table}_unpartitioned'
+        with db.atomic():
+            db.execute_sql(f'ALTER TABLE "{self.table}" RENAME TO "{old_table}"')
+            db.execute_sql(f'CREATE TABLE "{self.table}" (LIKE "{old_table}" INCLUDING DEFAULTS) '
+                           f'PARTITION BY RANGE ({self.partition_column})')
+            # Unique constraints on a partitioned table must include the partition key
+            db.execute_sql(f'ALTER TABLE "{self.table}" ADD PRIMARY KEY (id, {self.partition_column})')
+            oldest = db.execute_sql(f'SELECT MIN({self.partition_column}) FROM "{old_table}"').fetchone()[0]
+            self.ensure_partitions(oldest)
+            db.execute_sql(f'INSERT INTO "{self.table}" SELECT * FROM "{old_table}"')
+            # The id sequence belongs to the old table's column and would be dropped with it
+            sequence = db.execute_sql('SELECT pg_get_serial_sequence(%s, %s)', (old_table, 'id')).fetchone()[0]
+            if sequence:
+                db.execute_sql(f'ALTER SEQUENCE {sequence} OWNED BY "{self.table}".id')
+            db.execute_sql(f'DROP TABLE "{old_table}"')
+            self.model._schema.create_indexes(safe=True)
+            for field in self.model._meta.refs:
+                self.model._schema.create_foreign_key(field)
+        logger.info("Partitioned %s by month of %s", self.table, self.partition_column)
+        return True
+
+    def ensure_partitions(self, oldest=None):
+        # Method to create monthly partitions from `oldest` (default: now) to months_ahead, plus a default partition
+        if not self.supported:
+            return
+        db = self.database_manager.db
+        now = datetime.datetime.now()
+        start = month_start(oldest or now)
+        end = month_start(now, self.months_ahead + 1)
+        while start < end:
+            upper = month_start(start, 1)
+            db.execute_sql(
+                f'CREATE TABLE IF NOT EXISTS "{self.table}_{start:%Y_%m}" PARTITION OF "{self.table}" '
+                f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+            )
+            start = upper
+        db.execute_sql(f'CREATE TABLE IF NOT EXISTS "{self.table}_default" PARTITION OF "{self.table}" DEFAULT')
+
+    def partitions_before(self, cutoff):
+        """
+        Returns:
+            list: Names of monthly partitions holding only rows older than `cutoff`.
+        """
+        rows = self.database_manager.db.execute_sql(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = %s', (self.table,)
+        ).fetchall()
+        partitions = []
+        for name, in rows:
+            suffix = name[len(self.table) + 1:]
+            try:
+                start = datetime.datetime.strptime(suffix, '%Y_%m')
+            except ValueError:
+                continue
+            if month_start(start, 1) <= cutoff:
+                partitions.append(name)
+        return sorted(partitions)
+
+
+class SearchHistoryArchiver:
+    """
+    Moves searches older than a retention period, with their items, to compressed JSON lines files.
+
+    Each run writes one file (zstd, or gzip without zstandard), then deletes the archived
+    rows. On a partitioned items table, monthly partitions that only hold archived rows are
+    dropped instead of deleted row by row.
+
+    Args:
+        database_manager (DatabaseManager): The database holding the search history.
+        directory (str): Directory the archive files are written to.
+        batch_size (int): Searches read per query.
+    """
+
+    def __init__(self, database_manager, directory, batch_size=500):
+        self.database_manager = database_manager
+        self.directory = directory
+        self.batch_size = batch_size
+        self.partition_manager = PartitionManager(database_manager)
+
+    def archive(self, older_than_days):
+        """
+        Archive and delete search history older than `older_than_days`.
+
+        Returns:
+            dict: Numbers of searches and items archived, partitions dropped, and the archive path.
+        """
+        cutoff = datetime.datetime.now() - datetime.timedelta(days=older_than_days)
+        old_searches = models.SearchByKeyword.select(models.SearchByKeyword.id).where(
+            models.SearchByKeyword.created_at < cutoff
+        )
+        stats = {'searches': 0, 'items': 0, 'partitions_dropped': 0, 'path': None}
+        if not old_searches.exists():
+            return stats
+
+        os.makedirs(self.directory, exist_ok=True)
+        extension = 'zst' if zstandard is not None else 'gz'
+        file_name = f"search_history_{datetime.datetime.now():%Y-%m-%d_%H-%M-%S}.jsonl.{extension}"
+        path = os.path.join(self.directory, file_name)
+        with self.open_archive(path + '.tmp') as f:
+            last_id = 0
+            while True:
+                searches = list(models.SearchByKeyword
+                                .select(models.SearchByKeyword, models.Keyword.title)
+                                .join(models.Keyword)
+                                .where((models.SearchByKeyword.created_at < cutoff)
+                                       & (models.SearchByKeyword.id > last_id))
+                                .order_by(models.SearchByKeyword.id)
+                                .limit(self.batch_size))
+                if not searches:
+                    break
+                last_id = searches[-1].id
+                items = {search.id: [] for search in searches}
+                for item in (models.PostSearchByKeywordItem
+                             .select()
+                             .where(models.PostSearchByKeywordItem.search_by_keyword.in_(list(items)))
+                             .order_by(models.PostSearchByKeywordItem.id)
+                             .dicts()):
+                    items[item['search_by_keyword']].append(item)
+                for search in searches:
+                    f.write(json.dumps({
+                        'id': search.id,
+                        'keyword': search.keyword.title,
+                        'page_count': search.page_count,
+                        'created_at': search.created_at,
+                        'remote_requests': search.remote_requests,
+                        'requests_avoided': search.requests_avoided,
+                        'completed_at': search.completed_at,
+                        'items': items[search.id],
+                    }, default=str).encode('utf-8') + b'\n')
+                    stats['items'] += len(items[search.id])
+                stats['searches'] += len(searches)
+        os.replace(path + '.tmp', path)
+        stats['path'] = path
+
+        db = self.database_manager.db
+        with db.atomic():
+            if self.partition_manager.is_partitioned():
+                for partition in self.partition_manager.partitions_before(cutoff):
+                    db.execute_sql(f'DROP TABLE "{partition}"')
+                    stats['partitions_dropped'] += 1
+            models.PostSearchByKeywordItem.delete().where(
+                models.PostSearchByKeywordItem.search_by_keyword.in_(old_searches)
+            ).execute()
+            models.SearchByKeyword.delete().where(models.SearchByKeyword.created_at < cutoff).execute()
+        metrics.increment('search_history_archived_total', stats['searches'])
+        logger.info("Archived %d searches (%d items) to %s", stats['searches'], stats['items'], path)
+        return stats
+
+    def open_archive(self, path):
+        if zstandard is not None:
+            return zstandard.ZstdCompressor(level=9).stream_writer(open(path, 'wb'), closefd=True)
+        return gzip.open(path, 'wb')
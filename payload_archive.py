@@ -0,0 +1,172 @@
+import datetime
+import json
+import logging
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+from content_store import compress_bytes, decompress_bytes
+from metrics import metrics
+from constants import PAYLOAD_ARCHIVE_ENABLED, PAYLOAD_COMPRESSION_LEVEL, REPROCESS_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Suppress BeautifulSoup warnings; set on import, so spawned reprocessing workers get it too
+warnings.filterwarnings(
+    "ignore",
+    message="The input looks more like a filename than markup. You may want to "
+            "open this file and pass the filehandle into Beautiful Soup.",
+    category=UserWarning
+)
+
+
+def clean_html(text):
+    # Rendered WordPress HTML to plain text; ScraperHandler.clean_view and reprocessing share these rules
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(text, 'html.parser')
+    return " ".join(soup.strings)
+
+
+def derive_post_fields(row):
+    """
+    Re-derive the stored fields of one post from its archived payload. Runs in worker processes.
+
+    Args:
+        row (tuple): (post_id, codec, compressed payload) as stored in RawPostPayload.
+
+    Returns:
+        dict: post_id, title, content, excerpt, category_ids and tag_ids.
+    """
+    post_id, codec, data = row
+    post_data = json.loads(decompress_bytes(codec, bytes(data)))
+    return {
+        'post_id': post_id,
+        'title': clean_html(post_data['title']['rendered']),
+        'content': clean_html(post_data['content']['rendered']),
+        'excerpt': clean_html(post_data['excerpt']['rendered']),
+        'category_ids': [int(category_id) for category_id in post_data['categories']],
+        'tag_ids': [int(tag_id) for tag_id in post_data['tags']],
+    }
+
+
+class PayloadArchive:
+    """
+    Compressed archive of the raw WordPress JSON of every stored post (RawPostPayload).
+
+    Keeping the rendered HTML lets title, content, excerpt and the category/tag links be
+    derived again offline after the cleaning rules change, and lets exports write the
+    article HTML without requesting the page again.
+
+    Args:
+        database_manager (DatabaseManager): The database the payloads are stored in.
+        enabled (bool): Archive payloads of newly parsed posts.
+        level (int): Compression level.
+    """
+
+    def __init__(self, database_manager, enabled=PAYLOAD_ARCHIVE_ENABLED, level=PAYLOAD_COMPRESSION_LEVEL):
+        self.database_manager = database_manager
+        self.enabled = enabled
+        self.level = level
+
+    def save(self, post_data):
+        # Method to store (or replace) the payload of one post
+        import models
+
+        codec, data = compress_bytes(json.dumps(post_data).encode('utf-8'), self.level)
+        models.RawPostPayload.insert(
+            post_id=int(post_data['id']),
+            modified_date=datetime.datetime.fromisoformat(post_data['modified']),
+            codec=codec,
+            data=data,
+            fetched_at=datetime.datetime.now(),
+        ).on_conflict(
+            conflict_target=[models.RawPostPayload.post_id],
+            preserve=[models.RawPostPayload.modified_date, models.RawPostPayload.codec,
+                      models.RawPostPayload.data, models.RawPostPayload.fetched_at],
+        ).execute()
+        metrics.increment('payload_archive_bytes_total', len(data))
+
+    def load(self, post_id):
+        """
+        Returns:
+            dict: The archived WordPress JSON of the post, or None if it was not archived.
+        """
+        import models
+
+        payload = models.RawPostPayload.get_or_none(models.RawPostPayload.post_id == post_id)
+        if payload is None:
+            return None
+        return json.loads(decompress_bytes(payload.codec, bytes(payload.data)))
+
+    def load_many(self, post_ids):
+        """
+        Returns:
+            dict: post_id -> archived WordPress JSON, for the posts that were archived.
+        """
+        import models
+
+        payloads = models.RawPostPayload.select().where(models.RawPostPayload.post_id.in_(list(post_ids)))
+        return {payload.post_id: json.loads(decompress_bytes(payload.codec, bytes(payload.data)))
+                for payload in payloads}
+
+    def reprocess(self, workers=None, batch_size=REPROCESS_BATCH_SIZE):
+        """
+        Re-derive title, content, excerpt and category/tag links of every archived post without network access.
+
+        Payloads are decompressed and cleaned in a process pool; this process writes the results.
+        Links to categories or tags that are not stored locally are left out and counted.
+
+        Returns:
+            dict: Numbers of posts updated, links added and removed, and unknown category/tag ids.
+        """
+        import models
+        from cooccurrence_index import CooccurrenceIndex
+
+        stats = {'posts': 0, 'links_added': 0, 'links_removed': 0, 'unknown_references': 0}
+        category_ids = {row[0] for row in models.Category.select(models.Category.category_id).tuples()}
+        tag_ids = {row[0] for row in models.Tag.select(models.Tag.tag_id).tuples()}
+        last_post_id = 0
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            while True:
+                rows = list(models.RawPostPayload
+                            .select(models.RawPostPayload.post_id, models.RawPostPayload.codec,
+                                    models.RawPostPayload.data)
+                            .join(models.Post, on=(models.RawPostPayload.post_id == models.Post.post_id))
+                            .where(models.RawPostPayload.post_id > last_post_id)
+                            .order_by(models.RawPostPayload.post_id)
+                            .limit(batch_size)
+                            .tuples())
+                if not rows:
+                    break
+                last_post_id = rows[-1][0]
+                derived = list(executor.map(derive_post_fields, rows, chunksize=max(1, len(rows) // 32)))
+                with self.database_manager.db.atomic():
+                    for fields in derived:
+                        self.apply(fields, category_ids, tag_ids, stats)
+                logger.info("Reprocessed %d archived posts", stats['posts'])
+
+        # Co-occurrence counts follow the links, which may have changed wholesale
+        if stats['links_added'] or stats['links_removed']:
+            CooccurrenceIndex(self.database_manager).rebuild()
+        return stats
+
+    def apply(self, fields, category_ids, tag_ids, stats):
+        # Method to write the re-derived fields of one post and reconcile its links
+        import models
+        from post_links import replace_post_links
+
+        post = models.Post.get_by_id(fields['post_id'])
+        post.title = fields['title']
+        post.content = fields['content']
+        post.excerpt = fields['excerpt']
+        post.save()
+
+        wanted = {}
+        for kind, known_ids in (('category', category_ids), ('tag', tag_ids)):
+            wanted[kind] = [obj_id for obj_id in fields[f'{kind}_ids'] if obj_id in known_ids]
+            stats['unknown_references'] += len(set(fields[f'{kind}_ids']) - set(wanted[kind]))
+        for changes in replace_post_links(post.post_id, wanted['category'], wanted['tag']).values():
+            stats['links_added'] += len(changes.added)
+            stats['links_removed'] += len(changes.removed)
+        stats['posts'] += 1
@@ -0,0 +1,31 @@
+from collections import namedtuple
+
+import models
+
+# Link target ids of one kind before and after replace_post_links, and the differences written
+LinkChanges = namedtuple('LinkChanges', ['old', 'new', 'removed', 'added'])
+
+
+def replace_post_links(post_id, category_ids, tag_ids):
+    """
+    Make the PostCategory and PostTag links of a post match the given ids.
+
+    Only the differences are written: links no longer wanted are deleted, missing ones inserted.
+
+    Returns:
+        dict: 'category' and 'tag' -> LinkChanges.
+    """
+    changes = {}
+    for link_model, target, wanted_ids in (
+        (models.PostCategory, models.PostCategory.category, set(category_ids)),
+        (models.PostTag, models.PostTag.tag, set(tag_ids)),
+    ):
+        current = {row[0] for row in link_model.select(target).where(link_model.post == post_id).tuples()}
+        removed = current - wanted_ids
+        if removed:
+            link_model.delete().where((link_model.post == post_id) & target.in_(removed)).execute()
+        added = wanted_ids - current
+        if added:
+            link_model.insert_many([{'post': post_id, target.name: obj_id} for obj_id in added]).execute()
+        changes[target.name] = LinkChanges(current, wanted_ids, removed, added)
+    return changes
@@ -0,0 +1,177 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import tracemalloc
+from collections import Counter, defaultdict
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Collapse placeholder lists such as IN (%s, %s, %s) so one SQL shape is logged per query site
+PLACEHOLDER_LIST_RE = re.compile(r'(%s|\?)(\s*,\s*(%s|\?))+')
+
+
+class QueryLog:
+    # Count and total time per SQL shape, fed by the database query listener hook
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = Counter()
+        self.seconds = defaultdict(float)
+
+    def __call__(self, sql, seconds):
+        shape = PLACEHOLDER_LIST_RE.sub(r'\1, ...', sql)
+        with self._lock:
+            self.counts[shape] += 1
+            self.seconds[shape] += seconds
+
+    def report(self):
+        lines = [f"{'count':>8} {'total ms':>10} {'mean ms':>9}  sql"]
+        for shape, seconds in sorted(self.seconds.items(), key=lambda item: -item[1]):
+            count = self.counts[shape]
+            lines.append(f"{count:>8} {seconds * 1000:>10.1f} {seconds * 1000 / count:>9.3f}  {shape}")
+        return '\n'.join(lines) + '\n'
+
+
+class StackSampler:
+    # Sampling profiler: records the stacks of all other threads every `interval` seconds
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}')
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def report(self):
+        # Collapsed stack format, one "frame;frame;frame count" line per stack (flamegraph.pl input)
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class PeakMemoryWatcher:
+    # Keeps the tracemalloc snapshot taken closest to the peak, so call sites are reported at peak
+    def __init__(self, interval=0.5, growth=1.1):
+        self.interval = interval
+        self.growth = growth
+        self.snapshot = None
+        self.snapshot_size = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        # The end of the run may itself be the peak
+        self.check()
+
+    def check(self):
+        current, _ = tracemalloc.get_traced_memory()
+        if current > self.snapshot_size * self.growth:
+            self.snapshot = tracemalloc.take_snapshot()
+            self.snapshot_size = current
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.check()
+
+
+class RunProfiler:
+    """
+    Profile a whole CLI run and write the results as artifacts.
+
+    Artifacts written to output_dir:
+        cprofile.prof   pstats dump, for snakeviz / pstats
+        cprofile.txt    top functions by cumulative and by own time
+        queries.txt     count and total time per SQL shape
+        memory.txt      tracemalloc peak and the largest allocation sites near the peak
+        samples.txt     collapsed stacks, when a sample interval is given
+    """
+
+    def __init__(self, database, output_dir=None, sample_interval=None, top=40):
+        self.database = database
+        self.output_dir = output_dir or os.path.join(
+            'output', f"profile_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}"
+        )
+        self.top = top
+        self.profile = cProfile.Profile()
+        self.query_log = QueryLog()
+        self.sampler = StackSampler(sample_interval) if sample_interval else None
+        self.memory_watcher = PeakMemoryWatcher()
+
+    def start(self):
+        tracemalloc.start(10)
+        self.memory_watcher.start()
+        self.database.query_listeners.append(self.query_log)
+        if self.sampler:
+            self.sampler.start()
+        self.profile.enable()
+        return self
+
+    def stop(self):
+        self.profile.disable()
+        if self.sampler:
+            self.sampler.stop()
+        self.database.query_listeners.remove(self.query_log)
+        self.memory_watcher.stop()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.profile.dump_stats(os.path.join(self.output_dir, 'cprofile.prof'))
+        self.write('cprofile.txt', self.cprofile_report())
+        self.write('queries.txt', self.query_log.report())
+        self.write('memory.txt', self.memory_report(
+            self.memory_watcher.snapshot, self.memory_watcher.snapshot_size, current, peak
+        ))
+        if self.sampler:
+            self.write('samples.txt', self.sampler.report())
+
+        logger.info("Profile written to: %s", self.output_dir)
+
+    def write(self, filename, text):
+        with open(os.path.join(self.output_dir, filename), 'w') as artifact:
+            artifact.write(text)
+
+    def cprofile_report(self):
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=stream)
+        stats.sort_stats('cumulative').print_stats(self.top)
+        stats.sort_stats('tottime').print_stats(self.top)
+        return stream.getvalue()
+
+    def memory_report(self, snapshot, snapshot_size, current, peak):
+        lines = [
+            f"peak: {peak / 1024 / 1024:.1f} MiB, at exit: {current / 1024 / 1024:.1f} MiB",
+            f"allocation sites below from a snapshot at {snapshot_size / 1024 / 1024:.1f} MiB",
+            '',
+        ]
+        snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        for statistic in snapshot.statistics('traceback')[:self.top]:
+            lines.append(f"{statistic.size / 1024:.1f} KiB in {statistic.count} blocks")
+            lines.extend(f"    {line}" for line in statistic.traceback.format(limit=5))
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,184 @@
+import numpy as np
+
+from constants import TREND_PERIODS as PERIODS
+
+# 1970-01-01 was a Thursday, so (days_since_epoch + 3) % 7 gives a Monday-based weekday
+_EPOCH_WEEKDAY_OFFSET = 3
+
+
+class ReportEngine:
+    """
+    Columnar in-memory frame of post -> label links with vectorized aggregations.
+
+    Every link row is a (post, label) pair. Post and label ids are integer-coded
+    and label names are stored once per distinct name (categorical), so counts,
+    top-N, per-period histograms and co-occurrence are computed with NumPy instead
+    of Python loops over peewee objects.
+    """
+
+    def __init__(self, post_ids, label_ids, label_names, post_dates=None, all_label_ids=None):
+        """
+        Args:
+            post_ids (array-like): Post id of every link row.
+            label_ids (array-like): Label (category/tag/author) id of every link row.
+            label_names (dict): Mapping of label id to display name.
+            post_dates (dict): Optional mapping of post id to created date, needed for histograms.
+            all_label_ids (array-like): Optional label ids to report even when they have no links.
+        """
+        post_ids = np.asarray(post_ids, dtype=np.int64)
+        label_ids = np.asarray(label_ids, dtype=np.int64)
+
+        known_ids = label_ids if all_label_ids is None else np.concatenate(
+            [np.asarray(all_label_ids, dtype=np.int64), label_ids]
+        )
+        # Integer-code label ids, then collapse ids sharing a display name into one category
+        unique_label_ids, label_id_codes = np.unique(known_ids, return_inverse=True)
+        id_names = np.array([label_names.get(int(i), str(i)) for i in unique_label_ids], dtype=object)
+        self.names, name_codes = np.unique(id_names.astype(str), return_inverse=True)
+
+        self.unique_post_ids, self.post_codes = np.unique(post_ids, return_inverse=True)
+        self.label_codes = name_codes[label_id_codes[len(known_ids) - len(label_ids):]]
+        self.post_dates = post_dates
+        self._post_day_array = None
+
+    @classmethod
+    def from_parsed_items(cls, parsed_items, item_labels):
+        """
+        Build a frame from the parsed items of the current run.
+
+        Args:
+            parsed_items (list): Parsed items returned by ScraperHandler.search_by_keyword.
+            item_labels (callable): Returns the (label id, label name) pairs of one parsed item,
+                e.g. a ReportDimension's item_labels.
+        """
+        post_ids, label_ids, label_names, post_dates = [], [], {}, {}
+
+        for parsed_item in parsed_items:
+            post_id = parsed_item.post_id
+            post_dates[post_id] = parsed_item.created_date
+
+            for label_id, name in item_labels(parsed_item):
+                post_ids.append(post_id)
+                label_ids.append(label_id)
+                label_names[label_id] = name
+
+        return cls(post_ids, label_ids, label_names, post_dates=post_dates)
+
+    def counts(self):
+        """
+        Count posts per label name.
+
+        Returns:
+            dict: Label name -> number of linked posts.
+        """
+        counts = np.bincount(self.label_codes, minlength=len(self.names))
+        return dict(zip(self.names.tolist(), counts.tolist()))
+
+    def top_n(self, n):
+        """
+        Return the n labels with the most posts, largest first.
+
+        Returns:
+            list: (label name, count) tuples.
+        """
+        counts = np.bincount(self.label_codes, minlength=len(self.names))
+        n = min(n, len(counts))
+        if n <= 0:
+            return []
+        top = np.argpartition(-counts, n - 1)[:n]
+        top = top[np.lexsort((self.names[top], -counts[top]))]
+        return list(zip(self.names[top].tolist(), counts[top].tolist()))
+
+    def histogram(self, period='month'):
+        """
+        Count posts per label and per period of Post.created_date.
+
+        Args:
+            period (str): 'day', 'week' or 'month'.
+
+        Returns:
+            dict: Period start (datetime.date) -> {label name: count}.
+        """
+        bucket_values, bucket_codes = np.unique(self._post_buckets(period), return_inverse=True)
+        n_labels = len(self.names)
+        # Sparse (period, label) counts: most labels are absent from most periods
+        combined, counts = np.unique(
+            bucket_codes[self.post_codes] * n_labels + self.label_codes, return_counts=True
+        )
+        bucket_dates = bucket_values.tolist()
+        bucket_of = (combined // n_labels).tolist()
+        label_names = self.names[combined % n_labels].tolist()
+
+        histogram = {}
+        for bucket_index, label_name, count in zip(bucket_of, label_names, counts.tolist()):
+            histogram.setdefault(bucket_dates[bucket_index], {})[label_name] = count
+        return histogram
+
+    def period_totals(self, period='month'):
+        """
+        Count distinct posts per period of Post.created_date.
+
+        A post with several labels appears once per label in histogram(), but once here.
+
+        Returns:
+            dict: Period start (datetime.date) -> number of posts.
+        """
+        bucket_values, counts = np.unique(self._post_buckets(period), return_counts=True)
+        return dict(zip(bucket_values.tolist(), counts.tolist()))
+
+    def _post_buckets(self, period):
+        # Period start of every coded post
+        if self.post_dates is None:
+            raise ValueError("Post dates were not loaded; build the frame with with_dates=True.")
+        if period not in PERIODS:
+            raise ValueError(f"Unknown period: {period}")
+
+        days = self._post_days()
+        if period == 'month':
+            return days.astype('datetime64[M]').astype('datetime64[D]')
+        if period == 'week':
+            day_numbers = days.astype(np.int64)
+            return (day_numbers - (day_numbers + _EPOCH_WEEKDAY_OFFSET) % 7).astype('datetime64[D]')
+        return days
+
+    def _post_days(self):
+        # Created day of every coded post, converted once and reused across periods
+        if self._post_day_array is None:
+            self._post_day_array = np.array(
+                [self.post_dates[int(post_id)] for post_id in self.unique_post_ids.tolist()], dtype='datetime64[s]'
+            ).astype('datetime64[D]')
+        return self._post_day_array
+
+    def cooccurrence(self, min_count=1):
+        """
+        Count how many posts each pair of labels shares.
+
+        Returns:
+            dict: (label name, label name) -> number of posts carrying both labels.
+        """
+        # Sort links by post so every post's labels are contiguous, dropping duplicates
+        n_labels = len(self.names)
+        links = np.unique(self.post_codes * n_labels + self.label_codes)
+        if len(links) < 2:
+            return {}
+        posts, labels = links // n_labels, links % n_labels
+
+        group_sizes = np.bincount(posts)
+        pair_codes = []
+        # Compare each row with the row k positions later; rows of the same post form a pair
+        for offset in range(1, int(group_sizes.max())):
+            same_post = posts[:-offset] == posts[offset:]
+            if not same_post.any():
+                break
+            first = labels[:-offset][same_post]
+            second = labels[offset:][same_post]
+            pair_codes.append(np.minimum(first, second) * n_labels + np.maximum(first, second))
+
+        if not pair_codes:
+            return {}
+        codes, counts = np.unique(np.concatenate(pair_codes), return_counts=True)
+        keep = counts >= min_count
+        codes, counts = codes[keep], counts[keep]
+        first_names = self.names[codes // n_labels].tolist()
+        second_names = self.names[codes % n_labels].tolist()
+        return dict(zip(zip(first_names, second_names), counts.tolist()))
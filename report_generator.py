@@ -1,174 +1,478 @@
+import abc
 import csv
 import json
+import logging
 import os
-import shutil
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import re
-import matplotlib.pyplot as plt
+import tempfile
 import requests
-from openpyxl import Workbook
+from peewee import fn
 from requests.exceptions import ChunkedEncodingError
 
 import models
+from constants import (
+    EXPORT_ARCHIVE_FORMAT, EXPORT_DOWNLOAD_WORKERS, EXPORT_LOAD_BATCH, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, TREND_PERIODS
+)
+from metrics import metrics
 import scraper_handler
+from parsed_post import load_posts
+from payload_archive import PayloadArchive
+from chart_renderer import ChartRenderer
+from export_packager import ExportPackager
+
+logger = logging.getLogger(__name__)
+
+# Method -> (source, include labels without posts)
+REPORT_METHODS = {
+    'all': ('database', True),
+    'database': ('database', False),
+    'current': ('current', False),
+    'snapshot': ('snapshot', False),
+}
+
+
+def period_start(column, period, engine):
+    # SQL expression of the first day of the period of `column`, as a 'YYYY-MM-DD' string.
+    # coerce(False) keeps peewee from converting the string back with the column's datetime converter.
+    if engine == 'postgresql':
+        return fn.to_char(fn.date_trunc(period, column), 'YYYY-MM-DD').coerce(False)
+    if period == 'month':
+        return fn.strftime('%Y-%m-01', column).coerce(False)
+    if period == 'week':
+        # Step back six days, then forward to the next Monday: the Monday of the week
+        return fn.date(column, '-6 days', 'weekday 1').coerce(False)
+    return fn.date(column).coerce(False)
+
+
+class PeriodCounts(dict):
+    """
+    Label name -> posts of one trend report period, with the period's distinct post count.
+
+    A post with several labels (tags, categories) is counted once per label, so the posts
+    of a period are `total`, not the sum of the counts.
+    """
+
+    def __init__(self, counts=(), total=0):
+        super().__init__(counts)
+        self.total = total
+
+
+class ReportDimension(abc.ABC):
+    """
+    Something posts are counted by in reports: a category, a tag, an author, ...
+
+    A dimension describes both sides the report planner chooses between: the rows
+    linking posts to labels in the database, aggregated in SQL, and the labels of a
+    parsed item of the current run, aggregated in memory by ReportEngine.
+
+    Args:
+        name (str): Dimension name used by --report-type.
+        axis_label (str): Chart axis label.
+        title_label (str): Singular label used in chart and report titles.
+        label_model (str): Name of the model whose rows are the labels, or None.
+
+    Subclasses implement every abstract method, otherwise creating the dimension for
+    REPORT_DIMENSIONS raises TypeError when this module is imported.
+    """
+
+    def __init__(self, name, axis_label, title_label, label_model=None):
+        self.name = name
+        self.axis_label = axis_label
+        self.title_label = title_label
+        self.label_model = label_model
+
+    @abc.abstractmethod
+    def select(self, columns, join_post=False):
+        # Method to select `columns` from the rows linking posts to labels, optionally joined to Post
+        ...
+
+    @abc.abstractmethod
+    def post_column(self):
+        ...
+
+    @abc.abstractmethod
+    def label_column(self, engine):
+        ...
+
+    @abc.abstractmethod
+    def item_labels(self, parsed_item, keyword):
+        """
+        Returns:
+            list: (label id, label name) of a parsed item of the current run.
+        """
+
+    def all_labels(self):
+        # Method to list every label name, including labels without posts
+        if self.label_model is None:
+            return []
+        label_model = getattr(models, self.label_model)
+        return [name for name, in label_model.select(self.label_column(None)).tuples()]
+
+
+class LinkTableDimension(ReportDimension):
+    # Labels linked to posts through a many-to-many link table (PostCategory, PostTag)
+
+    def __init__(self, name, axis_label, title_label, label_model, link_model, item_key):
+        super().__init__(name, axis_label, title_label, label_model)
+        self.link_model = link_model
+        self.item_key = item_key
+
+    def select(self, columns, join_post=False):
+        link_model = getattr(models, self.link_model)
+        query = link_model.select(*columns).join(getattr(models, self.label_model))
+        if join_post:
+            query = query.switch(link_model).join(models.Post)
+        return query
+
+    def post_column(self):
+        return getattr(models, self.link_model).post
+
+    def label_column(self, engine):
+        return getattr(models, self.label_model).name
+
+    def item_labels(self, parsed_item, keyword):
+        return [(label.get_id(), label.name) for label in getattr(parsed_item, self.item_key)]
+
+
+class AuthorDimension(ReportDimension):
+
+    def select(self, columns, join_post=False):
+        return models.Post.select(*columns).join(models.Author)
+
+    def post_column(self):
+        return models.Post.post_id
+
+    def label_column(self, engine):
+        return models.Author.name
+
+    def item_labels(self, parsed_item, keyword):
+        author = parsed_item.author
+        return [(author.get_id(), author.name)] if author is not None else []
+
+
+class KeywordDimension(ReportDimension):
+    # Posts counted by the keywords whose searches returned them
+
+    def select(self, columns, join_post=False):
+        query = (models.PostSearchByKeywordItem
+                 .select(*columns)
+                 .join(models.SearchByKeyword)
+                 .join(models.Keyword))
+        # Items whose post was never fetched have no post to count
+        return query.switch(models.PostSearchByKeywordItem).join(models.Post)
+
+    def post_column(self):
+        return models.PostSearchByKeywordItem.post
+
+    def label_column(self, engine):
+        return models.Keyword.title
+
+    def item_labels(self, parsed_item, keyword):
+        # Every item of the current run was found by the keyword searched for
+        return [(0, keyword)] if keyword else []
+
+
+class MonthDimension(ReportDimension):
+    # Posts counted by the month they were published in
+
+    def select(self, columns, join_post=False):
+        return models.Post.select(*columns)
+
+    def post_column(self):
+        return models.Post.post_id
+
+    def label_column(self, engine):
+        if engine == 'postgresql':
+            return fn.to_char(models.Post.created_date, 'YYYY-MM').coerce(False)
+        return fn.strftime('%Y-%m', models.Post.created_date).coerce(False)
+
+    def item_labels(self, parsed_item, keyword):
+        created_date = parsed_item.created_date
+        return [(created_date.year * 100 + created_date.month, created_date.strftime('%Y-%m'))]
+
+
+# Report dimensions by name; --report-type offers every dimension registered here
+REPORT_DIMENSIONS = {
+    'category': LinkTableDimension('category', 'Categories', 'Category', 'Category', 'PostCategory', 'categories'),
+    'tag': LinkTableDimension('tag', 'Tags', 'Tag', 'Tag', 'PostTag', 'tags'),
+    'author': AuthorDimension('author', 'Authors', 'Author', 'Author'),
+    'keyword': KeywordDimension('keyword', 'Keywords', 'Keyword', 'Keyword'),
+    'month': MonthDimension('month', 'Months', 'Month'),
+}
 
 
 class ReportGenerator:
-    def __init__(self, database_manager):
+    def __init__(self, database_manager, chart_renderer=None):
         self.database_manager = database_manager
+        self.chart_renderer = chart_renderer or ChartRenderer()
+        # Set while export_report runs; files written meanwhile are streamed into its archive
+        self.packager = None
+        self.payload_archive = PayloadArchive(database_manager)
 
-    def count_posts_by_category_or_tag(self, model, keyword_used, method, parsed_items):
-        counts = defaultdict(int)
-        # print("Method:", method)  # Debug print to check the method
-
-        if method == 'all' or method is None:
-            for item in model.select():
-                if model == models.Category:
-                    counts[item.name] = models.PostCategory.select().where(
-                        models.PostCategory.category == item
-                    ).count()
-                elif model == models.Tag:
-                    counts[item.name] = models.PostTag.select().where(
-                        models.PostTag.tag == item
-                    ).count()
-
-        elif method == 'database':
-            if model == models.Category:
-                for post_category in models.PostCategory.select():
-                    counts[post_category.category.name] += 1
-            elif model == models.Tag:
-                for post_tag in models.PostTag.select():
-                    counts[post_tag.tag.name] += 1
-
-        elif method == 'current':
-            if bool(keyword_used):
-                counts = defaultdict(int)
-                for parsed_item in parsed_items:
-                    if model == models.Category:
-                        for category in parsed_item['categories']:
-                            # print(category)
-                            counts[category.name] += 1
-                    elif model == models.Tag:
-                        for tag in parsed_item['tags']:
-                            # print(tag)
-                            counts[tag.name] += 1
-        else:
+    def build_report(self, dimension, method='all', period=None, keyword_used=None, parsed_items=None,
+                     search=None):
+        """
+        Generate a report on the number of posts per label of a dimension, or per label and period.
+
+        Args:
+            dimension (str): A name registered in REPORT_DIMENSIONS.
+            method (str): Where the posts come from.
+                'all': Posts in the database, listing labels without posts as well.
+                'database': Posts in the database.
+                'current': Posts parsed by the current command.
+                'snapshot': Posts of a stored search (`search`, or the latest search of `keyword_used`).
+            period (str): 'day', 'week' or 'month' for a trend report, or None for totals.
+            keyword_used (str): The keyword used for filtering posts, or None if not used.
+            parsed_items (list): List of parsed items containing post details.
+            search (SearchByKeyword): The stored search reported on by 'snapshot'.
+
+        Returns:
+            str: The report.
+            dict: Name -> count, or period start -> PeriodCounts for trend reports.
+        """
+        if dimension not in REPORT_DIMENSIONS:
+            raise ValueError(f"Unknown report dimension: {dimension}")
+        if period is not None and period not in TREND_PERIODS:
+            raise ValueError(f"Unknown trend period: {period}")
+        report_dimension = REPORT_DIMENSIONS[dimension]
+        source, include_empty = REPORT_METHODS[method or 'all']
+
+        if source == 'current' and not bool(keyword_used):
             raise ValueError("Please use --keyword option to generate a report based on the current command.")
 
-        return counts
+        plan = self.plan_report(source)
+        logger.debug("Report on %s from %s, %s path", dimension, source, plan)
+        with metrics.timer('pipeline_stage_seconds', stage='report'):
+            if plan == 'memory':
+                data = self.count_in_memory(report_dimension, parsed_items or [], keyword_used, period)
+            else:
+                posts = self.snapshot_posts(search, keyword_used) if source == 'snapshot' else None
+                data = self.count_in_database(report_dimension, posts, period, include_empty)
+
+        if period is None:
+            report = f"{report_dimension.title_label} Report:\n"
+            for name, count in data.items():
+                report += f"{name}: {count} posts\n"
+        else:
+            report = f"{report_dimension.title_label} Trend Report ({period}):\n"
+            for bucket, counts in data.items():
+                report += f"{bucket}: {counts.total} posts\n"
+                for name, count in sorted(counts.items(), key=lambda name_count: -name_count[1]):
+                    report += f"  {name}: {count} posts\n"
+        return report, data
+
+    def plan_report(self, source):
+        """
+        Choose how a report is counted.
+
+        Posts of the current run are already in memory and are aggregated by ReportEngine.
+        Posts in the database are aggregated where they are, with GROUP BY, so only one row
+        per label (and period) is read back instead of every post -> label link.
+
+        Returns:
+            str: 'memory' or 'sql'.
+        """
+        return 'memory' if source == 'current' else 'sql'
+
+    def count_in_memory(self, report_dimension, parsed_items, keyword, period):
+        # Method to aggregate the parsed items of the current run with ReportEngine
+        # NumPy is only loaded by reports on the current run
+        from report_engine import ReportEngine
+
+        engine = ReportEngine.from_parsed_items(
+            parsed_items, lambda parsed_item: report_dimension.item_labels(parsed_item, keyword)
+        )
+        if period is None:
+            return engine.counts()
+        totals = engine.period_totals(period)
+        return {bucket.strftime('%Y-%m-%d'): PeriodCounts(counts, totals[bucket])
+                for bucket, counts in engine.histogram(period).items()}
+
+    def count_in_database(self, report_dimension, posts, period, include_empty):
+        # Method to aggregate posts per label (and period) in the database
+        engine = self.database_manager.engine
+        label = report_dimension.label_column(engine)
+        post_count = fn.COUNT(report_dimension.post_column().distinct())
+
+        if period is None:
+            query = report_dimension.select([label, post_count]).group_by(label)
+        else:
+            bucket = period_start(models.Post.created_date, period, engine)
+            query = report_dimension.select([bucket, label, post_count], join_post=True).group_by(bucket, label)
+            # Posts per period are counted once, however many labels they have
+            totals_query = report_dimension.select([bucket, post_count], join_post=True).group_by(bucket)
+        if posts is not None:
+            query = query.where(report_dimension.post_column().in_(posts))
+
+        if period is not None:
+            if posts is not None:
+                totals_query = totals_query.where(report_dimension.post_column().in_(posts))
+            trend = {bucket_start: PeriodCounts(total=total) for bucket_start, total in totals_query.tuples()}
+            for bucket_start, name, count in query.tuples():
+                trend[bucket_start][name] = count
+            return dict(sorted(trend.items()))
+
+        counts = dict(query.tuples())
+        if include_empty:
+            for name in report_dimension.all_labels():
+                counts.setdefault(name, 0)
+        return dict(sorted(counts.items(), key=lambda name_count: str(name_count[0])))
+
+    def snapshot_posts(self, search, keyword_used):
+        # Method to select the post ids of a stored search, by default the latest search of the keyword
+        if search is None:
+            searches = models.SearchByKeyword.select().order_by(models.SearchByKeyword.created_at.desc())
+            if keyword_used:
+                searches = searches.join(models.Keyword).where(models.Keyword.title == keyword_used)
+            search = searches.first()
+            if search is None:
+                raise ValueError("No stored search to report on.")
+        # Items are never older than their search, which lets a partitioned items table skip old partitions
+        return (models.PostSearchByKeywordItem
+                .select(models.PostSearchByKeywordItem.post)
+                .where((models.PostSearchByKeywordItem.search_by_keyword == search)
+                       & (models.PostSearchByKeywordItem.created_at >= search.created_at)
+                       & models.PostSearchByKeywordItem.post.is_null(False)))
 
     def count_post_per_category(self, method='all', keyword_used=None, parsed_items=None):
         """
         Generate a report on the number of saved posts in each category.
 
-        Args:
-            method (str): The method used to count the posts.
-                'all': Count based on all categories.
-                'database': Count based on categories stored in the database.
-                'current': Count based on categories in the current command.
-            keyword_used (str): The keyword used for filtering posts, or None if not used.
-            parsed_items (list): List of parsed items containing post details.
-
         Returns:
             str: The category report.
         """
-        category_counts = self.count_posts_by_category_or_tag(models.Category, keyword_used, method, parsed_items)
-        report = "Category Report:\n"
-        for category, count in category_counts.items():
-            report += f"{category}: {count} posts\n"
-        return report, category_counts
+        return self.build_report('category', method=method, keyword_used=keyword_used, parsed_items=parsed_items)
 
     def count_post_per_tag(self, method='all', keyword_used=None, parsed_items=None):
         """
         Generate a report on the number of saved posts in each tag.
 
-        Args:
-            method (str): The method used to count the posts.
-                'all': Count based on all tags.
-                'database': Count based on tags stored in the database.
-                'current': Count based on tags in the current command.
-            keyword_used (str): The keyword used for filtering posts, or None if not used.
-            parsed_items (list): List of parsed items containing post details.
-
         Returns:
             str: The tag report.
         """
-        tag_counts = self.count_posts_by_category_or_tag(models.Tag, keyword_used, method, parsed_items)
-        report = "Tag Report:\n"
-        for tag, count in tag_counts.items():
-            report += f"{tag}: {count} posts\n"
-        return report, tag_counts
+        return self.build_report('tag', method=method, keyword_used=keyword_used, parsed_items=parsed_items)
 
     def count_post_per_author(self, method='database', keyword_used=None, parsed_items=None):
         """
         Generate a report on the number of saved posts authored by each author.
 
+        Returns:
+            str: The author report.
+        """
+        return self.build_report('author', method=method, keyword_used=keyword_used, parsed_items=parsed_items)
+
+    def count_posts_per_period(self, dimension, period='month', method='database', keyword_used=None,
+                               parsed_items=None):
+        """
+        Generate a trend report on the number of posts per label of a dimension per period.
+
+        Returns:
+            str: The trend report.
+            dict: Period start -> {name: count}.
+        """
+        return self.build_report(dimension, method=method, period=period, keyword_used=keyword_used,
+                                 parsed_items=parsed_items)
+
+    def draw_chart(self, report, keyword=None, save_path=None, dimension=None):
+        """
+        Render the chart of one report without blocking.
+
         Args:
-            method (str): The method used to count the posts.
-                'database': Count based on authors stored in the database.
-                'current': Count based on authors in the current command.
-            keyword_used (str): The keyword used for filtering posts, or None if not used.
-            parsed_items (list): List of parsed items containing post details.
+            report (dict): Report data, name -> count or period -> {name: count}.
+            keyword (str): Keyword used in the file name.
+            save_path (str): Directory to write the chart to; defaults to output/charts.
+            dimension (str): A name registered in REPORT_DIMENSIONS, used for the title and axis label.
 
         Returns:
-            str: The author report.
+            str: Path of the written chart.
+        """
+        return self.draw_charts({dimension: report}, keyword=keyword, save_path=save_path)[0]
+
+    def draw_charts(self, reports, keyword=None, save_path=None):
+        """
+        Render the charts of several reports in one pass, in parallel.
+
+        Args:
+            reports (dict): Dimension -> report data, as passed to draw_chart.
+
+        Returns:
+            list: Paths of the written charts.
         """
-        if parsed_items is None:
-            return "Error: parsed_items is required."
-
-        author_counts = defaultdict(int)
-        # print("Method:", method)  # Debug print to check the method
-
-        if method == 'database':
-            for post in models.Post.select():
-                author_counts[post.author.name] += 1
-
-        elif method == 'current':
-            if bool(keyword_used):
-                author_counts = defaultdict(int)
-                for parsed_item in parsed_items:
-                    if parsed_item['author'] is not None:
-                        author_counts[parsed_item['author'].name] += 1
-            else:
-                raise ValueError("Please use --keyword option to generate a report based on the current command.")
-
-        report = "Author Report:\n"
-        for author, count in author_counts.items():
-            report += f"{author}: {count} posts\n"
-        return report, author_counts
-
-    def draw_chart(self, report, keyword=None, save_path=None):
-        # Extract categories and counts from the report
-        categories = list(report.keys())
-        counts = list(report.values())
-
-        # Create a bar chart
-        plt.figure(figsize=(10, 6))
-        plt.bar(categories, counts, color='skyblue')
-
-        # Customize the chart
-        plt.title('Number of Posts per Category')
-        plt.xlabel('Categories')
-        plt.ylabel('Number of Posts')
-        plt.xticks(rotation=45, ha='right')
-        plt.tight_layout()
-
-        # Save the chart if save_path is provided
-        if bool(save_path):
-            chart_path = os.path.join(save_path, f"report_{keyword}_chart.png")
-            plt.savefig(chart_path)
-            print(f"Chart saved as {chart_path}")
-
-        # Show the chart if save_path is not provided (bool(save_path) will be False)
         if not bool(save_path):
-            plt.show()
+            # Charts are written to files instead of opening a window, so CLI runs never block
+            save_path = os.path.join('output', 'charts', datetime.now().strftime('%Y-%m-%d_%H-%M-%S'))
+        charts = []
+        for dimension, report in reports.items():
+            values = list(report.values())
+            if values and isinstance(values[0], dict):
+                axis_label, title_label = 'Periods', 'Period'
+            else:
+                report_dimension = REPORT_DIMENSIONS.get(dimension, REPORT_DIMENSIONS['category'])
+                axis_label, title_label = report_dimension.axis_label, report_dimension.title_label
+            file_name = '_'.join(str(part) for part in ('report', keyword, dimension, 'chart') if part)
+            charts.append((
+                report,
+                os.path.join(save_path, self.sanitize_filename(file_name)),
+                f'Number of Posts per {title_label}',
+                axis_label,
+            ))
+        return self.chart_renderer.render_many(charts)
+
+    def save_archived_html(self, payload, html_path):
+        # Method to write a page built from the post's archived payload; it is not the downloaded article page
+        title = payload['title']['rendered']
+        html = (f"<!DOCTYPE html>\n<html>\n<head><meta charset=\"utf-8\"><title>{title}</title></head>\n"
+                f"<body>\n<h1>{title}</h1>\n{payload['content']['rendered']}\n</body>\n</html>\n").encode('utf-8')
+        with open(html_path, 'wb') as f:
+            f.write(html)
+        self.package_file(html_path, html)
+        metrics.increment('html_from_archive_total')
+
+    def download_item_files(self, item, image_dir, html_dir, archived_payloads):
+        # Method to download the featured image and the article HTML of one parsed item
+        image_url = item.featured_media_link
+        if image_url:
+            image_path = os.path.join(image_dir, os.path.basename(image_url))
+            self.download_file(image_url, image_path, endpoint='media')
+
+        link_url = item.link
+        if link_url:
+            filename = self.sanitize_filename(item.title)
+            # Archived posts are written from their stored rendered HTML instead of requesting the page,
+            # named .api.html so they are not mistaken for the article page with its site layout
+            if item.post_id in archived_payloads:
+                self.save_archived_html(archived_payloads[item.post_id], os.path.join(html_dir, f"{filename}.api.html"))
+            else:
+                self.download_file(link_url, os.path.join(html_dir, f"{filename}.html"), endpoint='html')
+
+    def download_file(self, url, path, endpoint):
+        try:
+            with metrics.timer('http_request_seconds', endpoint=endpoint):
+                response = requests.get(url, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+            metrics.increment('http_response_bytes_total', len(response.content), endpoint=endpoint)
+            response.raise_for_status()  # Raise an error for HTTP errors
+            with open(path, 'wb') as f:
+                f.write(response.content)
+            self.package_file(path, response.content)
+        except ChunkedEncodingError as e:
+            logger.warning("ChunkedEncodingError occurred for %s: %s", url, e)
+        except requests.exceptions.RequestException as e:
+            logger.warning("Error downloading %s: %s", url, e)
+
+    def package_file(self, path, data=None):
+        # Method to hand a written export file to the running export's packager, if any
+        if self.packager is None:
+            return
+        if data is None:
+            self.packager.add(path)
         else:
-            plt.close()  # Close the plot if save_path is provided
+            self.packager.add_bytes(path, data)
 
     def download_images_and_save_models(self, parsed_items, save_path, file_format='xls'):
 
-        print("Downloading images and saving models...")
+        logger.info("Downloading images and saving models...")
 
         # Create a directory to save the downloaded images
         html_dir = os.path.join(save_path, 'html')
@@ -179,68 +483,43 @@ class ReportGenerator:
         os.makedirs(image_dir, exist_ok=True)
         os.makedirs(html_dir, exist_ok=True)
 
-        # Download images from the featured_media_link field and HTML content from the link field
-        for item in parsed_items:
-            image_url = item.get('featured_media_link')
-            if image_url:
-                image_name = os.path.basename(image_url)
-                image_path = os.path.join(image_dir, image_name)
-                try:
-                    response = requests.get(image_url)
-                    response.raise_for_status()  # Raise an error for HTTP errors
-                    with open(image_path, 'wb') as f:
-                        f.write(response.content)
-                except ChunkedEncodingError as e:
-                    print(f"ChunkedEncodingError occurred for {image_url}: {e}")
-                except requests.exceptions.RequestException as e:
-                    print(f"Error downloading {image_url}: {e}")
-
-            link_url = item.get('link')
-            if link_url:
-                html_name = f"{self.sanitize_filename(item['title'])}.html"
-                html_path = os.path.join(html_dir, html_name)
-                try:
-                    response = requests.get(link_url)
-                    response.raise_for_status()  # Raise an error for HTTP errors
-                    with open(html_path, 'wb') as f:
-                        f.write(response.content)
-                except ChunkedEncodingError as e:
-                    print(f"ChunkedEncodingError occurred for {link_url}: {e}")
-                except requests.exceptions.RequestException as e:
-                    print(f"Error downloading {link_url}: {e}")
-        print("Images downloaded and HTML content saved.")
-
-        # Convert datetime objects to strings
-        for item in parsed_items:
-            item['created_date'] = item['created_date'].strftime('%Y-%m-%d %H:%M:%S')
-            item['modified_date'] = item['modified_date'].strftime('%Y-%m-%d %H:%M:%S')
-
-        # print("Datetime objects converted to strings.")
-
-        # Save models in the specified format
-        for item in parsed_items:
-
-            # Save data in the specified format
-            if file_format == "csv":
-                os.makedirs(csv_dir, exist_ok=True)
-                slug = self.save_as_csv(item, csv_dir)
-                print(f"CSV file saved: {os.path.join(csv_dir, slug)}.csv")
-
-            elif file_format == "xls":
-                os.makedirs(exel_dir, exist_ok=True)
-                slug = self.save_as_xls(item, exel_dir)
-                print(f"XLS file saved: {os.path.join(exel_dir, slug)}.xls")
-
-            elif file_format == 'json':
-                os.makedirs(json_dir, exist_ok=True)
-                slug = self.save_as_json(item, json_dir)
-                print(f"JSON file saved: {os.path.join(json_dir, slug)}.json")
-
-        print("All data saved successfully.")
-
-    def save_as_csv(self, item, save_path):
-        # Create a folder for each post
-        post = item['post']
+        # Download images and article HTML concurrently; each file is packaged as soon as it is written.
+        # Archived payloads are read here, so the download threads never query the database.
+        archived_payloads = self.payload_archive.load_many(item.post_id for item in parsed_items)
+        with ThreadPoolExecutor(max_workers=EXPORT_DOWNLOAD_WORKERS) as executor:
+            list(executor.map(lambda item: self.download_item_files(item, image_dir, html_dir, archived_payloads),
+                              parsed_items))
+        logger.info("Images downloaded and HTML content saved.")
+
+        # Save models in the specified format; content and excerpt are loaded one batch of posts at a time
+        for start in range(0, len(parsed_items), EXPORT_LOAD_BATCH):
+            batch = parsed_items[start:start + EXPORT_LOAD_BATCH]
+            posts = load_posts(item.post_id for item in batch)
+            for item in batch:
+                post = posts[item.post_id]
+
+                # Save data in the specified format
+                if file_format == "csv":
+                    os.makedirs(csv_dir, exist_ok=True)
+                    slug = self.save_as_csv(item, csv_dir, post)
+                    logger.debug("CSV files saved: %s", os.path.join(csv_dir, slug))
+
+                elif file_format == "xls":
+                    os.makedirs(exel_dir, exist_ok=True)
+                    slug = self.save_as_xls(item, exel_dir, post)
+                    logger.debug("XLS files saved: %s", os.path.join(exel_dir, slug))
+
+                elif file_format == 'json':
+                    os.makedirs(json_dir, exist_ok=True)
+                    slug = self.save_as_json(item, json_dir, post)
+                    logger.debug("JSON file saved: %s.json", os.path.join(json_dir, slug))
+
+        logger.info("All data saved successfully.")
+
+    def save_as_csv(self, item, save_path, post=None):
+        # Create a folder for each post; the content is loaded for this post unless `post` was loaded in a batch
+        post = post or item.load_post()
+        created_date, modified_date = item.export_dates()
         slug = post.slug
         post_dir = os.path.join(save_path, post.slug)
         os.makedirs(post_dir, exist_ok=True)
@@ -249,8 +528,8 @@ class ReportGenerator:
         post_data = {
             'post_id': post.post_id,
             'title': post.title,
-            'created_date': item['created_date'],
-            'modified_date': item['modified_date'],
+            'created_date': created_date,
+            'modified_date': modified_date,
             'slug': post.slug,
             'status': post.status,
             'post_type': post.post_type,
@@ -261,41 +540,49 @@ class ReportGenerator:
         self.save_csv_file(post_data, post_dir, 'post.csv')
 
         # Save author data to a CSV file
-        author_data = {
-            'author_id': item['author'].author_id,
-            'name': item['author'].name,
-            'description': item['author'].description,
-            'link': item['author'].link,
-            'position': item['author'].position
-        }
+        author_data = self.author_data(item)
         self.save_csv_file(author_data, post_dir, 'author.csv')
 
         # Save categories data to a CSV file
         categories_data = [{'name': category.name,
                             'description': category.description,
                             'link': category.link,
-                            'slug': category.slug} for category in item['categories']]
+                            'slug': category.slug} for category in item.categories]
         self.save_csv_file_list(categories_data, post_dir, 'categories.csv')
 
         # Save tags data to a CSV file
         tags_data = [{'name': tag.name,
                       'description': tag.description,
                       'link': tag.link,
-                      'slug': tag.slug} for tag in item['tags']]
+                      'slug': tag.slug} for tag in item.tags]
         self.save_csv_file_list(tags_data, post_dir, 'tags.csv')
 
         return slug
 
+    def author_data(self, item):
+        # Method to export a post's author; a post without a stored author exports empty fields
+        author = item.author
+        if author is None:
+            return {'author_id': item.author_id, 'name': None, 'description': None, 'link': None, 'position': None}
+        return {
+            'author_id': author.author_id,
+            'name': author.name,
+            'description': author.description,
+            'link': author.link,
+            'position': author.position
+        }
+
     def save_csv_file(self, data, save_path, filename):
         csv_file_path = os.path.join(save_path, filename)
         with open(csv_file_path, 'w', newline='', encoding='utf-8') as csv_file:
             writer = csv.DictWriter(csv_file, fieldnames=data.keys())
             writer.writeheader()
             writer.writerow(data)
+        self.package_file(csv_file_path)
 
     def save_csv_file_list(self, data_list, save_path, filename):
         if not data_list:
-            print(f"No data to save in {filename}")
+            logger.debug("No data to save in %s", filename)
             return
 
         csv_file_path = os.path.join(save_path, filename)
@@ -303,10 +590,12 @@ class ReportGenerator:
             writer = csv.DictWriter(csv_file, fieldnames=data_list[0].keys())
             writer.writeheader()
             writer.writerows(data_list)
+        self.package_file(csv_file_path)
 
-    def save_as_xls(self, item, save_path):
-        # Create a folder for each post
-        post = item['post']
+    def save_as_xls(self, item, save_path, post=None):
+        # Create a folder for each post; the content is loaded for this post unless `post` was loaded in a batch
+        post = post or item.load_post()
+        created_date, modified_date = item.export_dates()
         slug = post.slug
         post_dir = os.path.join(save_path, post.slug)
         os.makedirs(post_dir, exist_ok=True)
@@ -315,8 +604,8 @@ class ReportGenerator:
         post_data = {
             'post_id': post.post_id,
             'title': post.title,
-            'created_date': item['created_date'],
-            'modified_date': item['modified_date'],
+            'created_date': created_date,
+            'modified_date': modified_date,
             'slug': post.slug,
             'status': post.status,
             'post_type': post.post_type,
@@ -327,41 +616,40 @@ class ReportGenerator:
         self.save_excel_file(post_data, post_dir, 'post.xls')
 
         # Save author data
-        author_data = {
-            'author_id': item['author'].author_id,
-            'name': item['author'].name,
-            'description': item['author'].description,
-            'link': item['author'].link,
-            'position': item['author'].position
-        }
+        author_data = self.author_data(item)
         self.save_excel_file(author_data, post_dir, 'author.xls')
 
         # Save categories data
         categories_data = [{'name': category.name,
                             'description': category.description,
                             'link': category.link,
-                            'slug': category.slug} for category in item['categories']]
+                            'slug': category.slug} for category in item.categories]
         self.save_excel_file_list(categories_data, post_dir, 'categories.xls')
 
         # Save tags data
         tags_data = [{'name': tag.name,
                       'description': tag.description,
                       'link': tag.link,
-                      'slug': tag.slug} for tag in item['tags']]
+                      'slug': tag.slug} for tag in item.tags]
         self.save_excel_file_list(tags_data, post_dir, 'tags.xls')
 
         return slug
 
     def save_excel_file(self, data, save_path, filename):
+        # openpyxl is only needed by xls exports, so it is imported on demand
+        from openpyxl import Workbook
+
         xls_file_path = os.path.join(save_path, filename)
         wb = Workbook()
         ws = wb.active
         for key, value in data.items():
             ws.append([key, value])
         wb.save(xls_file_path)
-        print(f"{filename} saved: {xls_file_path}")
+        self.package_file(xls_file_path)
 
     def save_excel_file_list(self, data_list, save_path, filename):
+        from openpyxl import Workbook
+
         xls_file_path = os.path.join(save_path, filename)
         wb = Workbook()
         ws = wb.active
@@ -369,12 +657,12 @@ class ReportGenerator:
             for key, value in data.items():
                 ws.append([key, value])
         wb.save(xls_file_path)
-        print(f"{filename} saved: {xls_file_path}")
-
-    def save_as_json(self, item, save_path):
+        self.package_file(xls_file_path)
 
-        post = item['post']
-        author = item['author']
+    def save_as_json(self, item, save_path, post=None):
+        # The content is loaded for this post unless `post` was loaded in a batch
+        post = post or item.load_post()
+        created_date, modified_date = item.export_dates()
         categories = [{
             'category_id': category.category_id,
             'count': category.count,
@@ -382,7 +670,7 @@ class ReportGenerator:
             'description': category.description,
             'link': category.link,
             'slug': category.slug
-        } for category in item['categories']]
+        } for category in item.categories]
 
         tags = [{
             'tag_id': tag.tag_id,
@@ -391,61 +679,83 @@ class ReportGenerator:
             'description': tag.description,
             'link': tag.link,
             'slug': tag.slug
-        } for tag in item['tags']]
+        } for tag in item.tags]
 
         # Create a dictionary for the post data
         post_data = {
             'post_id': post.post_id,
             'title': post.title,
-            'created_date': item['created_date'],
-            'modified_date': item['modified_date'],
+            'created_date': created_date,
+            'modified_date': modified_date,
             'slug': post.slug,
             'status': post.status,
             'post_type': post.post_type,
             'link': post.link,
             'content': post.content,
             'excerpt': post.excerpt,
-            'author': {
-                'author_id': author.author_id,
-                'name': author.name,
-                'description': author.description,
-                'link': author.link,
-                'position': author.position
-            },
+            'author': self.author_data(item),
             'categories': categories,
             'tags': tags,
         }
 
-        print(f"Saving data for post: {post.title}")
+        logger.debug("Saving data for post: %s", post.title)
 
         json_file_path = os.path.join(save_path, f"{post_data['slug']}.json")
         with open(json_file_path, 'w') as json_file:
             json.dump(post_data, json_file, indent=4)
+        self.package_file(json_file_path)
 
         return post.slug
 
-    def export_report(self, report_content, data, keyword, parsed_items, file_format):
-        # Create a new folder with keyword and current date
-        folder_name = f"{keyword}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}"
+    def export_report(self, report_content, data, keyword, parsed_items, file_format, dimension=None,
+                      archive_format=EXPORT_ARCHIVE_FORMAT):
+        # Create a new folder with keyword, report dimension, file format and current date
+        folder_name = '_'.join(str(part) for part in (keyword, dimension, file_format) if part)
+        folder_name = f"{self.sanitize_filename(folder_name)}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S_%f')}"
         folder_path = os.path.join("output", folder_name)
-        os.makedirs(folder_path)
-
-        # Write report content to HTML file
-        report_file_path = os.path.join(folder_path, "report.txt")
-        with open(report_file_path, "w") as report_file:
-            report_file.write(report_content)
-
-        # save chart
-        self.draw_chart(report=data, keyword=keyword, save_path=folder_path)
-
-        # Copy related images (if any) to the folder
-        self.download_images_and_save_models(parsed_items, folder_path, file_format)
-
-        # Zip the folder
-        zip_file_path = shutil.make_archive(folder_path, 'zip', folder_path)
-
-        # Print the address of the zipped folder
-        print("Report exported to:", zip_file_path)
+        try:
+            os.makedirs(folder_path)
+        except FileExistsError:
+            # Another export of the same report started in the same microsecond
+            folder_path = tempfile.mkdtemp(dir="output", prefix=f"{folder_name}_")
+
+        # Files are streamed into the archive as they are written ('zip' or 'tar.zst')
+        self.packager = ExportPackager(folder_path, archive_format)
+        try:
+            # Write report content to HTML file
+            report_file_path = os.path.join(folder_path, "report.txt")
+            with open(report_file_path, "w") as report_file:
+                report_file.write(report_content)
+            self.package_file(report_file_path)
+
+            # save chart
+            with metrics.timer('pipeline_stage_seconds', stage='chart'):
+                self.package_file(
+                    self.draw_chart(report=data, keyword=keyword, save_path=folder_path, dimension=dimension)
+                )
+
+            # Copy related images (if any) to the folder
+            with metrics.timer('pipeline_stage_seconds', stage='download'):
+                self.download_images_and_save_models(parsed_items, folder_path, file_format)
+        except BaseException:
+            # Finish the archive thread, but raise the error that stopped the export, not the packager's
+            try:
+                self.packager.close()
+            except Exception as close_error:
+                logger.warning("Archive of %s left incomplete: %s", folder_path, close_error)
+            self.packager = None
+            raise
+
+        # Only the members still queued are left to write
+        with metrics.timer('pipeline_stage_seconds', stage='archive'):
+            try:
+                archive_path = self.packager.close()
+            finally:
+                self.packager = None
+
+        # Print the address of the archive
+        logger.info("Report exported to: %s", archive_path)
+        return archive_path
 
     def sanitize_filename(self, filename):
         # Remove characters that are not suitable for file names
@@ -0,0 +1,228 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+
+from metrics import metrics
+
+# 429 Too Many Requests is the only client error worth retrying; every 5xx may be transient
+RETRYABLE_CLIENT_STATUSES = {429}
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker shared by every thread requesting that host.
+
+    After `failure_threshold` consecutive failures (5xx, 429, connection errors and
+    timeouts) the circuit opens and every caller waits in acquire() until `reset_timeout`
+    seconds have passed. One probe request is then let through: success closes the
+    circuit, failure opens it again for another `reset_timeout`. A probe that ends
+    without either (any other exception) hands its slot to the next caller.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    # Seconds a non-blocking caller sleeps before asking again while another caller probes
+    probe_poll_interval = 0.1
+
+    def __init__(self, host, failure_threshold=5, reset_timeout=30.0):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._condition = threading.Condition()
+
+    def _enter(self):
+        # Method to let a caller through if the circuit allows it, under the lock.
+        # Returns (allowed, probe, wait): wait is what is left of an open circuit's cooldown,
+        # or None while another caller is probing
+        if self.state == self.CLOSED:
+            return True, False, 0.0
+        if self.state == self.OPEN:
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if remaining <= 0:
+                # This caller becomes the probe; the others keep waiting for its outcome
+                self.state = self.HALF_OPEN
+                return True, True, 0.0
+            return False, False, remaining
+        return False, False, None
+
+    def acquire(self):
+        # Method to block the caller while the circuit is open or another thread is probing;
+        # returns True when the caller is the half-open probe
+        with self._condition:
+            while True:
+                allowed, probe, wait = self._enter()
+                if allowed:
+                    return probe
+                self._condition.wait(wait)
+
+    def before_request(self):
+        """
+        Non-blocking acquire() for callers that must not block their thread, like the async engine.
+
+        Returns:
+            tuple: (allowed, probe, wait). When allowed is False the caller sleeps `wait` seconds
+                and asks again; probe is True when the caller is the half-open probe and must
+                record its outcome or call release_probe().
+        """
+        with self._condition:
+            allowed, probe, wait = self._enter()
+            return allowed, probe, (self.probe_poll_interval if wait is None else wait)
+
+    def release_probe(self):
+        # Method to free the probe slot when the probe recorded no outcome; the circuit stays
+        # open with its cooldown already over, so the next caller probes right away
+        with self._condition:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self._condition.notify_all()
+
+    def record_success(self):
+        with self._condition:
+            if self.state != self.CLOSED:
+                metrics.increment('http_circuit_transitions_total', host=self.host, state=self.CLOSED)
+            self.state = self.CLOSED
+            self.failures = 0
+            self._condition.notify_all()
+
+    def record_failure(self):
+        with self._condition:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    metrics.increment('http_circuit_transitions_total', host=self.host, state=self.OPEN)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+            self._condition.notify_all()
+
+
+class RetryPolicy:
+    """
+    Decide whether and when a failed request is retried, and guard each host with a circuit breaker.
+
+    Args:
+        retries (int): Total attempts per request, including the first one.
+        backoff_factor (float): Base of the exponential backoff, in seconds.
+        max_backoff (float): Upper bound for any single wait, including Retry-After.
+        connect_timeout (float): Seconds to establish a connection.
+        read_timeout (float): Seconds to wait between bytes of the response.
+        failure_threshold (int): Consecutive failures that open a host's circuit.
+        reset_timeout (float): Seconds an open circuit pauses requests to its host.
+        pool_size (int): Keep-alive connections kept per host, shared by all threads.
+    """
+
+    def __init__(self, retries=3, backoff_factor=0.75, max_backoff=60.0, connect_timeout=5.0, read_timeout=30.0,
+                 failure_threshold=5, reset_timeout=30.0, pool_size=10):
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.timeout = (connect_timeout, read_timeout)
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker_for(self, url):
+        # Method to get the circuit breaker of the URL's host, creating it on first use
+        host = urlparse(url).netloc
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = self._breakers[host] = CircuitBreaker(host, self.failure_threshold, self.reset_timeout)
+            return breaker
+
+    @staticmethod
+    def is_retryable_status(status_code):
+        return status_code >= 500 or status_code in RETRYABLE_CLIENT_STATUSES
+
+    @staticmethod
+    def is_retryable_error(error):
+        # Connection failures and timeouts are retried; anything else (invalid URL, ...) is not
+        return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+    def retry_after(self, response):
+        """
+        Parse a Retry-After header given either as seconds or as an HTTP date.
+
+        Returns:
+            float: Seconds to wait, or None when the header is missing or invalid.
+        """
+        value = response.headers.get('Retry-After') if response is not None else None
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+    def backoff(self, attempt, response=None):
+        # Retry-After when the server sent one, otherwise exponential backoff with full jitter
+        delay = self.retry_after(response)
+        if delay is None:
+            delay = random.uniform(0, self.backoff_factor * (4 ** attempt))
+        return min(delay, self.max_backoff)
+
+    def get(self, url, endpoint='other', **kwargs):
+        """
+        GET `url`, retrying transient failures.
+
+        Returns:
+            requests.Response: A successful response.
+
+        Raises:
+            requests.HTTPError: For a non-retryable status, or the last retryable one.
+            requests.RequestException: For the last connection error or timeout.
+        """
+        breaker = self.breaker_for(url)
+        for attempt in range(self.retries):
+            probe = breaker.acquire()
+            response = None
+            try:
+                with metrics.timer('http_request_seconds', endpoint=endpoint):
+                    response = self.session.get(url, timeout=self.timeout, **kwargs)
+                metrics.increment('http_requests_total', endpoint=endpoint, status=response.status_code)
+                if not kwargs.get('stream'):
+                    # A streamed body is counted by the caller as it is read
+                    metrics.increment('http_response_bytes_total', len(response.content), endpoint=endpoint)
+            except requests.RequestException as error:
+                if not self.is_retryable_error(error):
+                    # The host was not at fault (invalid URL, too many redirects, ...)
+                    breaker.record_success()
+                    raise
+                breaker.record_failure()
+                if attempt == self.retries - 1:
+                    raise
+            else:
+                if not self.is_retryable_status(response.status_code):
+                    # The origin answered; 4xx such as 404 or 401 are final and left to the caller
+                    breaker.record_success()
+                    response.raise_for_status()
+                    return response
+                breaker.record_failure()
+                if attempt == self.retries - 1:
+                    response.raise_for_status()
+            finally:
+                if probe:
+                    # No-op once record_success/record_failure resolved the half-open state
+                    breaker.release_probe()
+
+            metrics.increment('http_retries_total', endpoint=endpoint)
+            time.sleep(self.backoff(attempt, response))
@@ -1,4 +1,5 @@
 DATABASE = {
+    'engine': 'postgresql',  # or 'sqlite', with 'name' set to the database file path
     'name': '',
     'user': '',
     'password': '',
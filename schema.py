@@ -0,0 +1,116 @@
+import datetime
+import logging
+
+import peewee
+
+import models
+from content_store import content_store
+from partitioning import PartitionManager
+from search_index import LocalSearchIndex
+from constants import SCHEMA_VERSION
+
+logger = logging.getLogger(__name__)
+
+# (model name, field name) of columns added to tables that databases created earlier already have;
+# models is only partially imported while main loads, so models are resolved by name
+ADDED_COLUMNS = (
+    ('SearchByKeyword', 'created_at'),
+    ('SearchByKeyword', 'remote_requests'),
+    ('SearchByKeyword', 'requests_avoided'),
+    ('SearchByKeyword', 'completed_at'),
+    ('Post', 'modified_gmt'),
+)
+
+
+class SchemaManager:
+    """
+    Creates and upgrades the tables, indexes and partitions the scraper needs.
+
+    Initializing issues dozens of statements (CREATE TABLE / INDEX IF NOT EXISTS for every
+    model, column introspection, partition checks), so it runs on --init-db, or when the
+    version recorded in SchemaVersion is older than SCHEMA_VERSION. Every other start only
+    reads that one row. The check also goes stale at each new month, so monthly search
+    history partitions keep being created ahead.
+
+    Args:
+        database_manager (DatabaseManager): The database to initialize.
+    """
+
+    def __init__(self, database_manager):
+        self.database_manager = database_manager
+
+    def recorded_version(self):
+        """
+        Returns:
+            SchemaVersion: The recorded version row, or None before the first initialization.
+        """
+        try:
+            return models.SchemaVersion.select().order_by(models.SchemaVersion.id.desc()).first()
+        except peewee.DatabaseError:
+            # The table does not exist yet
+            return None
+
+    def is_current(self):
+        recorded = self.recorded_version()
+        if recorded is None or recorded.version < SCHEMA_VERSION:
+            return False
+        now = datetime.datetime.now()
+        return (recorded.initialized_at.year, recorded.initialized_at.month) == (now.year, now.month)
+
+    def ensure_current(self):
+        # Method to initialize the schema only when the recorded version is missing, older or from a past month
+        if self.is_current():
+            return False
+        self.initialize()
+        return True
+
+    def initialize(self):
+        """
+        Create missing tables, columns, indexes and partitions, then record SCHEMA_VERSION.
+        """
+        database_manager = self.database_manager
+        # Missing tables are created first, so new columns can reference them; existing tables get
+        # their new columns before create_tables indexes every table
+        database_manager.create_tables([model for model in models.ALL_MODELS if not model.table_exists()])
+        self.add_missing_columns()
+        database_manager.create_tables(models.ALL_MODELS)
+
+        # Keep monthly search history partitions ahead of the current month once the table is partitioned
+        partition_manager = PartitionManager(database_manager)
+        if partition_manager.is_partitioned():
+            partition_manager.ensure_partitions()
+
+        # The full-text search index used by --local-search is a Postgres GIN index over stored vectors;
+        # posts stored before their vectors were get theirs here
+        search_index = LocalSearchIndex(database_manager)
+        if search_index.enabled:
+            search_index.create_index()
+            search_index.backfill()
+
+        with database_manager.db.atomic():
+            models.SchemaVersion.delete().execute()
+            models.SchemaVersion.create(version=SCHEMA_VERSION)
+        logger.info("Database schema initialized (version %d)", SCHEMA_VERSION)
+
+    def add_missing_columns(self):
+        # Method to add the columns in ADDED_COLUMNS (and the content store's) to tables created without them
+        from playhouse.migrate import SchemaMigrator, migrate
+
+        database = self.database_manager.db
+        content_store.ensure_schema(database)
+
+        migrator = SchemaMigrator.from_database(database)
+        operations = []
+        columns_by_table = {}
+        for model_name, field_name in ADDED_COLUMNS:
+            model = getattr(models, model_name)
+            table = model._meta.table_name
+            if table not in columns_by_table:
+                columns_by_table[table] = {column.name for column in database.get_columns(table)}
+            field = model._meta.fields[field_name]
+            if field.column_name not in columns_by_table[table]:
+                operations.append(migrator.add_column(table, field.column_name, field))
+        if operations:
+            with database.atomic():
+                migrate(*operations)
+            logger.info("Added %d missing columns", len(operations))
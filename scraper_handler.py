@@ -1,20 +1,43 @@
+import re
 import time
 import datetime
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
 import requests
-import warnings
-from bs4 import BeautifulSoup
 from peewee import DoesNotExist, OperationalError, IntegrityError
 import logging
 
 import models
-
-# Suppress BeautifulSoup warnings
-warnings.filterwarnings(
-    "ignore",
-    message="The input looks more like a filename than markup. You may want to "
-            "open this file and pass the filehandle into Beautiful Soup.",
-    category=UserWarning
+from log_config import ProgressLogger
+from metrics import metrics
+from constants import (
+    ALL_POSTS_PAGE_DELAY, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS, HTTP_BACKOFF_FACTOR,
+    HTTP_CONNECT_TIMEOUT, HTTP_MAX_BACKOFF, HTTP_POOL_SIZE, HTTP_READ_TIMEOUT, HTTP_RETRIES, LOCAL_SEARCH_PAGE_SIZE,
+    PROGRESS_LOG_INTERVAL, SEARCH_FETCH_WORKERS, SEARCH_RESULTS_PER_PAGE, SYNC_MAX_PAGES, URL_PATTERN
 )
+from cooccurrence_index import CooccurrenceIndex
+from negative_cache import NegativeCache
+from parsed_post import ParsedPost, Taxonomy
+from payload_archive import PayloadArchive, clean_html
+from post_links import replace_post_links
+from retry_policy import RetryPolicy
+from search_index import LocalSearchIndex
+
+logger = logging.getLogger(__name__)
+
+SearchHit = namedtuple('SearchHit', ['title', 'url', 'slug'])
+
+# Search result headings, the only part of a result page that is parsed
+SEARCH_RESULT_TAG = 'h4'
+SEARCH_RESULT_ATTRS = {'class': 'pb-10'}
+
+URL_RE = re.compile(URL_PATTERN)
+
+# Stored in place of authors the API answers with 404 / 401, so posts can still reference them
+NOT_FOUND_AUTHOR = {'name': "Not Found", 'description': "Author not found", 'link': "", 'position': ""}
+NOT_AUTHORIZED_AUTHOR = {'name': "Not Authorized", 'description': "Access unauthorized", 'link': "", 'position': ""}
+PLACEHOLDER_AUTHOR_NAMES = {NOT_FOUND_AUTHOR['name'], NOT_AUTHORIZED_AUTHOR['name']}
 
 
 class ScraperHandler:
@@ -27,30 +50,33 @@ class ScraperHandler:
         self.categoryurl = categoryurl
         self.tagurl = tagurl
         self.allpostsurl = allpostsurl
-
-    def request_to_target_url(self, url, retries=3, backoff_factor=0.75):
-        # Method to make HTTP requests with retries
-        for attempt in range(retries):
-            try:
-                response = requests.get(url)
-                # print(response.url)
-                # print(response.status_code)
-                response.raise_for_status()  # Raise HTTPError for bad status codes
-                return response
-            except (requests.RequestException, IOError) as e:
-                if attempt < retries - 1:
-                    # Exponential backoff before retrying
-                    sleep_duration = backoff_factor * (4 ** attempt)
-                    time.sleep(sleep_duration)
-                    continue
-                else:
-                    # Raise the last encountered exception
-                    raise e
+        self.page_delay = ALL_POSTS_PAGE_DELAY
+        self.cooccurrence_index = CooccurrenceIndex(database_manager)
+        self.local_search_index = LocalSearchIndex(database_manager)
+        self.negative_cache = NegativeCache(database_manager)
+        self.payload_archive = PayloadArchive(database_manager)
+        # Authors, categories and tags of the parsed items, shared by id
+        self.taxonomy = Taxonomy()
+        self.retry_policy = RetryPolicy(
+            retries=HTTP_RETRIES,
+            backoff_factor=HTTP_BACKOFF_FACTOR,
+            max_backoff=HTTP_MAX_BACKOFF,
+            connect_timeout=HTTP_CONNECT_TIMEOUT,
+            read_timeout=HTTP_READ_TIMEOUT,
+            failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=CIRCUIT_RESET_SECONDS,
+            pool_size=HTTP_POOL_SIZE,
+        )
+
+    def request_to_target_url(self, url, endpoint='other'):
+        # Method to make HTTP requests recorded per endpoint type. Only 5xx, 429, connection
+        # errors and timeouts are retried; other 4xx raise HTTPError straight away.
+        return self.retry_policy.get(url, endpoint=endpoint)
 
     def clean_view(self, text):
         # Method to clean HTML text using BeautifulSoup
-        soup = BeautifulSoup(text, 'html.parser')
-        return " ".join(soup.strings)
+        with metrics.timer('clean_view_seconds'):
+            return clean_html(text)
 
     def are_all_tables_empty(self):
         # Method to check if all database tables are empty
@@ -72,7 +98,7 @@ class ScraperHandler:
                         return False
                 return True
         except OperationalError:
-            print("Error occurred while locking tables.")
+            logger.error("Error occurred while locking tables.")
             return True
 
     def table_has_data(self, table_class):
@@ -86,108 +112,195 @@ class ScraperHandler:
         # Method to perform search by keyword
         search_items = list()
         parsed_items = list()
+        search_hits = list()
+        seen_slugs = set()
 
-        for i in range(search_by_keyword_instance.page_count):
+        search_pages = self.fetch_search_pages(
+            search_by_keyword_instance.keyword.title, search_by_keyword_instance.page_count
+        )
+        for _, page_hits in search_pages:
             # Iterate through search result pages
-            response = self.request_to_target_url(
-                self.searchurl.format(
-                    query=search_by_keyword_instance.keyword,
-                    page=i
-                )
-            )
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, "html.parser")
-                search_items.extend(
-                    self.extract_search_items(
-                        search_by_keyword=search_by_keyword_instance,
-                        soup=soup
-                    )
-                )
+            for search_hit in page_hits:
+                if search_hit.slug not in seen_slugs:
+                    seen_slugs.add(search_hit.slug)
+                    search_hits.append(search_hit)
 
         with self.database_manager.db.atomic():  # Transaction begins here
             try:
-                for idx, search_item in enumerate(search_items):
-                    # Iterate through search items
-                    post, author, categories, tags = self.parse_post_detail(slug=search_item.slug)
-                    data = {
-                        'post_id': post.post_id,
-                        'title': post.title,
-                        'created_date': post.created_date,
-                        'modified_date': post.modified_date,
-                        'slug': post.slug,
-                        'status': post.status,
-                        'post_type': post.post_type,
-                        'link': post.link,
-                        'content': post.content,
-                        'excerpt': post.excerpt,
-                        'author_id': post.author_id,
-                        'featured_media_link': post.featured_media_link,
-                        'post_format': post.post_format,
-                        'post': post,
-                        'author': author,
-                        'categories': categories,
-                        'tags': tags,
-                    }
-
-                    parsed_items.append(data)
-
-                    # print(idx + 1, data)
+                for search_hit in search_hits:
+                    # Iterate through search hits
+                    search_item, data = self.save_search_result(
+                        search_by_keyword=search_by_keyword_instance,
+                        search_hit=search_hit,
+                        post_detail=self.parse_post_detail(slug=search_hit.slug)
+                    )
+                    if search_item:
+                        search_items.append(search_item)
+                        parsed_items.append(data)
 
             except Exception as e:
                 self.database_manager.db.rollback()  # Rollback transaction if an exception occurs
-                print(f"Error occurred: {str(e)}")
+                logger.error("Error occurred while saving search results: %s", e)
             else:
+                self.mark_search_completed(search_by_keyword_instance)
                 self.database_manager.db.commit()  # Commit transaction if no exceptions occur
 
         return search_items, parsed_items
 
-    def extract_search_items(self, search_by_keyword, soup):
-        # Method to extract search items from search result page
+    def mark_search_completed(self, search_by_keyword_instance):
+        # Method to record that a search's items are stored, so SearchPlanner may replay it
+        search_by_keyword_instance.completed_at = datetime.datetime.now()
+        search_by_keyword_instance.save(only=[models.SearchByKeyword.completed_at])
+
+    def build_parsed_item(self, post, author, categories, tags):
+        # Method to build the parsed item handed to reports and exporters
+        return ParsedPost.from_post(post, author, categories, tags, self.taxonomy)
+
+    def search_local(self, search_by_keyword_instance, per_page=LOCAL_SEARCH_PAGE_SIZE):
+        # Method to perform search by keyword against the local full-text index
         search_items = list()
+        parsed_items = list()
+        keyword = search_by_keyword_instance.keyword.title
 
-        search_result_items = soup.findAll('h4', attrs={'class': 'pb-10'})
+        with self.database_manager.db.atomic():
+            for page in range(1, search_by_keyword_instance.page_count + 1):
+                results = self.local_search_index.search(keyword, page=page, per_page=per_page)
 
-        for search_result_item in search_result_items:
+                for post_id, _ in results:
+                    post, author, categories, tags = self.load_post_detail(post_id)
+                    search_items.append(models.PostSearchByKeywordItem.create(
+                        search_by_keyword=search_by_keyword_instance,
+                        title=post.title,
+                        url=post.link,
+                        slug=post.slug,
+                        post=post,
+                        created_at=datetime.datetime.now()
+                    ))
+                    parsed_items.append(self.build_parsed_item(post, author, categories, tags))
 
-            parsed_item = self.parse_search_item(
-                search_by_keyword=search_by_keyword,
-                search_result_item=search_result_item
-            )
-            if parsed_item:
-                search_items.append(parsed_item)
+                if len(results) < per_page:
+                    # No more matches after a short page
+                    break
 
-        return search_items
+        return search_items, parsed_items
 
-    def parse_search_item(self, search_by_keyword, search_result_item):
-        # Method to parse individual search item
+    def load_post_detail(self, post_id):
+        # Method to load a stored post with its author, categories and tags without any HTTP request
+        post = models.Post.get_by_id(post_id)
+        categories = list(models.Category.select().join(models.PostCategory).where(
+            models.PostCategory.post == post_id
+        ))
+        tags = list(models.Tag.select().join(models.PostTag).where(models.PostTag.post == post_id))
+        return post, post.author, categories, tags
+
+    def fetch_search_pages(self, keyword, page_count, stats=None, max_workers=SEARCH_FETCH_WORKERS):
+        # Method to fetch search result pages concurrently, yielding (page, hits) in page order.
+        # The first page is fetched alone; only once it comes back full are later pages fetched
+        # ahead, at most `max_workers` (and fewer than page_count) at a time, each submitted after
+        # the earliest one in flight is seen. A short, empty or repeated page ends the search and
+        # cancels the pages not yet requested. stats['requests'] is set to the number of page
+        # requests actually made.
+        if page_count < 1:
+            if stats is not None:
+                stats['requests'] = 0
+            return
+
+        window = max(1, min(max_workers, page_count - 1))
+        executor = ThreadPoolExecutor(max_workers=window)
+        futures = [executor.submit(self.fetch_search_page, keyword, 0)]
+        seen_slugs = set()
         try:
-            item_url = search_result_item.find('a')['href']  # Extract the URL of the search result item
-            item_slug = item_url.split('/')[-2]  # Extract the slug from the URL
-            post_data = self.parse_post_detail(slug=item_slug)
+            for page in range(page_count):
+                page_hits = futures[page].result()
+                yield page, page_hits
+
+                page_slugs = {search_hit.slug for search_hit in page_hits}
+                if len(page_hits) < SEARCH_RESULTS_PER_PAGE or page_slugs <= seen_slugs:
+                    # Results ran out or started repeating, later pages would add nothing
+                    break
+                seen_slugs |= page_slugs
+                while len(futures) < min(page_count, page + 1 + window):
+                    futures.append(executor.submit(self.fetch_search_page, keyword, len(futures)))
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+            if stats is not None:
+                stats['requests'] = sum(1 for future in futures if not future.cancelled())
+
+    def fetch_search_page(self, keyword, page):
+        # Method to request one search result page and extract its hits
+        response = self.request_to_target_url(self.searchurl.format(query=keyword, page=page), endpoint='search')
+        if response.status_code != 200:
+            return []
+        return self.parse_search_page(response.text)
 
-            if post_data:
-                post_id = post_data[0].post_id  # Get the post ID from the parsed post detail
-                try:
-                    # Create a new search item
-                    search_item = models.PostSearchByKeywordItem.create(
-                        search_by_keyword=search_by_keyword,
-                        title=search_result_item.text,
-                        url=item_url,
-                        slug=item_slug,
-                        post=post_id,
-                        created_at=datetime.datetime.now()
-                    )
-                    return search_item
-                except IntegrityError as e:
-                    # Handle the case where the item already exists
-                    logging.error("IntegrityError: %s", e)
-            else:
-                logging.error("No post data found for slug: %s", item_slug)
-        except IndexError:
-            logging.error("IndexError occurred while parsing post_data.")
-        except Exception as e:
-            logging.error("An unexpected error occurred: %s", e)
-        return None
+    def parse_search_page(self, html):
+        # bs4 is imported on first use, so commands that parse no HTML start without it
+        from bs4 import BeautifulSoup, SoupStrainer
+
+        # Only build a tree for the result headings instead of the whole page
+        strainer = SoupStrainer(SEARCH_RESULT_TAG, attrs=SEARCH_RESULT_ATTRS)
+        soup = BeautifulSoup(html, "html.parser", parse_only=strainer)
+        return self.extract_search_hits(soup)
+
+    def extract_search_hits(self, soup):
+        # Method to extract search hits from search result page
+        search_hits = list()
+
+        for search_result_item in soup.findAll('h4', attrs={'class': 'pb-10'}):
+            search_hit = self.parse_search_hit(search_result_item)
+            if search_hit:
+                search_hits.append(search_hit)
+
+        return search_hits
+
+    def parse_search_hit(self, search_result_item):
+        # Method to parse individual search result into its title, url and slug
+        try:
+            item_url = self.unwrap_search_url(search_result_item.find('a')['href'])
+            item_slug = item_url.rstrip('/').split('/')[-1]  # Extract the slug from the URL
+            return SearchHit(title=search_result_item.text, url=item_url, slug=item_slug)
+        except (TypeError, KeyError, IndexError):
+            logger.warning("Could not parse search result item: %s", search_result_item)
+            return None
+
+    def unwrap_search_url(self, url):
+        # Method to extract the target post URL from a search engine redirect link (RU=<encoded url>)
+        match = URL_RE.search(url)
+        if match:
+            return unquote(match.group(1))
+        return url
+
+    def save_search_result(self, search_by_keyword, search_hit, post_detail):
+        # Method to store a search hit for its post and build the parsed item
+        post, author, categories, tags = post_detail
+        if post is None:
+            logger.warning("No post data found for slug: %s", search_hit.slug)
+            return None, None
+
+        try:
+            search_item = models.PostSearchByKeywordItem.create(
+                search_by_keyword=search_by_keyword,
+                title=search_hit.title,
+                url=search_hit.url,
+                slug=search_hit.slug,
+                post=post.post_id,
+                created_at=datetime.datetime.now()
+            )
+        except IntegrityError as e:
+            # Handle the case where the item already exists
+            logger.warning("IntegrityError: %s", e)
+            return None, None
+
+        return search_item, self.build_parsed_item(post, author, categories, tags)
+
+    def find_stored_post(self, slug):
+        # Method to load an already ingested post by slug, or None if it is not in the database
+        post_id = models.Post.select(models.Post.post_id).where(models.Post.slug == slug).scalar()
+        if post_id is None:
+            return None
+        return self.load_post_detail(post_id)
 
     def fetch_all_pages(self):
         # Method to fetch all pages of posts
@@ -195,24 +308,63 @@ class ScraperHandler:
             with self.database_manager.db.atomic():
                 all_posts = []
                 page = 1
+                progress = ProgressLogger(logger, "Fetched %d pages (%.2f pages/s)", interval=PROGRESS_LOG_INTERVAL)
                 while True:
                     # for page in range(1, 5):
-                    response = self.request_to_target_url(self.allpostsurl.format(page=page))
-                    json_response = response.json()
+                    with metrics.timer('pipeline_stage_seconds', stage='posts_page'):
+                        json_response = self.fetch_posts_page(page)
+                        if json_response is None:
+                            break
+                        all_posts_in_page = self.parse_all_posts(json_response)
 
-                    all_posts_in_page = self.parse_all_posts(json_response)
-
-                    if 'code' in json_response and json_response['code'] == 'rest_post_invalid_page_number':
-                        break
                     all_posts.extend(all_posts_in_page)
                     page += 1
-                    time.sleep(10)
-                    print('page:', page - 1)
+                    time.sleep(self.page_delay)
+                    progress.update(page - 1, posts=len(all_posts))
                 return all_posts
         except OperationalError:
-            print("Error occurred while fetching all pages.")
+            logger.error("Error occurred while fetching all pages.")
             return []
 
+    def fetch_posts_page(self, page):
+        # Method to fetch one page of the posts listing, returning None once past the last page
+        try:
+            response = self.request_to_target_url(self.allpostsurl.format(page=page), endpoint='posts_page')
+        except requests.exceptions.HTTPError as http_err:
+            # WordPress answers past the last page with 400 rest_post_invalid_page_number
+            if http_err.response is not None and http_err.response.status_code == 400:
+                return None
+            raise
+        json_response = response.json()
+
+        if 'code' in json_response and json_response['code'] == 'rest_post_invalid_page_number':
+            return None
+        return json_response
+
+    def sync_recent_posts(self, max_pages=SYNC_MAX_PAGES):
+        # Method to fetch the newest pages of posts until a page holds no post missing from the database
+        new_posts = 0
+        for page in range(1, max_pages + 1):
+            with metrics.timer('pipeline_stage_seconds', stage='posts_page'):
+                json_response = self.fetch_posts_page(page)
+                if json_response is None:
+                    break
+
+                post_ids = [int(post_data['id']) for post_data in json_response]
+                known_ids = set(post_id for post_id, in models.Post.select(models.Post.post_id).where(
+                    models.Post.post_id.in_(post_ids)
+                ).tuples())
+                with self.database_manager.db.atomic():
+                    self.parse_all_posts([post_data for post_data in json_response
+                                          if int(post_data['id']) not in known_ids])
+
+            new_posts += len(post_ids) - len(known_ids)
+            if len(known_ids) == len(post_ids):
+                # Pages are newest first, everything after this one is already stored
+                break
+            time.sleep(self.page_delay)
+        return new_posts
+
     def parse_all_posts(self, json_response):
         all_posts_in_page = []
         authors = []
@@ -230,21 +382,39 @@ class ScraperHandler:
         return all_posts_in_page, authors, all_categories, all_tags
 
     def parse_post_detail(self, slug):
+        if self.negative_cache.is_missing('post', slug):
+            return None, None, None, None
         try:
-            post_response = self.request_to_target_url(self.posturl.format(slug=slug))
+            post_response = self.request_to_target_url(self.posturl.format(slug=slug), endpoint='post')
             json_response = post_response.json()
 
             if not json_response:
-                print("JSON response is empty for slug:", slug)
+                logger.warning("JSON response is empty for slug: %s", slug)
+                self.negative_cache.remember('post', slug, 404)
                 return None, None, None, None
 
             return self.parse_post_detail_from_data(json_response[0])
+        except requests.exceptions.HTTPError as http_err:
+            if http_err.response.status_code in (401, 404):
+                self.negative_cache.remember('post', slug, http_err.response.status_code)
+            logger.error("HTTPError occurred while fetching post detail for slug %s: %s", slug, http_err)
+            return None, None, None, None
         except Exception as e:
-            print(f"Error occurred while parsing post detail for slug {slug}: {e}")
+            logger.error("Error occurred while parsing post detail for slug %s: %s", slug, e)
             return None, None, None, None
 
     def parse_post_detail_from_data(self, post_data):
+        # Method to parse and store one post, recording its latency and number of DB statements
+        statements_before = self.database_manager.db.statement_count()
+        with metrics.timer('pipeline_stage_seconds', stage='post_detail'):
+            post_detail = self.store_post_detail(post_data)
+        metrics.observe('db_statements_per_post', self.database_manager.db.statement_count() - statements_before)
+        return post_detail
+
+    def store_post_detail(self, post_data):
         post_id = int(post_data['id'])
+        if self.payload_archive.enabled:
+            self.payload_archive.save(post_data)
 
         author = self.parse_author(int(post_data['author']))
         categories = self.parse_categories(category_ids=post_data['categories'])
@@ -254,110 +424,162 @@ class ScraperHandler:
             post = models.Post.get(models.Post.post_id == post_id)
         except DoesNotExist:
             try:
-                post = models.Post.create(
-                    post_id=post_id,
-                    created_date=post_data['date'],
-                    modified_date=post_data['modified'],
-                    slug=post_data['slug'],
-                    status=self.clean_view(post_data['status']),
-                    post_type=self.clean_view(post_data['type']),
-                    link=post_data['link'],
-                    title=self.clean_view(post_data['title']['rendered']),
-                    content=self.clean_view(post_data['content']['rendered']),
-                    excerpt=self.clean_view(post_data['excerpt']['rendered']),
-                    author_id=int(post_data['author']),
-                    featured_media_link=post_data['jetpack_featured_media_url'],
-                    post_format=post_data['format'],
-                )
+                post = models.Post.create(**self.post_fields(post_data))
             except IntegrityError as e:
-                print("IntegrityError:", e)
-
+                logger.warning("IntegrityError: %s", e)
+        else:
+            if (post.modified_date != datetime.datetime.fromisoformat(post_data['modified'])
+                    or (post.modified_gmt is None and post_data.get('modified_gmt'))):
+                # The post was edited since it was stored (e.g. found changed by sitemap discovery),
+                # or was stored before its UTC modification time was recorded
+                with self.database_manager.db.atomic():
+                    for name, value in self.post_fields(post_data).items():
+                        setattr(post, name, value)
+                    post.save()
+                    self.reconcile_post_links(post, categories, tags)
+                return post, author, categories, tags
+
+        new_category_ids = []
         for category in categories:
             try:
-                models.PostCategory.get_or_create(post=post, category=category)
+                _, created = models.PostCategory.get_or_create(post=post, category=category)
+                if created:
+                    new_category_ids.append(category.category_id)
             except IntegrityError as e:
-                print("IntegrityError:", e)
+                logger.warning("IntegrityError: %s", e)
 
+        new_tag_ids = []
         for tag in tags:
             try:
-                models.PostTag.get_or_create(post=post, tag=tag)
+                _, created = models.PostTag.get_or_create(post=post, tag=tag)
+                if created:
+                    new_tag_ids.append(tag.tag_id)
             except IntegrityError as e:
-                print("IntegrityError:", e)
+                logger.warning("IntegrityError: %s", e)
+
+        # Keep the co-occurrence index in step with the links created above
+        self.cooccurrence_index.record_post_links(
+            tag_ids=[tag.tag_id for tag in tags],
+            category_ids=[category.category_id for category in categories],
+            new_tag_ids=new_tag_ids,
+            new_category_ids=new_category_ids,
+        )
 
         return post, author, categories, tags
 
+    def reconcile_post_links(self, post, categories, tags):
+        # Method to make the category and tag links of an edited post match its current ones,
+        # keeping the co-occurrence index in step with the links deleted and created
+        changes = replace_post_links(
+            post.post_id,
+            category_ids=[category.category_id for category in categories],
+            tag_ids=[tag.tag_id for tag in tags],
+        )
+        category_changes, tag_changes = changes['category'], changes['tag']
+        # Pairs are removed against the old links and added against the new ones
+        self.cooccurrence_index.remove_post_links(
+            tag_ids=tag_changes.old, category_ids=category_changes.old,
+            removed_tag_ids=tag_changes.removed, removed_category_ids=category_changes.removed,
+        )
+        self.cooccurrence_index.record_post_links(
+            tag_ids=tag_changes.new, category_ids=category_changes.new,
+            new_tag_ids=tag_changes.added, new_category_ids=category_changes.added,
+        )
+
+    def post_fields(self, post_data):
+        # Method to extract the stored fields of a post from its API response
+        return {
+            'post_id': int(post_data['id']),
+            'created_date': datetime.datetime.fromisoformat(post_data['date']),
+            'modified_date': datetime.datetime.fromisoformat(post_data['modified']),
+            'modified_gmt': (datetime.datetime.fromisoformat(post_data['modified_gmt'])
+                             if post_data.get('modified_gmt') else None),
+            'slug': post_data['slug'],
+            'status': self.clean_view(post_data['status']),
+            'post_type': self.clean_view(post_data['type']),
+            'link': post_data['link'],
+            'title': self.clean_view(post_data['title']['rendered']),
+            'content': self.clean_view(post_data['content']['rendered']),
+            'excerpt': self.clean_view(post_data['excerpt']['rendered']),
+            'author_id': int(post_data['author']),
+            'featured_media_link': post_data['jetpack_featured_media_url'],
+            'post_format': post_data['format'],
+        }
+
     def parse_author(self, author_id):
-        author = None
+        author = models.Author.get_or_none(models.Author.author_id == author_id)
+        if not self.author_needs_request(author):
+            return author
 
         try:
-            # Attempt to retrieve the author from the database
-            author = models.Author.get(models.Author.author_id == author_id)
-        except DoesNotExist:
-            try:
-                # Fetch author details from URL
-                response = self.request_to_target_url(self.authorsurl.format(id=author_id))
-                response.raise_for_status()  # Raise HTTPError for bad status codes
-                json_response = response.json()
-
-                if not json_response:
-                    # If json_response is empty, create a null author entry in the database
-                    author, _ = models.Author.get_or_create(
-                        author_id=author_id,
-                        name="Not Found",
-                        description="Author not found",
-                        link="",
-                        position=""
-                    )
-                    print("Null Author created:", author_id)
-                else:
-                    # Extract author details from JSON response
-                    name = self.clean_view(json_response['name'])
-                    description = self.clean_view(json_response.get('cbDescription', 'No description available'))
-                    link = json_response.get('link', '')
-                    position = self.clean_view(json_response.get('position', ''))
-
-                    # Create or get author instance
-                    author, _ = models.Author.get_or_create(
-                        author_id=author_id,
-                        name=name,
-                        description=description,
-                        link=link,
-                        position=position
-                    )
-            except requests.exceptions.HTTPError as http_err:
-                if http_err.response.status_code == 404:
-                    # Handle 404 error: Author not found, create a null author entry
-                    author, _ = models.Author.get_or_create(
-                        author_id=author_id,
-                        name="Not Found",
-                        description="Author not found",
-                        link="",
-                        position=""
-                    )
-                    print("Null Author created:", author_id)
-                elif http_err.response.status_code == 401:
-                    # Handle 401 error: Unauthorized, create a null author entry
-                    author, _ = models.Author.get_or_create(
-                        author_id=author_id,
-                        name="Not Authorized",
-                        description="Access unauthorized",
-                        link="",
-                        position=""
-                    )
-                    print("Not Authorized Author created:", author_id)
-                else:
-                    # Handle other HTTP errors
-                    print(f"HTTPError occurred while fetching author details: {http_err}")
-            except Exception as e:
-                # Log or handle any other exceptions that occur during the process
-                print(f"Error occurred while parsing author details: {e}")
+            # Fetch author details from URL
+            response = self.request_to_target_url(self.authorsurl.format(id=author_id), endpoint='author')
+            author = self.store_author_response(author_id, response.status_code, response.json())
+        except requests.exceptions.HTTPError as http_err:
+            if http_err.response.status_code in (401, 404):
+                author = self.store_missing_author(author_id, http_err.response.status_code)
+            else:
+                # Handle other HTTP errors
+                logger.error("HTTPError occurred while fetching author details: %s", http_err)
+        except Exception as e:
+            # Log or handle any other exceptions that occur during the process
+            logger.error("Error occurred while parsing author details: %s", e)
+
+        return author
 
+    def author_needs_request(self, author, count_hit=True):
+        # Placeholder authors are re-requested once their negative cache entry has expired
+        return author is None or (
+            author.name in PLACEHOLDER_AUTHOR_NAMES
+            and not self.negative_cache.is_missing('author', author.author_id, count_hit=count_hit)
+        )
+
+    def store_author_response(self, author_id, status_code, json_response):
+        # Method to store an author from its API response
+        if not json_response:
+            # If json_response is empty, store a null author entry
+            self.negative_cache.remember('author', author_id, status_code)
+            author = self.save_author(author_id, **NOT_FOUND_AUTHOR)
+            logger.info("Null Author created: %s", author_id)
+            return author
+
+        return self.save_author(author_id, **self.author_fields(json_response))
+
+    def author_fields(self, json_response):
+        # Method to extract the stored fields of an author from its API response
+        return {
+            'name': self.clean_view(json_response['name']),
+            'description': self.clean_view(json_response.get('cbDescription', 'No description available')),
+            'link': json_response.get('link', ''),
+            'position': self.clean_view(json_response.get('position', '')),
+        }
+
+    def store_missing_author(self, author_id, status_code):
+        # Method to store a null author entry for a 404 (not found) or 401 (unauthorized) answer
+        self.negative_cache.remember('author', author_id, status_code)
+        if status_code == 401:
+            author = self.save_author(author_id, **NOT_AUTHORIZED_AUTHOR)
+            logger.info("Not Authorized Author created: %s", author_id)
+        else:
+            author = self.save_author(author_id, **NOT_FOUND_AUTHOR)
+            logger.info("Null Author created: %s", author_id)
         return author
 
-    def parse_data(self, url_format, obj_id):
+    def save_author(self, author_id, **fields):
+        # Method to insert an author, or overwrite the stored one (e.g. a placeholder that now resolves)
+        models.Author.insert(author_id=author_id, **fields).on_conflict(
+            conflict_target=[models.Author.author_id],
+            preserve=[getattr(models.Author, name) for name in fields],
+        ).execute()
+        return models.Author.get_by_id(author_id)
+
+    def parse_data(self, url_format, obj_id, endpoint='other'):
         # Method to parse generic data
-        response = self.request_to_target_url(url_format.format(id=obj_id))
-        json_response = response.json()
+        response = self.request_to_target_url(url_format.format(id=obj_id), endpoint=endpoint)
+        return self.extract_item_fields(response.json())
+
+    def extract_item_fields(self, json_response):
+        # Method to extract the stored fields of a category or tag from its API response
         count = json_response['count']
         name = self.clean_view(json_response['name'])
         description = self.clean_view(json_response['description'])
@@ -382,18 +604,39 @@ class ScraperHandler:
                 item = model.get(id_attr == item_id)
                 items.append(item)
             except DoesNotExist:
-                count, name, description, link, slug = self.parse_data(url_format, item_id)
+                kind = model._meta.table_name
+                if self.negative_cache.is_missing(kind, item_id):
+                    continue
                 try:
-                    item = model.create(
-                        **{id_attr.name: int(item_id)},
-                        count=count,
-                        name=name,
-                        description=description,
-                        link=link,
-                        slug=slug,
-                    )
+                    fields = self.parse_data(url_format, item_id, endpoint=kind)
+                except requests.exceptions.HTTPError as http_err:
+                    if http_err.response.status_code not in (401, 404):
+                        raise
+                    self.store_missing_item(kind, item_id, http_err.response.status_code)
+                    continue
+                item = self.store_item(model, id_attr, item_id, fields)
+                if item is not None:
                     items.append(item)
-                except IntegrityError as e:
-                    # Handle the case where the item already exists
-                    print("IntegrityError:", e)
         return items
+
+    def store_item(self, model, id_attr, item_id, fields):
+        # Method to create a category or tag from (count, name, description, link, slug)
+        count, name, description, link, slug = fields
+        try:
+            return model.create(
+                **{id_attr.name: int(item_id)},
+                count=count,
+                name=name,
+                description=description,
+                link=link,
+                slug=slug,
+            )
+        except IntegrityError as e:
+            # Handle the case where the item already exists
+            logger.warning("IntegrityError: %s", e)
+            return None
+
+    def store_missing_item(self, kind, item_id, status_code):
+        # The post keeps its other categories / tags; this id is skipped until the entry expires
+        self.negative_cache.remember(kind, item_id, status_code)
+        logger.info("Missing %s skipped: %s", kind, item_id)
@@ -0,0 +1,128 @@
+import logging
+
+from peewee import JOIN, Expression, fn
+
+import models
+from content_store import content_store
+from constants import SEARCH_INDEX_BATCH
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CONFIG = 'english'
+
+
+def search_vector(title, excerpt, content):
+    # Weighted document vector: title A, excerpt B, body C
+    return Expression(
+        Expression(fn.setweight(fn.to_tsvector(SEARCH_CONFIG, title or ''), 'A'), '||',
+                   fn.setweight(fn.to_tsvector(SEARCH_CONFIG, excerpt or ''), 'B')),
+        '||',
+        fn.setweight(fn.to_tsvector(SEARCH_CONFIG, content or ''), 'C'),
+    )
+
+
+class LocalSearchIndex:
+    """
+    Full-text search over ingested posts using stored Postgres tsvectors with a GIN index.
+
+    Each post's vector lives in PostSearchVector and is built from the full body when the
+    post is written, while the text is at hand, so posts whose bodies were moved to the
+    content store (compressed, unreadable for Postgres) are still matched on their body.
+    On other engines nothing is indexed.
+    """
+
+    index_name = 'post_search_vector_gin'
+    # The expression index used before vectors were stored
+    legacy_index_name = 'post_search_vector_idx'
+
+    def __init__(self, database_manager):
+        self.database_manager = database_manager
+
+    @property
+    def enabled(self):
+        return self.database_manager.engine == 'postgresql'
+
+    def create_index(self):
+        # Method to create the GIN index if it does not exist yet
+        db = self.database_manager.db
+        db.execute_sql(f'DROP INDEX IF EXISTS {self.legacy_index_name}')
+        db.execute_sql(
+            f'CREATE INDEX IF NOT EXISTS {self.index_name} ON {models.PostSearchVector._meta.table_name} '
+            f'USING GIN ({models.PostSearchVector.vector.column_name})'
+        )
+
+    def index_posts(self, rows):
+        """
+        Store the search vectors of posts, replacing older ones.
+
+        Args:
+            rows (list): (post_id, title, excerpt, content) tuples with the full body text.
+        """
+        if not self.enabled or not rows:
+            return
+        (models.PostSearchVector
+         .insert_many([{'post': post_id, 'vector': search_vector(title, excerpt, content)}
+                       for post_id, title, excerpt, content in rows])
+         .on_conflict(conflict_target=[models.PostSearchVector.post], preserve=[models.PostSearchVector.vector])
+         .execute())
+
+    def backfill(self, batch_size=SEARCH_INDEX_BATCH, post_ids=None):
+        """
+        Build the vectors of posts stored without one, reading bodies from the content store as needed.
+
+        Args:
+            batch_size (int): Posts indexed per statement.
+            post_ids (list): Only index these posts; None indexes every post without a vector.
+
+        Returns:
+            int: Number of posts indexed.
+        """
+        if not self.enabled:
+            return 0
+        indexed = 0
+        missing = models.PostSearchVector.post.is_null()
+        if post_ids is not None:
+            missing &= models.Post.post_id.in_(post_ids)
+        while True:
+            posts = list(models.Post
+                         .select(models.Post.post_id, models.Post.title, models.Post.excerpt,
+                                 models.Post.raw_content, models.Post.content_blob)
+                         .join(models.PostSearchVector, JOIN.LEFT_OUTER,
+                               on=(models.PostSearchVector.post == models.Post.post_id))
+                         .where(missing)
+                         .order_by(models.Post.post_id)
+                         .limit(batch_size))
+            if not posts:
+                return indexed
+            bodies = content_store.load_many({post.content_blob_id for post in posts
+                                              if post.raw_content is None and post.content_blob_id is not None})
+            with self.database_manager.db.atomic():
+                self.index_posts([(post.post_id, post.title, post.excerpt,
+                                   post.raw_content if post.raw_content is not None else bodies.get(post.content_blob_id))
+                                  for post in posts])
+            indexed += len(posts)
+            logger.info("Built search vectors of %d posts", indexed)
+
+    def search(self, keyword, page=1, per_page=10):
+        """
+        Rank posts matching a keyword.
+
+        Args:
+            keyword (str): Search terms, in web search syntax ("quoted phrases", -excluded, or).
+            page (int): 1-based result page.
+            per_page (int): Results per page.
+
+        Returns:
+            list: (post_id, rank) tuples for the requested page, best match first.
+        """
+        query = fn.websearch_to_tsquery(SEARCH_CONFIG, keyword)
+        vector = models.PostSearchVector.vector
+        rank = fn.ts_rank_cd(vector, query)
+
+        results = (models.Post
+                   .select(models.Post.post_id, rank.alias('rank'))
+                   .join(models.PostSearchVector, on=(models.PostSearchVector.post == models.Post.post_id))
+                   .where(Expression(vector, '@@', query))
+                   .order_by(rank.desc(), models.Post.created_date.desc())
+                   .paginate(page, per_page))
+        return list(results.tuples())
@@ -0,0 +1,177 @@
+import datetime
+import logging
+from contextlib import closing
+
+import peewee
+
+import models
+from constants import SEARCH_CACHE_TTL_HOURS
+from scraper_handler import SearchHit
+
+logger = logging.getLogger(__name__)
+
+
+class SearchPlanner:
+    """
+    Plan a keyword search around what is already known locally.
+
+    - A previous search for the same keyword that is younger than the TTL and covered
+      at least as many pages is replayed from the database without any remote request.
+    - Otherwise remote result pages are fetched, but paging stops as soon as a page
+      only returns slugs that earlier searches for the keyword already found.
+    - Posts already in the database are loaded locally instead of re-fetched.
+
+    The number of remote requests made and avoided is stored on the SearchByKeyword row,
+    and completed_at is set once its items are stored. Only completed searches are
+    replayed: a search that raises deletes its row, so it is never mistaken for an empty result.
+    """
+
+    def __init__(self, scraper_handler, ttl_hours=SEARCH_CACHE_TTL_HOURS):
+        self.scraper_handler = scraper_handler
+        self.ttl = datetime.timedelta(hours=ttl_hours)
+
+    def search(self, search_by_keyword_instance):
+        """
+        Run a keyword search, reusing cached results where possible.
+
+        Args:
+            search_by_keyword_instance (models.SearchByKeyword): The new search to populate.
+
+        Returns:
+            tuple: (search_items, parsed_items), as returned by ScraperHandler.search_by_keyword.
+        """
+        previous_searches = (models.SearchByKeyword
+                             .select()
+                             .where((models.SearchByKeyword.keyword == search_by_keyword_instance.keyword)
+                                    & (models.SearchByKeyword.id != search_by_keyword_instance.id)
+                                    & models.SearchByKeyword.completed_at.is_null(False))
+                             .order_by(models.SearchByKeyword.created_at.desc()))
+        latest_search = previous_searches.first()
+
+        try:
+            if self.is_fresh(latest_search, search_by_keyword_instance):
+                search_items, parsed_items, remote_requests, requests_avoided = self.replay(
+                    latest_search, search_by_keyword_instance
+                )
+            else:
+                known_slugs = set(
+                    slug for slug, in models.PostSearchByKeywordItem
+                    .select(models.PostSearchByKeywordItem.slug)
+                    .where(models.PostSearchByKeywordItem.search_by_keyword.in_(previous_searches))
+                    .tuples()
+                )
+                known_hits = [] if latest_search is None else [
+                    SearchHit(title=item.title, url=item.url, slug=item.slug)
+                    for item in self.search_items(latest_search)
+                ]
+                search_items, parsed_items, remote_requests, requests_avoided = self.fetch(
+                    search_by_keyword_instance, known_slugs, known_hits
+                )
+        except BaseException:
+            self.discard(search_by_keyword_instance)
+            raise
+
+        search_by_keyword_instance.remote_requests = remote_requests
+        search_by_keyword_instance.requests_avoided = requests_avoided
+        search_by_keyword_instance.save()
+        self.scraper_handler.mark_search_completed(search_by_keyword_instance)
+        logger.info("Search '%s': %d remote requests, %d avoided",
+                    search_by_keyword_instance.keyword.title, remote_requests, requests_avoided,
+                    extra={'remote_requests': remote_requests, 'requests_avoided': requests_avoided})
+
+        return search_items, parsed_items
+
+    def discard(self, search_by_keyword_instance):
+        # Method to delete a failed search and its items, keeping the original error if the delete fails too
+        try:
+            search_by_keyword_instance.delete_instance(recursive=True)
+        except peewee.DatabaseError:
+            logger.exception("Could not delete failed search %s", search_by_keyword_instance.id)
+
+    def is_fresh(self, previous_search, search_by_keyword_instance):
+        # A previous completed search can be replayed if it is within the TTL and covered as many pages
+        return (
+            previous_search is not None
+            and previous_search.created_at >= datetime.datetime.now() - self.ttl
+            and previous_search.page_count >= search_by_keyword_instance.page_count
+        )
+
+    def search_items(self, search):
+        # Items are never older than their search; the bound lets a partitioned items table skip old partitions
+        return search.items.where(models.PostSearchByKeywordItem.created_at >= search.created_at)
+
+    def replay(self, previous_search, search_by_keyword_instance):
+        # Copy the previous search's items into the new search and load their posts locally
+        search_items = list()
+        parsed_items = list()
+
+        with self.scraper_handler.database_manager.db.atomic():
+            for previous_item in self.search_items(previous_search).where(
+                    models.PostSearchByKeywordItem.post.is_null(False)):
+                post, author, categories, tags = self.scraper_handler.load_post_detail(previous_item.post_id)
+                search_items.append(models.PostSearchByKeywordItem.create(
+                    search_by_keyword=search_by_keyword_instance,
+                    title=previous_item.title,
+                    url=previous_item.url,
+                    slug=previous_item.slug,
+                    post=post.post_id,
+                    created_at=datetime.datetime.now()
+                ))
+                parsed_items.append(self.scraper_handler.build_parsed_item(post, author, categories, tags))
+
+        # Every result page and every post detail request was served from the database
+        requests_avoided = search_by_keyword_instance.page_count + len(search_items)
+        return search_items, parsed_items, 0, requests_avoided
+
+    def fetch(self, search_by_keyword_instance, known_slugs, known_hits):
+        # Fetch remote result pages until they run out or only repeat known slugs
+        search_items = list()
+        parsed_items = list()
+        search_hits = list()
+        seen_slugs = set()
+        remote_requests = 0
+        requests_avoided = 0
+        page_count = search_by_keyword_instance.page_count
+
+        stats = {}
+        search_pages = self.scraper_handler.fetch_search_pages(
+            search_by_keyword_instance.keyword.title, page_count, stats=stats
+        )
+        with closing(search_pages):
+            for _, page_hits in search_pages:
+                for search_hit in page_hits:
+                    if search_hit.slug not in seen_slugs:
+                        seen_slugs.add(search_hit.slug)
+                        search_hits.append(search_hit)
+
+                if page_hits and all(search_hit.slug in known_slugs for search_hit in page_hits):
+                    # Later pages are covered by the latest search, take the rest of its results instead
+                    for search_hit in known_hits:
+                        if search_hit.slug not in seen_slugs:
+                            seen_slugs.add(search_hit.slug)
+                            search_hits.append(search_hit)
+                    break
+
+        # Pages cancelled because results ran out, repeated or were already known
+        remote_requests += stats['requests']
+        requests_avoided += page_count - stats['requests']
+
+        with self.scraper_handler.database_manager.db.atomic():
+            for search_hit in search_hits:
+                post_detail = self.scraper_handler.find_stored_post(search_hit.slug)
+                if post_detail is None:
+                    post_detail = self.scraper_handler.parse_post_detail(slug=search_hit.slug)
+                    remote_requests += 1
+                else:
+                    requests_avoided += 1
+
+                search_item, data = self.scraper_handler.save_search_result(
+                    search_by_keyword=search_by_keyword_instance,
+                    search_hit=search_hit,
+                    post_detail=post_detail
+                )
+                if search_item:
+                    search_items.append(search_item)
+                    parsed_items.append(data)
+
+        return search_items, parsed_items, remote_requests, requests_avoided
@@ -0,0 +1,180 @@
+import datetime
+import logging
+import re
+import zlib
+from urllib.parse import urlparse
+from xml.etree.ElementTree import XMLPullParser
+
+import models
+from metrics import metrics
+from constants import SITEMAP_CHUNK_SIZE, SITEMAP_DIFF_BATCH, SITEMAP_INDEX_URL, SITEMAP_POST_LINK_PATTERN
+
+logger = logging.getLogger(__name__)
+
+POST_LINK_RE = re.compile(SITEMAP_POST_LINK_PATTERN)
+
+
+def to_utc(value):
+    # Naive UTC datetime of an aware one; naive values are taken as UTC already
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def parse_lastmod(value):
+    """
+    Parse a W3C datetime <lastmod> ('2024-05-01', '2024-05-01T10:00:00-07:00' or with a Z).
+
+    WordPress (core and Yoast) writes lastmod from post_modified_gmt, so the value is
+    converted to UTC and compared with Post.modified_gmt, never with the site-local
+    Post.modified_date.
+
+    Returns:
+        datetime.datetime: The naive UTC timestamp, or None when the value is missing or invalid.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    try:
+        return to_utc(datetime.datetime.fromisoformat(value))
+    except ValueError:
+        return None
+
+
+class SitemapDiscovery:
+    """
+    Finds new and changed posts from the site's sitemaps instead of paging the posts API.
+
+    Paging /wp/v2/posts downloads the rendered content of every post only to learn which
+    posts exist. The sitemap index and its post sitemaps list the same posts as a link
+    and a lastmod each, a small fraction of the bytes. Every sitemap is streamed and
+    parsed incrementally, so memory stays flat however large it is; entries are diffed
+    against Post.slug / modified_gmt in batches, and only slugs that are not stored or
+    whose lastmod is newer than the stored modified_gmt are queued as 'post' tasks for
+    CrawlWorker (ScraperHandler.parse_post_detail). Posts stored before modified_gmt was
+    recorded are queued once, which records it.
+
+    Args:
+        scraper_handler (ScraperHandler): Handler whose HTTP session and retry policy are used.
+        work_queue (WorkQueue): Queue receiving the new and changed slugs.
+        sitemap_url (str): The sitemap index (a plain post sitemap works too).
+    """
+
+    def __init__(self, scraper_handler, work_queue, sitemap_url=SITEMAP_INDEX_URL):
+        self.scraper_handler = scraper_handler
+        self.work_queue = work_queue
+        self.sitemap_url = sitemap_url
+
+    def discover(self, since=None, batch_size=SITEMAP_DIFF_BATCH):
+        """
+        Walk the sitemaps and queue the posts that are missing or changed in the database.
+
+        Args:
+            since (datetime.datetime): Skip child sitemaps whose index lastmod is older, e.g. the
+                time of the previous discovery; naive values are UTC. None reads every sitemap.
+            batch_size (int): Slugs diffed against the database per query.
+
+        Returns:
+            dict: Counts of sitemaps read and skipped, post urls seen, new, changed and queued slugs.
+        """
+        if since is not None:
+            since = to_utc(since)
+        stats = {'sitemaps': 0, 'sitemaps_skipped': 0, 'urls': 0, 'new': 0, 'changed': 0, 'queued': 0}
+        pending_sitemaps = [self.sitemap_url]
+        seen_sitemaps = set(pending_sitemaps)
+        batch = {}
+
+        while pending_sitemaps:
+            sitemap_url = pending_sitemaps.pop(0)
+            stats['sitemaps'] += 1
+            with metrics.timer('pipeline_stage_seconds', stage='sitemap'):
+                for kind, loc, lastmod in self.iter_sitemap(sitemap_url):
+                    if kind == 'sitemap':
+                        if loc in seen_sitemaps:
+                            continue
+                        seen_sitemaps.add(loc)
+                        if since is not None and lastmod is not None and lastmod < since:
+                            stats['sitemaps_skipped'] += 1
+                            continue
+                        pending_sitemaps.append(loc)
+                        continue
+
+                    slug = self.slug_from_link(loc)
+                    if slug is None:
+                        # Pages, authors, categories ... share the sitemaps with posts
+                        continue
+                    stats['urls'] += 1
+                    if slug not in batch or (lastmod and (batch[slug] is None or lastmod > batch[slug])):
+                        batch[slug] = lastmod
+                    if len(batch) >= batch_size:
+                        self.queue_changes(batch, stats)
+                        batch = {}
+        if batch:
+            self.queue_changes(batch, stats)
+
+        logger.info("Sitemap discovery read %d sitemaps (%d skipped), %d posts: %d new, %d changed",
+                    stats['sitemaps'], stats['sitemaps_skipped'], stats['urls'], stats['new'], stats['changed'],
+                    extra=stats)
+        return stats
+
+    def iter_sitemap(self, url):
+        """
+        Stream one sitemap document and yield its entries as they are parsed.
+
+        Yields:
+            tuple: ('sitemap', loc, lastmod) for sitemap index entries, ('url', loc, lastmod) for urlset entries.
+        """
+        response = self.scraper_handler.retry_policy.get(url, endpoint='sitemap', stream=True)
+        # Compressed sitemaps (.xml.gz) served without a gzip Content-Encoding
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if urlparse(url).path.endswith('.gz') else None
+        parser = XMLPullParser(events=('start', 'end'))
+        root = None
+        try:
+            for chunk in response.iter_content(chunk_size=SITEMAP_CHUNK_SIZE):
+                metrics.increment('http_response_bytes_total', len(chunk), endpoint='sitemap')
+                parser.feed(decompressor.decompress(chunk) if decompressor else chunk)
+                for event, element in parser.read_events():
+                    if event == 'start':
+                        if root is None:
+                            root = element
+                        continue
+                    tag = element.tag.rsplit('}', 1)[-1]
+                    if tag not in ('sitemap', 'url'):
+                        continue
+                    entry = {child.tag.rsplit('}', 1)[-1]: (child.text or '').strip() for child in element}
+                    if entry.get('loc'):
+                        yield tag, entry['loc'], parse_lastmod(entry.get('lastmod'))
+                    # Entries already handled are dropped, so a large sitemap is never held in memory
+                    root.clear()
+            parser.close()
+        finally:
+            response.close()
+
+    def slug_from_link(self, loc):
+        match = POST_LINK_RE.match(urlparse(loc).path)
+        return match.group(1) if match else None
+
+    def queue_changes(self, batch, stats):
+        # Method to queue the slugs of a batch that are not stored, or stored with an older modified_gmt
+        stored = {}
+        query = (models.Post
+                 .select(models.Post.slug, models.Post.modified_gmt)
+                 .where(models.Post.slug.in_(list(batch)))
+                 .tuples())
+        for slug, modified_gmt in query:
+            # A slug stored twice keeps its newest time; an unrecorded (None) time wins, so the post is fetched
+            if slug in stored and (stored[slug] is None or (modified_gmt is not None and modified_gmt <= stored[slug])):
+                continue
+            stored[slug] = modified_gmt
+
+        new_slugs = [slug for slug in batch if slug not in stored]
+        changed_slugs = [slug for slug, lastmod in batch.items()
+                         if slug in stored and lastmod is not None
+                         and (stored[slug] is None or lastmod > stored[slug])]
+        if new_slugs or changed_slugs:
+            # Slugs handled by an earlier discovery are queued again
+            stats['queued'] += self.work_queue.enqueue_slugs(new_slugs + changed_slugs, requeue=True)
+        stats['new'] += len(new_slugs)
+        stats['changed'] += len(changed_slugs)
@@ -0,0 +1,334 @@
+import csv
+import datetime
+import json
+import logging
+import os
+import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import peewee
+import requests
+
+import models
+from content_store import content_store
+from metrics import metrics
+from search_index import LocalSearchIndex
+from constants import SEARCH_INDEX_BATCH, STAGING_FETCH_WORKERS, STAGING_SEGMENT_PAGES
+
+logger = logging.getLogger(__name__)
+
+AUTHOR_COLUMNS = ('author_id', 'name', 'description', 'link', 'position')
+POST_COLUMNS = ('post_id', 'created_date', 'modified_date', 'slug', 'status', 'post_type', 'link', 'title',
+                'content', 'excerpt', 'author_id', 'featured_media_link', 'post_format', 'modified_gmt')
+
+# Staged file -> (model name, columns). Files are loaded in this order so references exist before the rows using them.
+STAGED_TABLES = (
+    ('authors', 'Author', AUTHOR_COLUMNS),
+    ('categories', 'Category', ('category_id', 'count', 'name', 'description', 'link', 'slug')),
+    ('tags', 'Tag', ('tag_id', 'count', 'name', 'description', 'link', 'slug')),
+    ('posts', 'Post', POST_COLUMNS),
+    ('post_categories', 'PostCategory', ('post_id', 'category_id')),
+    ('post_tags', 'PostTag', ('post_id', 'tag_id')),
+)
+
+# Written for NULL so that empty strings stay empty strings in COPY
+CSV_NULL = r'\N'
+
+
+def staged_value(value):
+    if value is None:
+        return CSV_NULL
+    if isinstance(value, datetime.datetime):
+        return str(value)
+    return value
+
+
+class StagingWriter:
+    """
+    First ingestion phase: crawl the posts listing and write everything the database would
+    receive to append-only CSV segments, without touching the database.
+
+    A segment holds STAGING_SEGMENT_PAGES listing pages, fetched concurrently, plus the
+    authors, categories and tags they reference that no earlier segment staged. Segments
+    are written to a temporary directory and renamed into place once complete, so an
+    interrupted run resumes after the last complete segment.
+
+    Args:
+        scraper_handler (ScraperHandler): Used for requests and to extract the stored fields.
+        directory (str): Staging directory, shared with StagingLoader.
+        segment_pages (int): Listing pages per segment.
+        workers (int): Concurrent requests.
+    """
+
+    def __init__(self, scraper_handler, directory, segment_pages=STAGING_SEGMENT_PAGES, workers=STAGING_FETCH_WORKERS):
+        self.scraper_handler = scraper_handler
+        self.directory = directory
+        self.segment_pages = segment_pages
+        self.workers = workers
+        self.staged = {'authors': set(), 'categories': set(), 'tags': set(), 'posts': set()}
+
+    def run(self):
+        """
+        Stage every listing page not staged yet.
+
+        Returns:
+            int: Number of segments written by this run.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        run_path = os.path.join(self.directory, 'run.json')
+        if not os.path.exists(run_path):
+            with open(run_path, 'w') as f:
+                json.dump({'run_id': uuid.uuid4().hex, 'created_at': str(datetime.datetime.now())}, f)
+
+        next_page, finished = self.resume()
+        written = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while not finished:
+                pages = list(range(next_page, next_page + self.segment_pages))
+                responses = list(executor.map(self.scraper_handler.fetch_posts_page, pages))
+                posts_data = []
+                for json_response in responses:
+                    if json_response is None:
+                        finished = True
+                        break
+                    posts_data.extend(json_response)
+                self.write_segment(executor, pages[0], posts_data, finished)
+                next_page += self.segment_pages
+                written += 1
+        return written
+
+    def resume(self):
+        # Method to drop incomplete segments and collect what complete ones already staged
+        next_page, finished = 1, False
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            if name.endswith('.tmp'):
+                shutil.rmtree(path)
+                continue
+            if not name.startswith('segment-'):
+                continue
+            with open(os.path.join(path, 'manifest.json')) as f:
+                manifest = json.load(f)
+            next_page = max(next_page, manifest['last_page'] + 1)
+            finished = finished or manifest['finished']
+            for kind, ids in manifest['staged'].items():
+                self.staged[kind].update(ids)
+        if next_page > 1:
+            logger.info("Resuming staging at page %d", next_page)
+        return next_page, finished
+
+    def write_segment(self, executor, first_page, posts_data, finished):
+        rows = {name: [] for name, _, _ in STAGED_TABLES}
+        new_ids = {kind: set() for kind in self.staged}
+        author_ids, category_ids, tag_ids = set(), set(), set()
+
+        for post_data in posts_data:
+            post_id = int(post_data['id'])
+            if post_id in self.staged['posts'] or post_id in new_ids['posts']:
+                continue
+            new_ids['posts'].add(post_id)
+            fields = self.scraper_handler.post_fields(post_data)
+            rows['posts'].append([fields[column] for column in POST_COLUMNS])
+            rows['post_categories'].extend([post_id, int(category_id)] for category_id in post_data['categories'])
+            rows['post_tags'].extend([post_id, int(tag_id)] for tag_id in post_data['tags'])
+            author_ids.add(int(post_data['author']))
+            category_ids.update(int(category_id) for category_id in post_data['categories'])
+            tag_ids.update(int(tag_id) for tag_id in post_data['tags'])
+
+        references = [('authors', author_id) for author_id in sorted(author_ids - self.staged['authors'])]
+        references += [('categories', category_id) for category_id in sorted(category_ids - self.staged['categories'])]
+        references += [('tags', tag_id) for tag_id in sorted(tag_ids - self.staged['tags'])]
+        for kind, obj_id, row in executor.map(lambda reference: self.fetch_reference(*reference), references):
+            if row is not None:
+                rows[kind].append(row)
+                new_ids[kind].add(obj_id)
+
+        last_page = first_page + self.segment_pages - 1
+        name = f'segment-{first_page:08d}'
+        temporary_path = os.path.join(self.directory, name + '.tmp')
+        os.makedirs(temporary_path)
+        for file_name, _, columns in STAGED_TABLES:
+            with open(os.path.join(temporary_path, f'{file_name}.csv'), 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                writer.writerows([staged_value(value) for value in row] for row in rows[file_name])
+        with open(os.path.join(temporary_path, 'manifest.json'), 'w') as f:
+            json.dump({
+                'first_page': first_page,
+                'last_page': last_page,
+                'finished': finished,
+                'rows': {file_name: len(table_rows) for file_name, table_rows in rows.items()},
+                'staged': {kind: sorted(ids) for kind, ids in new_ids.items()},
+            }, f)
+        os.rename(temporary_path, os.path.join(self.directory, name))
+
+        for kind, ids in new_ids.items():
+            self.staged[kind].update(ids)
+        staged_rows = sum(len(table_rows) for table_rows in rows.values())
+        metrics.increment('staged_rows_total', staged_rows)
+        logger.info("Staged %s: %d posts, %d rows", name, len(rows['posts']), staged_rows)
+
+    def fetch_reference(self, kind, obj_id):
+        """
+        Fetch the stored fields of an author, category or tag.
+
+        Returns:
+            tuple: (kind, id, row); row is None for a missing category or tag, or on errors.
+        """
+        handler = self.scraper_handler
+        try:
+            if kind == 'authors':
+                response = handler.request_to_target_url(handler.authorsurl.format(id=obj_id), endpoint='author')
+                json_response = response.json()
+                if not json_response:
+                    return kind, obj_id, self.placeholder_author(obj_id, response.status_code)
+                fields = handler.author_fields(json_response)
+                return kind, obj_id, [obj_id] + [fields[column] for column in AUTHOR_COLUMNS[1:]]
+
+            url_format = handler.categoryurl if kind == 'categories' else handler.tagurl
+            endpoint = 'category' if kind == 'categories' else 'tag'
+            count, name, description, link, slug = handler.parse_data(url_format, obj_id, endpoint=endpoint)
+            return kind, obj_id, [obj_id, count, name, description, link, slug]
+        except requests.exceptions.HTTPError as http_err:
+            status_code = http_err.response.status_code if http_err.response is not None else None
+            if kind == 'authors' and status_code in (401, 404):
+                return kind, obj_id, self.placeholder_author(obj_id, status_code)
+            if status_code not in (401, 404):
+                logger.error("HTTPError while staging %s %s: %s", kind, obj_id, http_err)
+        except Exception as e:
+            logger.error("Error while staging %s %s: %s", kind, obj_id, e)
+        return kind, obj_id, None
+
+    def placeholder_author(self, author_id, status_code):
+        # Same placeholder rows the row-by-row pipeline stores for missing authors
+        from scraper_handler import NOT_AUTHORIZED_AUTHOR, NOT_FOUND_AUTHOR
+
+        fields = NOT_AUTHORIZED_AUTHOR if status_code == 401 else NOT_FOUND_AUTHOR
+        return [author_id] + [fields[column] for column in AUTHOR_COLUMNS[1:]]
+
+
+class StagingLoader:
+    """
+    Second ingestion phase: bulk-load staged segments into the database.
+
+    Each file is copied into a temporary table (COPY FROM STDIN on Postgres, executemany on
+    SQLite) and merged into its table with one INSERT ... SELECT that skips rows already
+    stored and rows whose references are missing. Post bodies are copied inline, then the
+    inserted posts get the storage layout of the row-by-row pipeline: their bodies move to
+    the content store when it is enabled, and their search vectors are built. A segment and
+    its StagingLoad record are committed together, so re-running the load skips segments
+    that were already loaded.
+
+    Args:
+        database_manager (DatabaseManager): The database to load into.
+        directory (str): Staging directory written by StagingWriter.
+    """
+
+    def __init__(self, database_manager, directory):
+        self.database_manager = database_manager
+        self.directory = directory
+
+    def pending_segments(self):
+        # Complete segments of this staging run that were not loaded yet
+        with open(os.path.join(self.directory, 'run.json')) as f:
+            run_id = json.load(f)['run_id']
+        loaded = {row[0] for row in models.StagingLoad.select(models.StagingLoad.segment).tuples()}
+        segments = sorted(name for name in os.listdir(self.directory)
+                          if name.startswith('segment-') and not name.endswith('.tmp'))
+        return [(f'{run_id}:{name}', name) for name in segments if f'{run_id}:{name}' not in loaded]
+
+    def load(self):
+        """
+        Load every pending segment.
+
+        Returns:
+            dict: Numbers of segments loaded, rows staged and rows inserted.
+        """
+        from cooccurrence_index import CooccurrenceIndex
+
+        stats = {'segments': 0, 'rows_staged': 0, 'rows_inserted': 0}
+        for key, name in self.pending_segments():
+            with self.database_manager.db.atomic():
+                staged, inserted = 0, 0
+                for file_name, model_name, columns in STAGED_TABLES:
+                    table_staged, table_inserted, new_keys = self.load_file(
+                        os.path.join(self.directory, name, f'{file_name}.csv'), file_name,
+                        getattr(models, model_name), columns, collect_keys=(model_name == 'Post')
+                    )
+                    staged += table_staged
+                    inserted += table_inserted
+                    if model_name == 'Post':
+                        self.store_post_bodies(new_keys)
+                models.StagingLoad.create(segment=key, rows_staged=staged, rows_inserted=inserted)
+            stats['segments'] += 1
+            stats['rows_staged'] += staged
+            stats['rows_inserted'] += inserted
+            metrics.increment('staging_rows_loaded_total', inserted)
+            logger.info("Loaded %s: %d of %d rows inserted", name, inserted, staged)
+
+        if stats['rows_inserted']:
+            CooccurrenceIndex(self.database_manager).rebuild()
+        return stats
+
+    def store_post_bodies(self, post_ids):
+        # Method to move the inline bodies of newly loaded posts to the content store and index them for search
+        search_index = LocalSearchIndex(self.database_manager)
+        for start in range(0, len(post_ids), SEARCH_INDEX_BATCH):
+            batch = post_ids[start:start + SEARCH_INDEX_BATCH]
+            if content_store.enabled:
+                content_store.migrate(post_ids=batch)
+            search_index.backfill(post_ids=batch)
+
+    def load_file(self, path, file_name, model, columns, collect_keys=False):
+        # Method to copy one staged file into a temporary table and merge it; returns (staged, inserted,
+        # primary keys of the inserted rows when collect_keys is set)
+        db = self.database_manager.db
+        table = model._meta.table_name
+        staging_table = f'staging_{file_name}'
+        column_list = ', '.join(f'"{column}"' for column in columns)
+
+        db.execute_sql(f'DROP TABLE IF EXISTS {staging_table}')
+        db.execute_sql(f'CREATE TEMPORARY TABLE {staging_table} AS SELECT {column_list} FROM "{table}" WHERE 1 = 0')
+        cursor = db.cursor()
+        with open(path, newline='', encoding='utf-8') as f:
+            if self.database_manager.engine == 'postgresql':
+                cursor.copy_expert(
+                    f"COPY {staging_table} ({column_list}) FROM STDIN WITH (FORMAT csv, HEADER true, NULL '\\N')", f
+                )
+            else:
+                reader = csv.reader(f)
+                next(reader)
+                placeholders = ', '.join('?' for _ in columns)
+                cursor.executemany(
+                    f'INSERT INTO {staging_table} ({column_list}) VALUES ({placeholders})',
+                    ([None if value == CSV_NULL else value for value in row] for row in reader),
+                )
+        staged = db.execute_sql(f'SELECT COUNT(*) FROM {staging_table}').fetchone()[0]
+
+        # Rows already stored are kept as they are, like the row-by-row pipeline does
+        key_columns = [model._meta.primary_key.column_name] if model._meta.primary_key.column_name in columns else columns
+        conditions = [
+            f'NOT EXISTS (SELECT 1 FROM "{table}" t WHERE '
+            + ' AND '.join(f't."{column}" = s."{column}"' for column in key_columns) + ')'
+        ]
+        for field in model._meta.sorted_fields:
+            if isinstance(field, peewee.ForeignKeyField) and field.column_name in columns:
+                conditions.append(
+                    f'EXISTS (SELECT 1 FROM "{field.rel_model._meta.table_name}" r '
+                    f'WHERE r."{field.rel_field.column_name}" = s."{field.column_name}")'
+                )
+        new_keys = []
+        if collect_keys:
+            key_column = model._meta.primary_key.column_name
+            new_keys = [row[0] for row in db.execute_sql(
+                f'SELECT DISTINCT s."{key_column}" FROM {staging_table} s WHERE {" AND ".join(conditions)}'
+            ).fetchall()]
+        source_columns = ', '.join(f's."{column}"' for column in columns)
+        cursor = db.execute_sql(
+            f'INSERT INTO "{table}" ({column_list}) SELECT DISTINCT {source_columns} FROM {staging_table} s '
+            f'WHERE {" AND ".join(conditions)}'
+        )
+        inserted = cursor.rowcount
+        db.execute_sql(f'DROP TABLE {staging_table}')
+        return staged, inserted, new_keys
@@ -0,0 +1,267 @@
+import datetime
+import logging
+import os
+import socket
+import threading
+import time
+
+from peewee import fn
+
+import models
+from metrics import metrics
+from constants import WORK_CLAIM_BATCH, WORK_LEASE_SECONDS, WORK_MAX_ATTEMPTS
+
+logger = logging.getLogger(__name__)
+
+PENDING, LEASED, DONE, FAILED = 'pending', 'leased', 'done', 'failed'
+
+
+class WorkQueue:
+    """
+    Crawl work shared by any number of worker processes through the CrawlTask table.
+
+    Workers claim batches of tasks with SELECT ... FOR UPDATE SKIP LOCKED, so concurrent
+    claims never block on or return the same rows. A claimed task is leased to its worker
+    until lease_expires_at; a heartbeat keeps extending the lease while the worker is
+    alive, and tasks whose lease ran out (crashed or stalled worker) are claimed again.
+
+    Args:
+        database_manager (DatabaseManager): The shared database.
+        worker_id (str): Name recorded as lease owner, host:pid by default.
+        lease_seconds (float): Lease length; heartbeats renew it every third of it.
+        max_attempts (int): Claims after which a failing task is marked failed.
+    """
+
+    def __init__(self, database_manager, worker_id=None, lease_seconds=WORK_LEASE_SECONDS,
+                 max_attempts=WORK_MAX_ATTEMPTS):
+        self.database_manager = database_manager
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+        self.lease = datetime.timedelta(seconds=lease_seconds)
+        self.max_attempts = max_attempts
+
+    def enqueue(self, kind, keys, requeue=False):
+        """
+        Add tasks, ignoring keys already queued for that kind.
+
+        Args:
+            kind (str): Task kind, see CrawlWorker.
+            keys (iterable): Task keys.
+            requeue (bool): Set keys already done or failed back to pending, so they run again.
+
+        Returns:
+            int: Number of keys submitted.
+        """
+        rows = [{'kind': kind, 'key': str(key)} for key in keys]
+        with self.database_manager.db.atomic():
+            for start in range(0, len(rows), 1000):
+                batch = rows[start:start + 1000]
+                models.CrawlTask.insert_many(batch).on_conflict_ignore().execute()
+                if requeue:
+                    models.CrawlTask.update(
+                        status=PENDING, attempts=0, lease_owner=None, lease_expires_at=None,
+                        finished_at=None, last_error=None,
+                    ).where(
+                        (models.CrawlTask.kind == kind)
+                        & models.CrawlTask.key.in_([row['key'] for row in batch])
+                        & models.CrawlTask.status.in_([DONE, FAILED])
+                    ).execute()
+        return len(rows)
+
+    def enqueue_pages(self, first_page, last_page):
+        # Method to queue a range of posts listing pages, both ends included
+        return self.enqueue('posts_page', range(first_page, last_page + 1))
+
+    def enqueue_slugs(self, slugs, requeue=False):
+        # Method to queue individual posts by slug
+        return self.enqueue('post', slugs, requeue=requeue)
+
+    def claim(self, limit=WORK_CLAIM_BATCH):
+        """
+        Lease up to `limit` pending or lease-expired tasks to this worker.
+
+        A lease-expired task that already used max_attempts is marked failed instead: its
+        worker died without calling fail() (killed, out of memory), and leasing it again
+        would only take a claim slot every lease period.
+
+        Returns:
+            list: The claimed CrawlTask rows, oldest first.
+        """
+        now = datetime.datetime.now()
+        claimable = (models.CrawlTask
+                     .select(models.CrawlTask.id)
+                     .where((models.CrawlTask.status == PENDING)
+                            | ((models.CrawlTask.status == LEASED) & (models.CrawlTask.lease_expires_at < now)))
+                     .order_by(models.CrawlTask.id)
+                     .limit(limit))
+        if self.database_manager.db.for_update:
+            claimable = claimable.for_update('FOR UPDATE SKIP LOCKED')
+
+        with self.database_manager.db.atomic():
+            self.fail_abandoned(now)
+            task_ids = [task_id for task_id, in claimable.tuples()]
+            if not task_ids:
+                return []
+            models.CrawlTask.update(
+                status=LEASED,
+                lease_owner=self.worker_id,
+                lease_expires_at=now + self.lease,
+                attempts=models.CrawlTask.attempts + 1,
+            ).where(models.CrawlTask.id.in_(task_ids)).execute()
+        metrics.increment('work_tasks_claimed_total', len(task_ids))
+        return list(models.CrawlTask.select().where(models.CrawlTask.id.in_(task_ids)).order_by(models.CrawlTask.id))
+
+    def fail_abandoned(self, now):
+        # Method to mark lease-expired tasks that used all their attempts as failed
+        abandoned = ((models.CrawlTask.status == LEASED) & (models.CrawlTask.lease_expires_at < now)
+                     & (models.CrawlTask.attempts >= self.max_attempts))
+        query = models.CrawlTask.select(models.CrawlTask.id, models.CrawlTask.kind).where(abandoned)
+        if self.database_manager.db.for_update:
+            query = query.for_update('FOR UPDATE SKIP LOCKED')
+        tasks = list(query.tuples())
+        if not tasks:
+            return
+        models.CrawlTask.update(
+            status=FAILED, lease_owner=None, lease_expires_at=None,
+            last_error=f'lease expired after {self.max_attempts} attempts',
+        ).where(models.CrawlTask.id.in_([task_id for task_id, _ in tasks]) & abandoned).execute()
+        for _, kind in tasks:
+            metrics.increment('work_tasks_total', kind=kind, status=FAILED)
+        logger.warning("Marked %d tasks failed whose lease expired after %d attempts", len(tasks), self.max_attempts)
+
+    def heartbeat(self, task_ids):
+        # Method to extend the lease of tasks this worker still holds
+        if not task_ids:
+            return 0
+        return models.CrawlTask.update(
+            lease_expires_at=datetime.datetime.now() + self.lease
+        ).where(
+            models.CrawlTask.id.in_(task_ids)
+            & (models.CrawlTask.status == LEASED)
+            & (models.CrawlTask.lease_owner == self.worker_id)
+        ).execute()
+
+    def complete(self, task):
+        # Method to mark a task done, unless its lease expired and another worker holds it now
+        completed = models.CrawlTask.update(
+            status=DONE, finished_at=datetime.datetime.now(), lease_expires_at=None, last_error=None
+        ).where((models.CrawlTask.id == task.id) & (models.CrawlTask.lease_owner == self.worker_id)).execute()
+        if not completed:
+            logger.warning("Task %s %s was leased to another worker before it completed", task.kind, task.key)
+            return False
+        metrics.increment('work_tasks_total', kind=task.kind, status=DONE)
+        return True
+
+    def fail(self, task, error):
+        # Method to release a failed task for another attempt, or mark it failed after max_attempts
+        status = FAILED if task.attempts >= self.max_attempts else PENDING
+        failed = models.CrawlTask.update(
+            status=status, lease_owner=None, lease_expires_at=None, last_error=str(error)
+        ).where((models.CrawlTask.id == task.id) & (models.CrawlTask.lease_owner == self.worker_id)).execute()
+        if failed:
+            metrics.increment('work_tasks_total', kind=task.kind, status=status)
+
+    def status_counts(self):
+        """
+        Returns:
+            dict: {(kind, status): count} over the whole queue.
+        """
+        query = (models.CrawlTask
+                 .select(models.CrawlTask.kind, models.CrawlTask.status, fn.COUNT(models.CrawlTask.id))
+                 .group_by(models.CrawlTask.kind, models.CrawlTask.status)
+                 .tuples())
+        return {(kind, status): count for kind, status, count in query}
+
+
+class Heartbeat:
+    # Renews the leases of the tasks a worker holds from a daemon thread
+    def __init__(self, work_queue, interval):
+        self.work_queue = work_queue
+        self.interval = interval
+        self.task_ids = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def hold(self, task_ids):
+        with self._lock:
+            self.task_ids = list(task_ids)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            with self._lock:
+                task_ids = list(self.task_ids)
+            try:
+                self.work_queue.heartbeat(task_ids)
+            except Exception as e:
+                logger.warning("Heartbeat failed: %s", e)
+        # Peewee connections are per thread, release this thread's one
+        self.work_queue.database_manager.db.close()
+
+
+class CrawlWorker:
+    """
+    Claim and process crawl tasks until the queue is drained (or forever with wait_for_work).
+
+    Task kinds:
+        posts_page  one page of the posts listing, stored like fetch_all_pages does
+        post        one post by slug, stored like a search result
+    """
+
+    def __init__(self, scraper_handler, work_queue, batch_size=WORK_CLAIM_BATCH, idle_seconds=5.0):
+        self.scraper_handler = scraper_handler
+        self.work_queue = work_queue
+        self.batch_size = batch_size
+        self.idle_seconds = idle_seconds
+        self.processed = 0
+
+    def run(self, wait_for_work=False):
+        heartbeat = Heartbeat(self.work_queue, self.work_queue.lease.total_seconds() / 3).start()
+        try:
+            while True:
+                tasks = self.work_queue.claim(self.batch_size)
+                if not tasks:
+                    if not wait_for_work:
+                        break
+                    time.sleep(self.idle_seconds)
+                    continue
+
+                heartbeat.hold(task.id for task in tasks)
+                for task in tasks:
+                    self.run_task(task)
+                heartbeat.hold([])
+        finally:
+            heartbeat.stop()
+        logger.info("Worker %s processed %d tasks", self.work_queue.worker_id, self.processed,
+                    extra={'worker': self.work_queue.worker_id, 'processed': self.processed})
+        return self.processed
+
+    def run_task(self, task):
+        try:
+            with metrics.timer('work_task_seconds', kind=task.kind):
+                if task.kind == 'posts_page':
+                    json_response = self.scraper_handler.fetch_posts_page(int(task.key))
+                    if json_response is not None:
+                        with self.scraper_handler.database_manager.db.atomic():
+                            self.scraper_handler.parse_all_posts(json_response)
+                elif task.kind == 'post':
+                    post = self.scraper_handler.parse_post_detail(task.key)[0]
+                    # parse_post_detail logs and swallows errors; only a slug known to be missing is final
+                    if post is None and not self.scraper_handler.negative_cache.is_missing(
+                            'post', task.key, count_hit=False):
+                        raise RuntimeError(f'Post {task.key} could not be fetched')
+                else:
+                    raise ValueError(f'Unknown task kind: {task.kind}')
+        except Exception as e:
+            logger.warning("Task %s %s failed (attempt %d): %s", task.kind, task.key, task.attempts, e)
+            self.work_queue.fail(task, e)
+        else:
+            if self.work_queue.complete(task):
+                self.processed += 1